@@ -1,8 +1,23 @@
 from django.contrib import admin
-from .models import Aviso
+from django.utils import timezone
+from .models import Aviso, Notificacao
 
 @admin.register(Aviso)
 class AvisoAdmin(admin.ModelAdmin):
     list_display = ('titulo','condominio','criado_por','criado_em')
     list_filter = ('condominio',)
-    search_fields = ('titulo','mensagem')
\ No newline at end of file
+    search_fields = ('titulo','mensagem')
+
+@admin.register(Notificacao)
+class NotificacaoAdmin(admin.ModelAdmin):
+    list_display = ('evento','destinatario','status','tentativas','criado_em','enviado_em')
+    list_filter = ('status','evento')
+    search_fields = ('evento','destinatario__username')
+    list_select_related = ('destinatario',)
+    readonly_fields = ('criado_em','enviado_em','ultimo_erro')
+    actions = ('reenviar',)
+
+    @admin.action(description="Reenviar (voltar para a fila)")
+    def reenviar(self, request, queryset):
+        n = queryset.update(status=Notificacao.Status.PENDENTE, tentativas=0, proxima_tentativa=timezone.now())
+        self.message_user(request, f"{n} notificação(ões) de volta à fila.")
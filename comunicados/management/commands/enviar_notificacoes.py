@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from comunicados.notificacoes import entregar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Entrega ao n8n as notificações pendentes (agende a cada minuto).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=100, help='Máximo de notificações por execução.')
+
+    def handle(self, *args, **opts):
+        enviadas, falhas = entregar_pendentes(lote=opts['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{enviadas} enviada(s), {falhas} falha(s)."))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from condominios.models import Condominio
 
 class Aviso(models.Model):
@@ -11,4 +12,35 @@ class Aviso(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
 
     class Meta: ordering = ['-criado_em']
-    def __str__(self): return f"{self.titulo} ({self.condominio})"
\ No newline at end of file
+    def __str__(self): return f"{self.titulo} ({self.condominio})"
+
+class Notificacao(models.Model):
+    """
+    Fila de saída (outbox) de notificações. Quem gera o evento só grava a linha, na
+    mesma transação; a entrega ao n8n é feita fora da requisição pelo comando
+    `enviar_notificacoes` (ver comunicados.notificacoes).
+    """
+    class Status(models.TextChoices):
+        PENDENTE = 'PENDENTE', 'Pendente'
+        ENVIADA = 'ENVIADA', 'Enviada'
+        FALHOU = 'FALHOU', 'Falhou'
+
+    destinatario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='notificacoes')
+    evento = models.CharField(max_length=80)
+    dados = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-criado_em']
+        verbose_name = 'Notificação'
+        verbose_name_plural = 'Notificações'
+        indexes = [
+            models.Index(fields=['proxima_tentativa'], condition=models.Q(status='PENDENTE'), name='notificacao_pendente'),
+        ]
+
+    def __str__(self): return f"{self.evento} → {self.destinatario or '-'} ({self.get_status_display()})"
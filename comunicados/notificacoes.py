@@ -0,0 +1,111 @@
+# comunicados/notificacoes.py
+"""
+Entrega das notificações enfileiradas (comunicados.Notificacao) ao webhook do n8n.
+
+`enfileirar()` só grava no banco — é seguro chamar dentro de transações e de
+requisições. `entregar_pendentes()` roda fora da requisição (comando
+`enviar_notificacoes`, agendado) e reenvia com espera crescente em caso de falha.
+"""
+import json
+import urllib.error
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notificacao
+
+MAX_TENTATIVAS = 5
+TIMEOUT = 10  # segundos por POST
+
+
+def enfileirar(destinatario, evento, **dados):
+    return Notificacao.objects.create(destinatario=destinatario, evento=evento, dados=dados)
+
+
+def _payload(n):
+    u = n.destinatario
+    return {
+        'id': n.pk,
+        'evento': n.evento,
+        'criado_em': n.criado_em.isoformat(),
+        'destinatario': {
+            'id': u.pk,
+            'username': u.username,
+            'nome': u.get_full_name() or u.username,
+            'email': u.email,
+        } if u else None,
+        'dados': n.dados,
+    }
+
+
+def _postar(payload):
+    req = urllib.request.Request(
+        settings.N8N_WEBHOOK_URL,
+        data=json.dumps(payload, default=str).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    if settings.N8N_WEBHOOK_TOKEN:
+        req.add_header('Authorization', f'Bearer {settings.N8N_WEBHOOK_TOKEN}')
+    with urllib.request.urlopen(req, timeout=TIMEOUT) as resp:
+        resp.read()
+
+
+def _reivindicar(agora, lote):
+    """
+    Reserva até `lote` notificações vencidas numa transação curta: adia
+    `proxima_tentativa` para o fim do prazo de envio do lote (e já conta a tentativa).
+    Outra instância do comando não as pega; se este processo morrer no meio, elas
+    voltam sozinhas quando o prazo passar.
+    """
+    prazo = agora + timedelta(seconds=TIMEOUT * lote + 60)
+    with transaction.atomic():
+        qs = Notificacao.objects.filter(status=Notificacao.Status.PENDENTE, proxima_tentativa__lte=agora)
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        ids = list(qs.order_by('proxima_tentativa').values_list('pk', flat=True)[:lote])
+        # o filtro repetido descarta as que outra instância reivindicou entre a leitura e o UPDATE (SQLite)
+        Notificacao.objects.filter(
+            pk__in=ids, status=Notificacao.Status.PENDENTE, proxima_tentativa__lte=agora,
+        ).update(proxima_tentativa=prazo, tentativas=F('tentativas') + 1)
+    return list(
+        Notificacao.objects.filter(pk__in=ids, proxima_tentativa=prazo)
+        .select_related('destinatario').order_by('pk')
+    )
+
+
+def entregar_pendentes(lote=100, postar=_postar):
+    """
+    Envia até `lote` notificações vencidas. Retorna (enviadas, falhas).
+
+    Nenhuma transação fica aberta durante os POSTs: as linhas são reivindicadas numa
+    transação curta (SKIP LOCKED no PostgreSQL), os envios acontecem fora dela e os
+    resultados são gravados numa segunda transação curta. Várias instâncias do comando
+    podem rodar ao mesmo tempo sem entregar a mesma notificação duas vezes.
+    """
+    enviadas = falhas = 0
+    notificacoes = _reivindicar(timezone.now(), lote)
+    for n in notificacoes:
+        try:
+            postar(_payload(n))
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            falhas += 1
+            n.ultimo_erro = str(e)[:1000]
+            if n.tentativas >= MAX_TENTATIVAS:
+                n.status = Notificacao.Status.FALHOU
+            else:
+                n.proxima_tentativa = timezone.now() + timedelta(minutes=2 ** n.tentativas)
+        else:
+            enviadas += 1
+            n.status = Notificacao.Status.ENVIADA
+            n.enviado_em = timezone.now()
+            n.ultimo_erro = ''
+
+    with transaction.atomic():
+        for n in notificacoes:
+            n.save(update_fields=['status', 'proxima_tentativa', 'ultimo_erro', 'enviado_em'])
+    return enviadas, falhas
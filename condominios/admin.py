@@ -1,17 +1,74 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.shortcuts import render
+from financeiro import boletos
+from financeiro.cobranca import gerar_cotas
+from financeiro.forms import GerarCotasForm
+from financeiro.models import Lancamento, PoliticaMulta, SaldoUnidade
 from .models import Condominio, Bloco, Unidade
 
+class PoliticaMultaInline(admin.StackedInline):
+    """Multa/juros por atraso (aplicados pelo comando calcular_encargos)."""
+    model = PoliticaMulta
+    max_num = 1
+    can_delete = False
+
 @admin.register(Condominio)
 class CondominioAdmin(admin.ModelAdmin):
     search_fields = ('nome',)
+    inlines = (PoliticaMultaInline,)
+    actions = ('gerar_cotas',)
+
+    @admin.action(description="Gerar cotas do mês")
+    def gerar_cotas(self, request, queryset):
+        """Formulário intermediário: simula (diff) e só grava após confirmação."""
+        enviado = 'simular' in request.POST or 'confirmar' in request.POST
+        form = GerarCotasForm(request.POST if enviado else None)
+        rodadas = []
+        if enviado and form.is_valid():
+            confirmar = 'confirmar' in request.POST
+            try:
+                with transaction.atomic():  # vários condomínios: tudo ou nada
+                    rodadas = [gerar_cotas(c, simular=not confirmar, **form.parametros()) for c in queryset]
+                    if confirmar and form.cleaned_data['boletos']:
+                        boletos.solicitar(Lancamento.objects.filter(pk__in=[l.pk for r in rodadas for l in r.novas]))
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                if confirmar:
+                    for r in rodadas:
+                        self.message_user(request, str(r), messages.SUCCESS)
+                    return None
+        return render(request, 'admin/financeiro/gerar_cotas.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Gerar cotas do mês',
+            'form': form,
+            'condominios': queryset,
+            'rodadas': rodadas,
+            'total_novas': sum(len(r.novas) for r in rodadas),
+        })
 
 @admin.register(Bloco)
 class BlocoAdmin(admin.ModelAdmin):
     list_display = ('nome','condominio')
     list_filter = ('condominio',)
 
+class SaldoUnidadeInline(admin.TabularInline):
+    """Extrato mensal da unidade (financeiro.saldos): uma linha por competência."""
+    model = SaldoUnidade
+    fields = readonly_fields = ('competencia', 'lancamentos', 'faturado', 'pago', 'em_aberto', 'vencido', 'vencido_em')
+    ordering = ('-competencia',)
+    extra = 0
+    can_delete = False
+    verbose_name_plural = "Saldos por competência"
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Unidade)
 class UnidadeAdmin(admin.ModelAdmin):
-    list_display = ('numero','bloco','condominio','morador')
+    list_display = ('numero','bloco','condominio','morador','fracao_ideal')
     list_filter = ('condominio','bloco')
-    search_fields = ('numero',)
\ No newline at end of file
+    search_fields = ('numero',)
+    inlines = (SaldoUnidadeInline,)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unidade',
+            name='fracao_ideal',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='Fração ideal da unidade (usada no rateio das cotas).', max_digits=9, null=True),
+        ),
+    ]
@@ -17,6 +17,7 @@ class Unidade(models.Model):
     bloco = models.ForeignKey(Bloco, on_delete=models.SET_NULL, null=True, blank=True, related_name='unidades')
     numero = models.CharField(max_length=20)
     morador = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='unidades')
+    fracao_ideal = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, help_text="Fração ideal da unidade (usada no rateio das cotas).")
     class Meta: unique_together = ('condominio','bloco','numero')
     def __str__(self):
         label_bloco = self.bloco.nome if self.bloco else 'Sem Bloco'
@@ -11,6 +11,27 @@ N8N_WEBHOOK_URL = os.getenv(
 )
 N8N_WEBHOOK_TOKEN = os.getenv("N8N_WEBHOOK_TOKEN", "")
 
+# =========================
+# Boletos gerados (financeiro.boletos)
+# =========================
+# sem banco/convênio configurados, gerar boletos levanta ImproperlyConfigured
+BOLETO_BANCO = os.getenv("BOLETO_BANCO", "")             # código do banco emissor
+BOLETO_CONVENIO = os.getenv("BOLETO_CONVENIO", "")       # convênio/carteira: início do campo livre
+BOLETO_LOCAL_PAGAMENTO = os.getenv("BOLETO_LOCAL_PAGAMENTO", "Pagável em qualquer banco até o vencimento")
+
+# =========================
+# Webhooks de pagamento (financeiro.pagamentos)
+# =========================
+# segredo HMAC por provedor; provedor sem segredo fica desligado (404)
+PAGAMENTOS_SEGREDOS = {
+    "pix": os.getenv("PIX_WEBHOOK_SEGREDO", ""),
+    "stub": os.getenv("PAGAMENTOS_STUB_SEGREDO", ""),  # provedor local de testes
+}
+# PIX copia e cola com o txid de cada lançamento (sem chave, não é oferecido)
+PIX_CHAVE = os.getenv("PIX_CHAVE", "")
+PIX_RECEBEDOR = os.getenv("PIX_RECEBEDOR", "CondoX")  # até 25 caracteres
+PIX_CIDADE = os.getenv("PIX_CIDADE", "Fortaleza")     # até 15 caracteres
+
 # =========
 # Básico
 # =========
@@ -78,7 +99,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-ROOT_URLCONF = "condox.urls"
+ROOT_URLCONF = os.getenv("DJANGO_ROOT_URLCONF", "condox.urls")  # condox.urls_eventos no processo `eventos`
 
 TEMPLATES = [
     {
@@ -122,6 +143,39 @@ else:
         }
     }
 
+# ===========================
+# Cache
+# ===========================
+# Compartilhado entre processos E máquinas: guarda os contadores de versão do cache de
+# horários (reservas.cache) e dos relatórios (financeiro.cache), que todos os workers
+# precisam ver. REDIS_URL → Redis; sem ele, tabela no próprio banco
+# (`python manage.py createcachetable`; o banco de testes já a cria).
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": os.getenv("DJANGO_CACHE_TABLE", "django_cache"),
+            "OPTIONS": {"MAX_ENTRIES": int(os.getenv("DJANGO_CACHE_MAX_ENTRIES", "50000"))},
+        }
+    }
+
+# Feed ao vivo do painel do porteiro (SSE): cada tela lê a versão das reservas no cache
+# a cada 2 s — barato no Redis, uma query por leitura no cache em banco. Roda no
+# processo ASGI `eventos` do procfile, publicado em PORTEIRO_EVENTOS_URL (ex.:
+# https://eventos.condox.app/portal/porteiro/eventos/, com SESSION_COOKIE_DOMAIN=.condox.app
+# e a origem do site em CSRF_TRUSTED_ORIGINS). Sem Redis ou sem a URL, o painel fica no
+# recarregamento periódico.
+PORTEIRO_EVENTOS_URL = os.getenv("PORTEIRO_EVENTOS_URL", "")
+PORTEIRO_AO_VIVO = bool(os.getenv("REDIS_URL") and PORTEIRO_EVENTOS_URL)
+SESSION_COOKIE_DOMAIN = os.getenv("SESSION_COOKIE_DOMAIN") or None
+
 # ===========================
 # Segurança / Proxy (Railway)
 # ===========================
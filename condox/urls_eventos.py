@@ -0,0 +1,10 @@
+# condox/urls_eventos.py
+# URLs do processo ASGI `eventos` do procfile: só o feed ao vivo do porteiro. O resto
+# do site continua no processo `web` (WSGI, com threads).
+from django.urls import path
+
+from portal import views as portal_views
+
+urlpatterns = [
+    path("portal/porteiro/eventos/", portal_views.porteiro_eventos, name="porteiro_eventos"),
+]
@@ -1,8 +1,66 @@
 # financeiro/admin.py
-from django.contrib import admin
-from django.utils.html import format_html
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Count, Prefetch
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
 from django.utils.timezone import localtime
-from .models import Lancamento
+from accounts.models import User
+
+from . import arquivos, boletos, conciliacao, exportacao
+from .models import (
+    AjusteEncargos, EventoPagamento, ExtratoImportado, Lancamento, LancamentoQuerySet, MovimentoBancario,
+)
+
+
+class StatusFilter(admin.SimpleListFilter):
+    """Filtro por status calculado no banco (ver LancamentoQuerySet)."""
+    title = "status"
+    parameter_name = "status"
+
+    def lookups(self, request, model_admin):
+        return [(s, s.title()) for s in LancamentoQuerySet.STATUS]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.com_status(self.value())
+        return queryset
+
+
+class LancamentoAdminForm(forms.ModelForm):
+    """Boleto só em PDF; comprovante em PDF ou imagem. Ambos com o limite de tamanho."""
+
+    class Meta:
+        model = Lancamento
+        fields = '__all__'
+
+    def _arquivo(self, campo, tipos):
+        f = self.cleaned_data.get(campo)
+        if f and campo in self.changed_data:
+            arquivos.validar(f, tipos)
+        return f
+
+    def clean_boleto_pdf(self):
+        return self._arquivo('boleto_pdf', arquivos.PDF)
+
+    def clean_comprovante_pdf(self):
+        return self._arquivo('comprovante_pdf', arquivos.PDF_OU_IMAGEM)
+
+
+class AjusteEncargosInline(admin.TabularInline):
+    """Histórico de multa/juros (gravado pelo comando calcular_encargos)."""
+    model = AjusteEncargos
+    fields = readonly_fields = (
+        'referencia', 'dias_atraso', 'multa_anterior', 'juros_anterior', 'multa', 'juros',
+        'multa_percentual', 'juros_mensal_percentual',
+    )
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Lancamento)
@@ -10,13 +68,17 @@ class LancamentoAdmin(admin.ModelAdmin):
     """
     Admin de Lançamentos com coluna 'Destino' indicando para quem a cobrança aparece
     no portal (morador da unidade, morador direto e/ou grupo de destinatários).
+
+    A lista roda um número fixo de queries, qualquer que seja o tamanho da página:
+    unidade/morador/morador_alvo vêm no JOIN, o total de destinatários é anotado e
+    os nomes do grupo vêm num único prefetch (ver financeiro.tests).
     """
 
     # ---- LISTA ----
     list_display = (
         'resumo',         # título compacto
         'destino',        # badge do destino
-        'status',         # PAGO / PENDENTE / VENCIDO (property)
+        'status_badge',   # PAGO / PENDENTE / VENCIDO (anotado no banco, ordenável)
         'vencimento',
         'valor',
         'has_boleto',
@@ -24,6 +86,7 @@ class LancamentoAdmin(admin.ModelAdmin):
         'comprovante_link_list',  # 👈 link clicável na listagem
     )
     list_filter = (
+        StatusFilter,
         'tipo',
         ('vencimento', admin.DateFieldListFilter),
         ('pago_em', admin.DateFieldListFilter),
@@ -32,7 +95,7 @@ class LancamentoAdmin(admin.ModelAdmin):
     )
     search_fields = (
         'descricao',
-        'unidade__identificacao',
+        'unidade__numero',
         'unidade__morador__username',
         'unidade__morador__first_name',
         'unidade__morador__last_name',
@@ -42,8 +105,12 @@ class LancamentoAdmin(admin.ModelAdmin):
     )
     date_hierarchy = 'vencimento'
     ordering = ('-vencimento', '-criado_em')
+    list_select_related = ('unidade__morador', 'morador_alvo')
+
+    actions = ['gerar_boleto', 'substituir_boleto', 'exportar_csv', 'exportar_xlsx']
 
     # ---- FORM ----
+    form = LancamentoAdminForm
     autocomplete_fields = ('unidade', 'morador_alvo', 'destinatarios')
     filter_horizontal = ('destinatarios',)
 
@@ -62,47 +129,122 @@ class LancamentoAdmin(admin.ModelAdmin):
         }),
         ('Arquivos', {
             # 👇 mostramos os campos de arquivo e também um link readonly
-            'fields': ('boleto_pdf', 'comprovante_pdf', 'comprovante_enviado_em', 'comprovante_link_detail'),
+            'fields': ('boleto_pdf', 'boleto_erro', 'comprovante_pdf', 'comprovante_enviado_em', 'comprovante_link_detail'),
         }),
         ('Pagamento', {
-            'fields': ('pago_em',),
+            'fields': ('pago_em', 'multa', 'juros', 'encargos_calculados_em', 'valor_devido_str'),
         }),
         ('Metadados', {
             'fields': ('criado_em',),
             'classes': ('collapse',),
         }),
     )
-    readonly_fields = ('criado_em', 'comprovante_enviado_em', 'comprovante_link_detail')
+    readonly_fields = (
+        'criado_em', 'boleto_erro', 'comprovante_enviado_em', 'comprovante_link_detail',
+        'multa', 'juros', 'encargos_calculados_em', 'valor_devido_str',
+    )
+    inlines = (AjusteEncargosInline,)
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .annotate_status()
+            .annotate(n_destinatarios=Count('destinatarios', distinct=True))
+            .prefetch_related(Prefetch(
+                'destinatarios',
+                queryset=User.objects.only('username', 'first_name', 'last_name').order_by('first_name', 'username'),
+            ))
+        )
+
+    def save_model(self, request, obj, form, change):
+        # arquivos novos vão para o armazenamento por conteúdo (ver financeiro.arquivos)
+        for campo, tipos in (('boleto_pdf', arquivos.PDF), ('comprovante_pdf', arquivos.PDF_OU_IMAGEM)):
+            f = form.cleaned_data.get(campo)
+            if f and campo in form.changed_data:
+                setattr(obj, campo, arquivos.guardar(f, tipos))
+        super().save_model(request, obj, form, change)
+
+    def _solicitar_boletos(self, request, queryset, sobrescrever):
+        try:
+            n = boletos.solicitar(queryset.em_aberto(), sobrescrever=sobrescrever)
+        except ImproperlyConfigured as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        ignorados = "Lançamentos pagos foram ignorados." if sobrescrever else (
+            "Lançamentos pagos ou que já têm boleto foram ignorados."
+        )
+        self.message_user(
+            request,
+            f"{n} boleto(s) na fila; os PDFs aparecem quando o comando gerar_boletos rodar. {ignorados}",
+            messages.SUCCESS,
+        )
+
+    @admin.action(description="Gerar boleto em PDF (em segundo plano)")
+    def gerar_boleto(self, request, queryset):
+        self._solicitar_boletos(request, queryset, sobrescrever=False)
+
+    @admin.action(description="Gerar boleto em PDF substituindo o atual")
+    def substituir_boleto(self, request, queryset):
+        self._solicitar_boletos(request, queryset, sobrescrever=True)
+
+    def _exportar(self, request, queryset, formato):
+        # sem as anotações/prefetch da lista: a exportação monta a própria query com JOINs
+        lancamentos = Lancamento.objects.filter(pk__in=queryset.values('pk'))
+        _, content_type = exportacao.FORMATOS[formato]
+        resp = StreamingHttpResponse(
+            exportacao.exportar(lancamentos, formato, base_url=request.build_absolute_uri('/')[:-1]),
+            content_type=content_type,
+        )
+        resp['Content-Disposition'] = f'attachment; filename="lancamentos-{localtime():%Y%m%d-%H%M}.{formato}"'
+        return resp
+
+    @admin.action(description="Exportar para a contabilidade (CSV)")
+    def exportar_csv(self, request, queryset):
+        return self._exportar(request, queryset, 'csv')
+
+    @admin.action(description="Exportar para a contabilidade (XLSX)")
+    def exportar_xlsx(self, request, queryset):
+        return self._exportar(request, queryset, 'xlsx')
 
     # ---- EXIBIÇÕES AUXILIARES ----
     def resumo(self, obj):
         return f"{obj.get_tipo_display()} • R$ {obj.valor} • vence {obj.vencimento:%d/%m/%Y}"
     resumo.short_description = "Lançamento"
 
+    @admin.display(description="Destino", ordering="n_destinatarios")
     def destino(self, obj):
         partes = []
-        u = getattr(obj, 'unidade', None)
-        if u:
-            mor = getattr(u, 'morador', None)
+        if obj.unidade_id:
+            mor = obj.unidade.morador
             if mor:
-                partes.append(
-                    '<span class="badge badge-info">Unidade → {}</span>'.format(
-                        mor.get_full_name() or mor.username
-                    )
-                )
+                partes.append(format_html(
+                    '<span class="badge badge-info">Unidade → {}</span>', mor.get_full_name() or mor.username
+                ))
             else:
-                partes.append('<span class="badge badge-secondary">Unidade (sem morador)</span>')
+                partes.append(format_html('<span class="badge badge-secondary">Unidade (sem morador)</span>'))
         if obj.morador_alvo_id:
             nome = obj.morador_alvo.get_full_name() or obj.morador_alvo.username
-            partes.append('<span class="badge badge-primary">Direto → {}</span>'.format(nome))
-        if obj.pk and obj.destinatarios.exists():
-            partes.append('<span class="badge badge-warning">Grupo → {} moradore(s)</span>'.format(
-                obj.destinatarios.count()
+            partes.append(format_html('<span class="badge badge-primary">Direto → {}</span>', nome))
+        if obj.n_destinatarios:
+            nomes = ", ".join(u.get_full_name() or u.username for u in obj.destinatarios.all())
+            partes.append(format_html(
+                '<span class="badge badge-warning" title="{}">Grupo → {} moradore(s)</span>',
+                nomes, obj.n_destinatarios,
             ))
         if not partes:
-            partes.append('<span class="badge badge-light">—</span>')
-        return format_html(" ".join(partes))
-    destino.short_description = "Destino"
+            partes.append(format_html('<span class="badge badge-light">—</span>'))
+        return format_html_join(" ", "{}", ((p,) for p in partes))
+
+    @admin.display(description="Valor devido")
+    def valor_devido_str(self, obj):
+        return f"R$ {obj.valor_devido}" if obj.pk else "—"
+
+    @admin.display(description="Status", ordering="status_atual")
+    def status_badge(self, obj):
+        return format_html(
+            '<span style="background:{};color:#fff;border-radius:999px;padding:2px 8px;font-size:12px;">{}</span>',
+            obj.status_color, obj.status
+        )
 
     def has_boleto(self, obj):
         return bool(obj.boleto_pdf)
@@ -137,4 +279,127 @@ class LancamentoAdmin(admin.ModelAdmin):
         if not obj.comprovante_pdf:
             return "—"
         return format_html('<a href="{}" target="_blank">📎 Abrir comprovante</a>', obj.comprovante_pdf.url)
-    comprovante_link_detail.short_description = "Abrir comprovante"
\ No newline at end of file
+    comprovante_link_detail.short_description = "Abrir comprovante"
+
+
+# ---------------- Conciliação bancária ----------------
+class ExtratoImportadoForm(forms.ModelForm):
+    class Meta:
+        model = ExtratoImportado
+        fields = ('arquivo', 'condominio')
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data['arquivo']
+        conteudo = arquivo.read()
+        arquivo.seek(0)
+        anterior = conciliacao.ja_importado(conteudo)
+        if anterior:
+            raise ValidationError(f"Este extrato já foi importado ({anterior}).")
+        conciliacao.ler_extrato(arquivo.name, conteudo)  # formato inválido vira erro do campo
+        return arquivo
+
+
+@admin.register(ExtratoImportado)
+class ExtratoImportadoAdmin(admin.ModelAdmin):
+    """Upload do extrato (CSV/OFX): ao salvar, os créditos são conciliados em lote."""
+    form = ExtratoImportadoForm
+    list_display = ('__str__', 'condominio', 'creditos', 'conciliados', 'em_revisao', 'importado_por', 'importado_em')
+    list_filter = ('condominio',)
+    list_select_related = ('condominio', 'importado_por')
+    readonly_fields = ('creditos', 'conciliados', 'em_revisao', 'importado_por', 'importado_em')
+
+    def get_fields(self, request, obj=None):
+        return ('arquivo', 'condominio') + (self.readonly_fields if obj else ())
+
+    def has_change_permission(self, request, obj=None):
+        return False  # reimportar = subir outro arquivo
+
+    def save_model(self, request, obj, form, change):
+        obj.importado_por = request.user
+        resumo = conciliacao.importar(obj)
+        S = MovimentoBancario.Status
+        self.message_user(
+            request,
+            f"{resumo['creditos']} crédito(s) lido(s): {resumo[S.CONCILIADO]} conciliado(s), "
+            f"{resumo[S.REVISAO]} em revisão, {resumo[S.SEM_CORRESPONDENCIA]} sem correspondência, "
+            f"{resumo['repetidos']} já importado(s) antes.",
+            messages.SUCCESS,
+        )
+
+
+@admin.register(MovimentoBancario)
+class MovimentoBancarioAdmin(admin.ModelAdmin):
+    """
+    Fila de revisão da conciliação. Escolher o lançamento e salvar marca o movimento
+    como CONCILIADO e o lançamento como pago na data do crédito.
+    """
+    list_display = ('data', 'valor', 'descricao', 'documento', 'status', 'lancamento')
+    list_filter = ('status', ('data', admin.DateFieldListFilter), 'extrato')
+    search_fields = ('descricao', 'documento', 'chave')
+    list_select_related = ('lancamento',)
+    date_hierarchy = 'data'
+    autocomplete_fields = ('lancamento',)
+    fields = ('extrato', 'data', 'valor', 'descricao', 'documento', 'chave', 'status', 'candidatos_links', 'lancamento')
+    readonly_fields = ('extrato', 'data', 'valor', 'descricao', 'documento', 'chave', 'status', 'candidatos_links')
+    actions = ['ignorar']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="Candidatos")
+    def candidatos_links(self, obj):
+        if not obj.candidatos:
+            return "—"
+        return format_html_join(
+            ' ', '<a href="{}" target="_blank">#{}</a>',
+            ((reverse('admin:financeiro_lancamento_change', args=[pk]), pk) for pk in obj.candidatos),
+        )
+
+    def save_model(self, request, obj, form, change):
+        if obj.lancamento_id and obj.status != MovimentoBancario.Status.CONCILIADO:
+            obj.status = MovimentoBancario.Status.CONCILIADO
+            lanc = obj.lancamento
+            if not lanc.pago_em:
+                lanc.pago_em = obj.data
+                lanc.save(update_fields=['pago_em'])
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description="Ignorar (não é pagamento de lançamento)")
+    def ignorar(self, request, queryset):
+        n = queryset.exclude(status=MovimentoBancario.Status.CONCILIADO).update(
+            status=MovimentoBancario.Status.IGNORADO
+        )
+        self.message_user(request, f"{n} movimento(s) ignorado(s).", messages.SUCCESS)
+
+
+@admin.register(EventoPagamento)
+class EventoPagamentoAdmin(admin.ModelAdmin):
+    """
+    Avisos de pagamento recebidos por webhook (só leitura). Os que não deram baixa
+    podem voltar para a fila depois de corrigido o lançamento.
+    """
+    list_display = ('recebido_em', 'provedor', 'chave', 'referencia', 'valor', 'pago_em', 'status', 'lancamento')
+    list_filter = ('status', 'provedor', ('pago_em', admin.DateFieldListFilter))
+    search_fields = ('chave', 'referencia')
+    list_select_related = ('lancamento',)
+    date_hierarchy = 'recebido_em'
+    actions = ['reprocessar']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def has_reprocessar_permission(self, request):
+        return request.user.has_perm('financeiro.reprocessar_eventopagamento')
+
+    @admin.action(description="Reprocessar (voltar para a fila)", permissions=['reprocessar'])
+    def reprocessar(self, request, queryset):
+        n = queryset.exclude(
+            status__in=[EventoPagamento.Status.PENDENTE, EventoPagamento.Status.PROCESSADO]
+        ).update(status=EventoPagamento.Status.PENDENTE, processado_em=None)
+        self.message_user(request, f"{n} evento(s) de volta na fila; rode processar_pagamentos.", messages.SUCCESS)
@@ -0,0 +1,122 @@
+# financeiro/arquivos.py
+"""
+Armazenamento de boletos e comprovantes.
+
+Os arquivos são endereçados pelo conteúdo: `financeiro/arquivos/<aa>/<sha256>.<ext>`.
+O mesmo PDF enviado várias vezes (ou para vários lançamentos) vira um único blob,
+e os FileFields dos lançamentos apontam para ele. Por isso um blob nunca deve ser
+apagado junto com um lançamento.
+
+No upload do morador, `UploadVerificado` é o primeiro handler da requisição:
+confere tamanho e tipo (pela assinatura do conteúdo, não pela extensão) à medida
+que os chunks chegam e calcula o SHA-256 no caminho. Um arquivo recusado é
+descartado sem chegar ao disco.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+PASTA = 'financeiro/arquivos'
+TAMANHO_MAXIMO = 10 * 1024 * 1024  # 10 MB
+FOLGA_MULTIPART = 64 * 1024  # cabeçalhos e demais campos do formulário
+
+PDF = ('pdf',)
+PDF_OU_IMAGEM = ('pdf', 'png', 'jpg', 'webp')
+
+ERRO_TAMANHO = f"O arquivo passa de {TAMANHO_MAXIMO // (1024 * 1024)} MB."
+ERRO_TIPO = "Envie um PDF ou uma imagem (PNG, JPG ou WebP)."
+
+
+def tipo_do_conteudo(inicio):
+    """Extensão a partir dos primeiros bytes do arquivo, ou None se não for aceito."""
+    if inicio.startswith(b'%PDF-'):
+        return 'pdf'
+    if inicio.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if inicio.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if inicio[:4] == b'RIFF' and inicio[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def validar(arquivo, tipos=PDF_OU_IMAGEM):
+    """Confere tamanho e assinatura de um arquivo já recebido. Retorna a extensão."""
+    if arquivo.size > TAMANHO_MAXIMO:
+        raise ValidationError(ERRO_TAMANHO)
+    arquivo.seek(0)
+    tipo = tipo_do_conteudo(arquivo.read(16))
+    arquivo.seek(0)
+    if tipo not in tipos:
+        raise ValidationError(ERRO_TIPO if tipos == PDF_OU_IMAGEM else "Envie um arquivo PDF.")
+    return tipo
+
+
+def sha256(arquivo):
+    h = hashlib.sha256()
+    arquivo.seek(0)
+    for chunk in arquivo.chunks():
+        h.update(chunk)
+    arquivo.seek(0)
+    return h.hexdigest()
+
+
+def guardar(arquivo, tipos=PDF_OU_IMAGEM, hash_conteudo=None):
+    """
+    Valida e grava `arquivo` pelo conteúdo; retorna o nome no storage, para atribuir
+    ao FileField. Se o blob já existe nada é gravado. `hash_conteudo` evita reler o
+    arquivo quando o SHA-256 já foi calculado no upload.
+    """
+    tipo = validar(arquivo, tipos)
+    hash_conteudo = hash_conteudo or sha256(arquivo)
+    nome = f"{PASTA}/{hash_conteudo[:2]}/{hash_conteudo}.{tipo}"
+    if not default_storage.exists(nome):
+        salvo = default_storage.save(nome, arquivo)
+        if salvo != nome:
+            # outra requisição gravou o mesmo conteúdo entre o exists() e o save()
+            default_storage.delete(salvo)
+    return nome
+
+
+class UploadVerificado(FileUploadHandler):
+    """
+    Handler que roda antes dos padrões do Django: recusa cedo (SkipFile) arquivos
+    grandes demais ou de tipo não aceito e calcula o SHA-256 de cada arquivo enquanto
+    os chunks passam. Depois do parse, `hashes[campo]` tem o hash e `recusados[campo]`
+    o motivo da recusa. Precisa ser instalado antes de `request.POST`/`FILES` serem
+    lidos (ver views.enviar_comprovante).
+    """
+
+    def __init__(self, request=None, tipos=PDF_OU_IMAGEM):
+        super().__init__(request)
+        self.tipos = tipos
+        self.hashes = {}
+        self.recusados = {}
+        self._corpo_grande = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self._corpo_grande = content_length > TAMANHO_MAXIMO + FOLGA_MULTIPART
+
+    def _recusar(self, motivo):
+        self.recusados[self.field_name] = motivo
+        raise SkipFile
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._hash = hashlib.sha256()
+        if self._corpo_grande or (self.content_length or 0) > TAMANHO_MAXIMO:
+            self._recusar(ERRO_TAMANHO)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > TAMANHO_MAXIMO:
+            self._recusar(ERRO_TAMANHO)
+        if start == 0 and tipo_do_conteudo(raw_data[:16]) not in self.tipos:
+            self._recusar(ERRO_TIPO)
+        self._hash.update(raw_data)
+        return raw_data  # segue para o handler que grava o arquivo
+
+    def file_complete(self, file_size):
+        self.hashes[self.field_name] = self._hash.hexdigest()
+        return None
@@ -0,0 +1,400 @@
+# financeiro/boletos.py
+"""
+Boletos (documento de cobrança) gerados pelo próprio CondoX.
+
+O PDF é escrito à mão (uma página A4, Helvetica, sem dependências) a partir de um
+dict simples com os dados do lançamento, para a renderização poder rodar em outro
+processo: `gerar_boletos()` lê os lançamentos em uma query, distribui `renderizar`
+num ProcessPoolExecutor e grava os arquivos (em PASTA) no processo principal, com um
+bulk_update no fim. Deve rodar fora de transação: se o bulk_update falhar os arquivos
+novos são apagados, e os substituídos só saem depois do commit.
+
+Lançamentos que já têm boleto (p.ex. o boleto registrado no banco, enviado pelo
+gestor) são pulados, salvo pedido explícito de substituição; mesmo assim só arquivos
+gerados aqui (em PASTA) são apagados.
+
+Na web nada é renderizado: a ação do admin só marca `boleto_solicitado_em`, e o
+comando `gerar_boletos` (agendado) processa a fila.
+
+Código de barras e linha digitável seguem o layout FEBRABAN (44 posições, ITF);
+o campo livre é convênio + nosso número (o id do lançamento), ver settings.BOLETO_*.
+Código de barras, "Valor do documento" e PIX copia e cola levam o mesmo valor: o
+devido na emissão (`Lancamento.valor_devido`).
+"""
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import pagamentos
+from .models import Lancamento
+
+LOTE = 500
+MINIMO_PARALELO = 50  # abaixo disso o custo de subir os processos não compensa
+DATA_BASE_FATOR = date(1997, 10, 7)
+PASTA = 'financeiro/boletos'  # só os boletos gerados por este módulo
+PRAZO_LOTE = 60 * 30  # segundos; depois disso um lote reivindicado volta para a fila
+
+
+def verificar_configuracao():
+    """ImproperlyConfigured se banco/convênio do beneficiário não estão configurados."""
+    banco, convenio = settings.BOLETO_BANCO, settings.BOLETO_CONVENIO
+    if not (len(banco) == 3 and banco.isdigit() and banco != '000'):
+        raise ImproperlyConfigured("BOLETO_BANCO deve ser o código de 3 dígitos do banco emissor.")
+    if not (convenio.isdigit() and 0 < len(convenio) <= 8 and int(convenio)):
+        raise ImproperlyConfigured("BOLETO_CONVENIO deve ser o convênio (até 8 dígitos) fornecido pelo banco.")
+
+
+def gerado_aqui(nome):
+    return (nome or '').startswith(f"{PASTA}/")
+
+
+def sem_boleto(lancamentos):
+    return lancamentos.filter(Q(boleto_pdf='') | Q(boleto_pdf__isnull=True))
+
+
+# ---------------- código de barras ----------------
+def _modulo10(numero):
+    soma = 0
+    for i, d in enumerate(reversed(numero)):
+        p = int(d) * (2 if i % 2 == 0 else 1)
+        soma += p // 10 + p % 10
+    return str((10 - soma % 10) % 10)
+
+
+def _modulo11(numero):
+    soma = sum(int(d) * (2 + i % 8) for i, d in enumerate(reversed(numero)))
+    dv = 11 - soma % 11
+    return '1' if dv in (0, 10, 11) else str(dv)
+
+
+def fator_vencimento(vencimento):
+    """
+    Dias desde 07/10/1997; desde 22/02/2025 o fator recomeça em 1000. ValueError se
+    o vencimento não cabe no fator (4 dígitos).
+    """
+    fator = (vencimento - DATA_BASE_FATOR).days
+    fator = fator if fator <= 9999 else fator - 9000
+    if not 1 <= fator <= 9999:
+        raise ValueError(f"Vencimento {vencimento:%d/%m/%Y} fora do intervalo do fator de vencimento.")
+    return fator
+
+
+def codigo_barras(banco, convenio, pk, vencimento, valor):
+    """Código de barras (44 dígitos). ValueError se algum campo não cabe no layout."""
+    centavos = int(Decimal(valor) * 100)
+    if not 0 <= centavos < 10 ** 10:
+        raise ValueError(f"Valor R$ {valor} fora do limite do boleto (até R$ 99.999.999,99).")
+    campo_livre = f"{convenio:0>8.8}{pk:017d}"
+    sem_dv = f"{banco:0>3.3}9{fator_vencimento(vencimento):04d}{centavos:010d}{campo_livre}"
+    codigo = sem_dv[:4] + _modulo11(sem_dv) + sem_dv[4:]
+    if len(codigo) != 44 or not codigo.isdigit():
+        raise ValueError(f"Código de barras inválido para o lançamento {pk}.")
+    return codigo
+
+
+def linha_digitavel(codigo):
+    """AAABC.CCCCX DDDDD.DDDDDY EEEEE.EEEEEZ K UUUUVVVVVVVVVV"""
+    livre = codigo[19:]
+    c1 = codigo[:4] + livre[:5]
+    c2 = livre[5:15]
+    c3 = livre[15:25]
+    c1, c2, c3 = (c + _modulo10(c) for c in (c1, c2, c3))
+    return f"{c1[:5]}.{c1[5:]} {c2[:5]}.{c2[5:]} {c3[:5]}.{c3[5:]} {codigo[4]} {codigo[5:19]}"
+
+
+_ITF = {
+    '0': 'nnwwn', '1': 'wnnnw', '2': 'nwnnw', '3': 'wwnnn', '4': 'nnwnw',
+    '5': 'wnwnn', '6': 'nwwnn', '7': 'nnnww', '8': 'wnnwn', '9': 'nwnwn',
+}
+
+
+def barras_itf(codigo, estreita=0.95, larga=2.85):
+    """Larguras alternadas barra/espaço (começando por barra) do Intercalado 2 de 5."""
+    larguras = [estreita] * 4  # início: barra, espaço, barra, espaço
+    for a, b in zip(codigo[::2], codigo[1::2]):
+        for x, y in zip(_ITF[a], _ITF[b]):
+            larguras += [larga if x == 'w' else estreita, larga if y == 'w' else estreita]
+    return larguras + [larga, estreita, estreita]  # fim: barra larga, espaço, barra
+
+
+# ---------------- PDF ----------------
+def _texto_pdf(s):
+    s = s.encode('cp1252', 'replace').decode('latin-1')
+    return s.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+class _Pagina:
+    """Operadores de conteúdo de uma página; coordenadas em pontos a partir do topo."""
+    ALTURA = 842
+
+    def __init__(self):
+        self.ops = []
+
+    def texto(self, x, y, s, tamanho=9, negrito=False):
+        fonte = 'F2' if negrito else 'F1'
+        self.ops.append(f"BT /{fonte} {tamanho} Tf {x:.2f} {self.ALTURA - y:.2f} Td ({_texto_pdf(s)}) Tj ET")
+
+    def caixa(self, x, y, largura, altura, rotulo, valor, negrito=False):
+        self.ops.append(f"0.5 w {x:.2f} {self.ALTURA - y - altura:.2f} {largura:.2f} {altura:.2f} re S")
+        self.texto(x + 3, y + 8, rotulo, 6)
+        self.texto(x + 3, y + altura - 5, valor, 9, negrito)
+
+    def linha(self, x1, y, x2, tracejada=False):
+        traco = "[3 2] 0 d " if tracejada else ""
+        self.ops.append(f"{traco}0.5 w {x1:.2f} {self.ALTURA - y:.2f} m {x2:.2f} {self.ALTURA - y:.2f} l S [] 0 d")
+
+    def barras(self, x, y, larguras, altura=37):
+        for i, w in enumerate(larguras):
+            if i % 2 == 0:
+                self.ops.append(f"{x:.2f} {self.ALTURA - y - altura:.2f} {w:.2f} {altura} re f")
+            x += w
+
+    def conteudo(self):
+        return "\n".join(self.ops).encode('latin-1')
+
+
+def _montar_pdf(conteudo):
+    stream = zlib.compress(conteudo)
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream",
+    ]
+    saida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    posicoes = []
+    for n, obj in enumerate(objetos, start=1):
+        posicoes.append(len(saida))
+        saida += b"%d 0 obj\n" % n + obj + b"\nendobj\n"
+    xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    saida += b"".join(b"%010d 00000 n \n" % p for p in posicoes)
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, xref)
+    return bytes(saida)
+
+
+def _moeda(valor):
+    inteiro, centavos = f"{Decimal(valor):.2f}".split('.')
+    return f"R$ {int(inteiro):,}".replace(',', '.') + f",{centavos}"
+
+
+def renderizar(dados):
+    """
+    PDF (bytes) do boleto descrito por `dados` (ver dados_do_lancamento). Não toca
+    no banco nem nos settings: pode rodar em qualquer processo.
+    """
+    codigo = codigo_barras(dados['banco'], dados['convenio'], dados['id'], dados['vencimento'], dados['valor'])
+    linha = linha_digitavel(codigo)
+    banco = f"{dados['banco']:0>3.3}"
+    venc = f"{dados['vencimento']:%d/%m/%Y}"
+    valor = _moeda(dados['valor'])
+    nosso_numero = f"{dados['id']:017d}"
+    p = _Pagina()
+
+    # recibo do pagador
+    p.texto(40, 50, dados['beneficiario'], 14, negrito=True)
+    p.texto(40, 66, dados['endereco'], 8)
+    p.texto(40, 96, "Recibo do pagador", 11, negrito=True)
+    p.caixa(40, 106, 345, 28, "Pagador", dados['pagador'])
+    p.caixa(385, 106, 170, 28, "Vencimento", venc, negrito=True)
+    p.caixa(40, 134, 345, 28, "Unidade", dados['unidade'])
+    p.caixa(385, 134, 170, 28, "Valor do documento", valor, negrito=True)
+    p.caixa(40, 162, 345, 28, "Descrição", dados['descricao'])
+    p.caixa(385, 162, 170, 28, "Competência", f"{dados['competencia']:%m/%Y}")
+    p.texto(40, 208, f"Nosso número: {nosso_numero}", 8)
+    if dados['pix']:
+        p.texto(40, 222, "Pague com PIX (copia e cola):", 7, negrito=True)
+        p.texto(40, 232, dados['pix'], 5)
+    p.linha(40, 250, 555, tracejada=True)
+    p.texto(40, 245, "Corte na linha pontilhada", 6)
+
+    # ficha de compensação
+    p.texto(40, 285, banco, 14, negrito=True)
+    p.texto(140, 285, linha, 11, negrito=True)
+    p.linha(40, 292, 555)
+    p.caixa(40, 296, 385, 28, "Local de pagamento", dados['local_pagamento'])
+    p.caixa(425, 296, 130, 28, "Vencimento", venc, negrito=True)
+    p.caixa(40, 324, 385, 28, "Beneficiário", dados['beneficiario'])
+    p.caixa(425, 324, 130, 28, "Nosso número", nosso_numero)
+    p.caixa(40, 352, 130, 28, "Data do documento", f"{dados['emissao']:%d/%m/%Y}")
+    p.caixa(170, 352, 130, 28, "Nº do documento", str(dados['id']))
+    p.caixa(300, 352, 125, 28, "Espécie", "R$")
+    p.caixa(425, 352, 130, 28, "(=) Valor do documento", valor, negrito=True)
+    p.caixa(40, 380, 515, 40, "Instruções", "Não receber após 60 dias do vencimento.")
+    p.caixa(40, 420, 515, 34, "Pagador", f"{dados['pagador']} • {dados['unidade']}")
+    p.barras(40, 470, barras_itf(codigo))
+    p.texto(400, 520, "Ficha de compensação", 7)
+    return _montar_pdf(p.conteudo())
+
+
+# ---------------- lote ----------------
+def _pagador(l):
+    usuario = l.morador_alvo or (l.unidade.morador if l.unidade_id else None)
+    return (usuario.get_full_name() or usuario.username) if usuario else "—"
+
+
+def dados_do_lancamento(l, emissao):
+    """Só tipos simples: o dict atravessa a fronteira entre processos."""
+    condominio = l.unidade.condominio if l.unidade_id else None
+    unidade = ""
+    if l.unidade_id:
+        unidade = f"{l.unidade.bloco.nome} - {l.unidade.numero}" if l.unidade.bloco_id else l.unidade.numero
+    return {
+        'id': l.pk,
+        'beneficiario': condominio.nome if condominio else "CondoX",
+        'endereco': condominio.endereco if condominio else "",
+        'pagador': _pagador(l),
+        'unidade': unidade,
+        'descricao': l.descricao or l.get_tipo_display(),
+        'competencia': l.competencia,
+        'vencimento': l.vencimento,
+        'valor': l.valor_devido,  # o mesmo do PIX copia e cola: valor + multa + juros
+        'emissao': emissao,
+        'banco': settings.BOLETO_BANCO,
+        'convenio': settings.BOLETO_CONVENIO,
+        'local_pagamento': settings.BOLETO_LOCAL_PAGAMENTO,
+        'pix': pagamentos.copia_e_cola(l) or '',
+    }
+
+
+def _renderizar_item(dados):
+    """(pdf, None) ou (None, erro): um item com problema não derruba o lote."""
+    try:
+        return renderizar(dados), None
+    except Exception as e:
+        return None, str(e) or e.__class__.__name__
+
+
+def _processos_padrao():
+    return max(1, min(os.cpu_count() or 1, 8))
+
+
+def gerar_boletos(lancamentos, processos=None, sobrescrever=False):
+    """
+    Renderiza e grava o boleto de cada lançamento (queryset ou lista de ids). Quem já
+    tem boleto é pulado, a não ser com `sobrescrever=True`. `processos=1` renderiza
+    no próprio processo. Retorna o nº de boletos gravados.
+
+    Um lançamento que não vira boleto válido (valor ou vencimento fora do layout)
+    sai da fila com o motivo em `boleto_erro`; os demais seguem normalmente.
+    """
+    verificar_configuracao()
+    if not isinstance(lancamentos, models.QuerySet):
+        lancamentos = Lancamento.objects.filter(pk__in=list(lancamentos))
+    if not sobrescrever:
+        lancamentos = sem_boleto(lancamentos)
+    itens = list(
+        lancamentos.order_by('pk')
+        .select_related('unidade__condominio', 'unidade__bloco', 'unidade__morador', 'morador_alvo')
+    )
+    if not itens:
+        return 0
+    emissao = timezone.localdate()
+    validos, dados = [], []
+    for l in itens:
+        l.boleto_solicitado_em = None
+        d = dados_do_lancamento(l, emissao)
+        try:
+            codigo_barras(d['banco'], d['convenio'], d['id'], d['vencimento'], d['valor'])
+        except ValueError as e:
+            l.boleto_erro = str(e)
+            continue
+        validos.append(l)
+        dados.append(d)
+
+    processos = processos or _processos_padrao()
+    if processos == 1 or len(dados) < MINIMO_PARALELO:
+        resultados = map(_renderizar_item, dados)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=processos)
+        resultados = pool.map(_renderizar_item, dados, chunksize=max(1, len(dados) // (processos * 4)))
+
+    gerados = 0
+    gravados, substituidos = [], []  # (storage, nome)
+    try:
+        for l, (pdf, erro) in zip(validos, resultados):
+            if erro:
+                l.boleto_erro = erro
+                continue
+            storage = l.boleto_pdf.storage
+            if gerado_aqui(l.boleto_pdf.name):
+                substituidos.append((storage, l.boleto_pdf.name))  # regeração; arquivos enviados ficam
+            l.boleto_pdf.name = storage.save(f"{PASTA}/{l.pk}/boleto-{l.competencia:%Y-%m}.pdf", ContentFile(pdf))
+            gravados.append((storage, l.boleto_pdf.name))
+            l.boleto_erro = ''
+            gerados += 1
+        Lancamento.objects.bulk_update(itens, ['boleto_pdf', 'boleto_solicitado_em', 'boleto_erro'], batch_size=LOTE)
+    except BaseException:
+        _apagar(gravados)  # nenhuma linha aponta para eles: não ficam órfãos no storage
+        raise
+    finally:
+        if pool:
+            pool.shutdown()
+
+    # os arquivos antigos só saem depois que o banco já aponta para os novos
+    transaction.on_commit(lambda: _apagar(substituidos))
+    return gerados
+
+
+def _apagar(arquivos):
+    for storage, nome in arquivos:
+        storage.delete(nome)
+
+
+def solicitar(lancamentos, sobrescrever=False):
+    """
+    Enfileira a geração (ação do admin). Sem `sobrescrever`, quem já tem boleto não
+    entra na fila. Retorna quantos foram marcados.
+    """
+    verificar_configuracao()
+    if not sobrescrever:
+        lancamentos = sem_boleto(lancamentos)
+    return lancamentos.update(boleto_solicitado_em=timezone.now())
+
+
+def _reivindicar(lote):
+    """
+    Reserva até `lote` pedidos numa transação curta: adia `boleto_solicitado_em` para
+    o fim do PRAZO_LOTE. Outra instância do comando não os pega; se este processo
+    morrer no meio, eles voltam para a fila quando o prazo passar.
+    """
+    agora = timezone.now()
+    prazo = agora + timedelta(seconds=PRAZO_LOTE)
+    with transaction.atomic():
+        qs = Lancamento.objects.filter(boleto_solicitado_em__lte=agora)
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True, of=('self',))
+        ids = list(qs.order_by('boleto_solicitado_em', 'pk').values_list('pk', flat=True)[:lote])
+        # o filtro repetido descarta os que outra instância reivindicou entre a leitura e o UPDATE (SQLite)
+        Lancamento.objects.filter(pk__in=ids, boleto_solicitado_em__lte=agora).update(boleto_solicitado_em=prazo)
+    return list(Lancamento.objects.filter(pk__in=ids, boleto_solicitado_em=prazo).values_list('pk', flat=True))
+
+
+def processar_solicitados(lote=LOTE, processos=None):
+    """
+    Gera os boletos pendentes em lotes de `lote`. Retorna o total.
+
+    Nenhuma transação fica aberta durante a renderização: cada lote é reivindicado
+    numa transação curta (SKIP LOCKED no PostgreSQL) e gerado fora dela por
+    `gerar_boletos`. Duas execuções do comando não geram o mesmo boleto.
+    """
+    total = 0
+    while True:
+        ids = _reivindicar(lote)
+        if not ids:
+            return total
+        # quem decide sobre substituir é `solicitar`, na hora de enfileirar
+        total += gerar_boletos(ids, processos, sobrescrever=True)
@@ -0,0 +1,35 @@
+# financeiro/cache.py
+"""
+Versão dos dados financeiros no cache.
+
+Relatórios agregados (ex.: inadimplência) guardam o resultado numa chave que inclui
+este contador; qualquer alteração em lançamentos o incrementa após o commit e as
+entradas antigas deixam de ser lidas (expiram sozinhas). Mesmo esquema de
+`reservas.cache`.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+CHAVE_VERSAO = "financeiro:versao"
+
+
+def versao():
+    valor = cache.get(CHAVE_VERSAO)
+    if valor is None:
+        cache.add(CHAVE_VERSAO, time.time_ns(), None)
+        valor = cache.get(CHAVE_VERSAO)
+    return valor
+
+
+def _incrementar():
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.set(CHAVE_VERSAO, time.time_ns(), None)
+
+
+def invalidar():
+    """Lançamentos mudaram: relatórios em cache ficam inválidos após o commit."""
+    transaction.on_commit(_incrementar)
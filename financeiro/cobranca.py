@@ -0,0 +1,141 @@
+# financeiro/cobranca.py
+"""
+Geração em lote das cotas condominiais do mês ("gerar cotas").
+
+Uma rodada lê as unidades do condomínio e as cotas já existentes na competência
+(duas queries), calcula o valor de cada unidade e grava só as que faltam com
+`bulk_create`, numa transação. Rodar de novo não duplica nada: unidades que já
+têm COTA na competência são puladas (e a constraint `lanc_cota_unica_unidade_competencia`
+garante isso no banco). `simular=True` devolve a mesma diferença sem gravar.
+"""
+from decimal import ROUND_DOWN, Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from condominios.models import Condominio, Unidade
+
+from . import cache as fin_cache
+from . import saldos, visibilidade
+from .models import Lancamento
+
+CENTAVO = Decimal('0.01')
+LOTE = 1000
+
+
+class RodadaCotas:
+    """Resultado (ou simulação) de uma rodada: o que seria/foi criado e o que ficou de fora."""
+
+    def __init__(self, condominio, competencia, vencimento):
+        self.condominio = condominio
+        self.competencia = competencia
+        self.vencimento = vencimento
+        self.novas = []           # Lancamento (com pk depois de gravar)
+        self.existentes = []      # Unidade que já tem a cota
+        self.sem_fracao = []      # Unidade sem fração ideal (rateio por fração)
+        self.gravada = False
+
+    @property
+    def total(self):
+        return sum((l.valor for l in self.novas), Decimal('0'))
+
+    def linhas(self):
+        """Diff legível: [(sinal, unidade, valor)] — '+' criar, '=' já existe, '!' sem fração."""
+        return (
+            [('+', l.unidade, l.valor) for l in self.novas]
+            + [('=', u, None) for u in self.existentes]
+            + [('!', u, None) for u in self.sem_fracao]
+        )
+
+    def __str__(self):
+        acao = "criadas" if self.gravada else "a criar"
+        return (
+            f"{self.condominio} • {self.competencia:%m/%Y}: {len(self.novas)} cota(s) {acao} "
+            f"(R$ {self.total}), {len(self.existentes)} já existente(s), "
+            f"{len(self.sem_fracao)} sem fração ideal"
+        )
+
+
+def ratear(total, pesos):
+    """
+    Divide `total` proporcionalmente a `pesos` em centavos, sem sobra: cada parte é
+    arredondada para baixo e os centavos restantes vão para as maiores frações
+    descartadas (método do maior resto).
+    """
+    soma = sum(pesos)
+    if not soma:
+        raise ValidationError("A soma das frações ideais é zero.")
+    exatos = [total * p / soma for p in pesos]
+    partes = [e.quantize(CENTAVO, rounding=ROUND_DOWN) for e in exatos]
+    sobra = int((total - sum(partes)) / CENTAVO)
+    for i in sorted(range(len(pesos)), key=lambda i: exatos[i] - partes[i], reverse=True)[:sobra]:
+        partes[i] += CENTAVO
+    return partes
+
+
+def gerar_cotas(condominio, competencia, vencimento, valor=None, total=None, descricao='', simular=False):
+    """
+    Cria a COTA de `competencia` (normalizada para o dia 1) para cada unidade do
+    `condominio`. Regra de valor: `valor` fixo por unidade, OU `total` rateado pela
+    fração ideal. Retorna RodadaCotas.
+    """
+    if (valor is None) == (total is None):
+        raise ValidationError("Informe o valor fixo por unidade OU o total a ratear pela fração ideal.")
+    if not isinstance(condominio, Condominio):
+        condominio = Condominio.objects.get(pk=condominio)
+    competencia = competencia.replace(day=1)
+    rodada = RodadaCotas(condominio, competencia, vencimento)
+
+    with transaction.atomic():
+        if not simular:
+            # serializa rodadas concorrentes do mesmo condomínio
+            list(Condominio.objects.select_for_update().filter(pk=condominio.pk).values_list('pk'))
+
+        unidades = list(
+            Unidade.objects.filter(condominio=condominio)
+            .select_related('condominio', 'bloco')  # __str__ da unidade no resumo
+            .order_by('bloco__nome', 'numero', 'pk')
+        )
+        ja_tem = set(
+            Lancamento.objects.filter(
+                unidade__condominio=condominio, competencia=competencia, tipo=Lancamento.Tipo.COTA,
+            ).values_list('unidade_id', flat=True)
+        )
+        rodada.existentes = [u for u in unidades if u.pk in ja_tem]
+        faltando = [u for u in unidades if u.pk not in ja_tem]
+
+        if total is not None:
+            # o rateio considera todas as unidades com fração, inclusive as que já têm cota,
+            # para o valor de cada uma não depender de quando a rodada foi executada
+            com_fracao = [u for u in unidades if u.fracao_ideal]
+            rodada.sem_fracao = [u for u in faltando if not u.fracao_ideal]
+            valores = dict(zip(
+                (u.pk for u in com_fracao),
+                ratear(Decimal(total), [u.fracao_ideal for u in com_fracao]),
+            ))
+            faltando = [u for u in faltando if u.fracao_ideal]
+        else:
+            valores = {u.pk: Decimal(valor).quantize(CENTAVO) for u in faltando}
+
+        rodada.novas = [
+            Lancamento(
+                unidade=u, tipo=Lancamento.Tipo.COTA,
+                competencia=competencia, vencimento=vencimento,
+                valor=valores[u.pk],
+                descricao=descricao or f"Cota condominial {competencia:%m/%Y}",
+            )
+            for u in faltando
+        ]
+        if simular or not rodada.novas:
+            return rodada
+
+        try:
+            criadas = Lancamento.objects.bulk_create(rodada.novas, batch_size=LOTE)
+        except IntegrityError:
+            raise ValidationError("Outra rodada gerou cotas desta competência ao mesmo tempo. Simule de novo.")
+        # bulk_create não dispara post_save: sincroniza quem vê as cotas novas
+        visibilidade.sincronizar(l.pk for l in criadas)
+        saldos.agendar({(l.unidade_id, l.competencia) for l in criadas})
+        fin_cache.invalidar()
+        rodada.gravada = True
+    return rodada
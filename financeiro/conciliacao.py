@@ -0,0 +1,371 @@
+# financeiro/conciliacao.py
+"""
+Conciliação de extratos bancários (CSV ou OFX) com os lançamentos em aberto.
+
+1. O arquivo é lido inteiro e vira uma lista de créditos (débitos são ignorados).
+2. Os lançamentos em aberto que podem casar (vencimento dentro da janela dos
+   créditos) são carregados UMA vez num índice em memória: valor devido (valor +
+   multa + juros, somado no SQL) → lista ordenada por vencimento, mais os nomes de
+   quem vê cada lançamento.
+3. Cada crédito procura no índice por valor + janela de datas (bisect); o nome do
+   pagador no histórico confirma o candidato. A regra é a do webhook
+   (`pagamentos._baixar`): o crédito cobre o valor devido. Exceção: crédito até o
+   vencimento cobre o valor de face (os encargos só valem depois dele). Crédito do
+   valor de face depois do vencimento, num lançamento com encargos, não quita —
+   vai para revisão com o lançamento como candidato, em vez de perdoar os encargos.
+4. É conciliado (`pago_em` via `bulk_update`) o candidato confirmado pelo nome ou,
+   em extrato de um condomínio, o único daquele valor no condomínio. O resto — inclusive
+   o candidato único só pelo valor num extrato sem condomínio, que pode ser de qualquer
+   condomínio — fica em MovimentoBancario para revisão no admin.
+
+Idempotência: o hash do arquivo é único (o mesmo extrato não é processado duas
+vezes) e cada movimento tem uma chave única (FITID no OFX, hash da linha no CSV),
+então extratos com períodos sobrepostos não repetem créditos. Lançamentos já pagos
+não entram no índice.
+"""
+import csv
+import hashlib
+import io
+import re
+import sys
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import cache as fin_cache
+from . import saldos
+from .models import ExtratoImportado, Lancamento, LancamentoVisibilidade, MovimentoBancario
+
+# um pagamento casa com lançamentos que vencem até JANELA_ANTES depois da data do
+# crédito (pagou adiantado) ou até JANELA_DEPOIS antes dela (pagou atrasado)
+JANELA_ANTES = timedelta(days=30)
+JANELA_DEPOIS = timedelta(days=90)
+MAX_CANDIDATOS = 20
+LOTE = 1000
+
+Credito = namedtuple('Credito', 'chave data valor descricao documento')
+
+
+# ---------------- leitura ----------------
+def _texto(conteudo):
+    try:
+        return conteudo.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return conteudo.decode('latin-1')
+
+
+def normalizar(texto):
+    """Maiúsculas, sem acentos e só letras/números separados por um espaço."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^A-Z0-9]+', ' ', texto.upper()).split())
+
+
+def _valor(texto):
+    texto = (texto or '').replace('R$', '').replace(' ', '').strip()
+    if ',' in texto and '.' in texto:
+        # o último separador é o decimal: 1.234,56 ou 1,234.56
+        milhar = '.' if texto.rfind(',') > texto.rfind('.') else ','
+        texto = texto.replace(milhar, '')
+    texto = texto.replace(',', '.')
+    try:
+        return Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def _data(texto):
+    texto = (texto or '').strip()
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%Y%m%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _coluna(cabecalho, *nomes):
+    for i, titulo in enumerate(cabecalho):
+        if normalizar(titulo).lower() in nomes:
+            return i
+    return None
+
+
+def ler_csv(texto):
+    """
+    CSV de extrato com cabeçalho (separador ; ou ,). Colunas reconhecidas: data,
+    valor/crédito, histórico/descrição, documento/pagador/CPF e, se houver, id.
+    """
+    try:
+        dialeto = csv.Sniffer().sniff(texto[:4096], delimiters=';,\t')
+    except csv.Error:
+        dialeto = csv.excel
+    linhas = list(csv.reader(io.StringIO(texto), dialeto))
+    if not linhas:
+        return []
+    cabecalho, *linhas = linhas
+    col_data = _coluna(cabecalho, 'data', 'data lancamento', 'data do lancamento', 'dt')
+    col_valor = _coluna(cabecalho, 'valor', 'credito', 'valor r', 'amount')
+    if col_data is None or col_valor is None:
+        raise ValidationError("CSV sem colunas de data e valor reconhecíveis.")
+    col_desc = _coluna(cabecalho, 'historico', 'descricao', 'memo', 'detalhes', 'lancamento')
+    col_doc = _coluna(cabecalho, 'documento', 'doc', 'cpf', 'cpf cnpj', 'pagador', 'nome')
+    col_id = _coluna(cabecalho, 'id', 'fitid', 'identificador', 'transacao')
+
+    def campo(linha, col):
+        return linha[col].strip() if col is not None and col < len(linha) else ''
+
+    creditos = []
+    repetidas = Counter()
+    for linha in linhas:
+        data, valor = _data(campo(linha, col_data)), _valor(campo(linha, col_valor))
+        if data is None or valor is None or valor <= 0:
+            continue  # débitos, saldos e linhas de rodapé
+        desc, doc = campo(linha, col_desc), campo(linha, col_doc)
+        ident = campo(linha, col_id)
+        if not ident:
+            # sem id do banco: a linha em si (+ ordinal entre linhas idênticas) é a chave
+            base = f"{data}|{valor}|{desc}|{doc}"
+            repetidas[base] += 1
+            ident = hashlib.sha1(f"{base}|{repetidas[base]}".encode()).hexdigest()
+        creditos.append(Credito(f"csv:{ident}"[:100], data, valor, desc[:255], doc[:100]))
+    return creditos
+
+
+_OFX_TRANSACAO = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.S | re.I)
+
+
+def _ofx_campo(bloco, tag):
+    m = re.search(rf'<{tag}>([^<\r\n]*)', bloco, re.I)
+    return m.group(1).strip() if m else ''
+
+
+def ler_ofx(texto):
+    """OFX 1.x (SGML) ou 2.x (XML): créditos dos blocos <STMTTRN>."""
+    creditos = []
+    for bloco in _OFX_TRANSACAO.findall(texto):
+        valor = _valor(_ofx_campo(bloco, 'TRNAMT'))
+        data = _data(_ofx_campo(bloco, 'DTPOSTED')[:8])
+        if data is None or valor is None or valor <= 0:
+            continue
+        fitid = _ofx_campo(bloco, 'FITID') or hashlib.sha1(bloco.encode()).hexdigest()
+        creditos.append(Credito(
+            f"ofx:{fitid}"[:100], data, valor,
+            (_ofx_campo(bloco, 'MEMO') or _ofx_campo(bloco, 'NAME'))[:255],
+            (_ofx_campo(bloco, 'NAME') or _ofx_campo(bloco, 'PAYEEID'))[:100],
+        ))
+    return creditos
+
+
+def ler_extrato(nome, conteudo):
+    texto = _texto(conteudo)
+    if nome.lower().endswith('.ofx') or '<OFX>' in texto[:2000].upper():
+        return ler_ofx(texto)
+    return ler_csv(texto)
+
+
+# ---------------- índice dos lançamentos em aberto ----------------
+def _janela(lista, de, ate):
+    """Trecho de `lista` [(vencimento, pk)], ordenada, com vencimento em [de, ate]."""
+    i = bisect_left(lista, (de, 0))
+    j = bisect_right(lista, (ate, sys.maxsize))
+    return lista[i:j]
+
+
+class IndiceAbertos:
+    """
+    valor devido → [(vencimento, pk)] ordenado, para busca por janela com bisect; o
+    mesmo por valor de face só para os lançamentos com encargos; e os nomes
+    normalizados de quem vê cada lançamento (para desempatar pelo pagador).
+    """
+
+    def __init__(self, itens, nomes, por_condominio=False):
+        self.por_condominio = por_condominio  # candidatos restritos a um condomínio
+        self._por_devido = defaultdict(list)
+        self._com_encargos = defaultdict(list)  # valor de face → [(vencimento, pk)]
+        for pk, valor, devido, vencimento in itens:
+            self._por_devido[devido].append((vencimento, pk))
+            if devido != valor:
+                self._com_encargos[valor].append((vencimento, pk))
+        for lista in (*self._por_devido.values(), *self._com_encargos.values()):
+            lista.sort()
+        self._nomes = nomes
+
+    @classmethod
+    def carregar(cls, data_min, data_max, condominio=None):
+        """Duas queries: os lançamentos em aberto da janela e os nomes de quem os vê."""
+        abertos = Lancamento.objects.em_aberto().filter(
+            vencimento__gte=data_min - JANELA_DEPOIS, vencimento__lte=data_max + JANELA_ANTES,
+        )
+        if condominio is not None:
+            abertos = abertos.filter(unidade__condominio=condominio)
+        itens = list(
+            abertos.order_by()
+            .annotate(devido=F('valor') + F('multa') + F('juros'))
+            .values_list('pk', 'valor', 'devido', 'vencimento')
+        )
+
+        nomes = defaultdict(set)
+        vis = LancamentoVisibilidade.objects.filter(lancamento__in=abertos.values('pk'))
+        for pk, primeiro, ultimo, username in vis.values_list(
+            'lancamento_id', 'usuario__first_name', 'usuario__last_name', 'usuario__username'
+        ):
+            completo = normalizar(f"{primeiro} {ultimo}")
+            if len(completo.split()) >= 2:
+                nomes[pk].add(completo)
+            elif len(normalizar(username)) >= 4:
+                nomes[pk].add(normalizar(username))
+        return cls(itens, nomes, por_condominio=condominio is not None)
+
+    def candidatos(self, valor, data):
+        """Lançamentos que um crédito de `valor` em `data` quita, por vencimento."""
+        achados = _janela(self._por_devido.get(valor, []), data - JANELA_DEPOIS, data + JANELA_ANTES)
+        # pago em dia: o valor de face basta, mesmo que os encargos já tenham sido lançados
+        achados += _janela(self._com_encargos.get(valor, []), data, data + JANELA_ANTES)
+        return [pk for _, pk in sorted(achados)]
+
+    def sem_encargos(self, valor, data):
+        """Lançamentos vencidos antes de `data` cujo valor de face é `valor`, mas que devem encargos."""
+        lista = self._com_encargos.get(valor, [])
+        return [pk for venc, pk in _janela(lista, data - JANELA_DEPOIS, data) if venc < data]
+
+    def pagador_confere(self, pk, texto_normalizado):
+        return any(nome in texto_normalizado for nome in self._nomes.get(pk, ()))
+
+
+def casar(creditos, indice):
+    """
+    [(credito, status, lancamento_id, candidatos)]. Um lançamento casa com no máximo
+    um crédito por importação. Primeiro passam os créditos em que o nome do pagador
+    aponta um único candidato; depois, por data e só num índice de um condomínio, os
+    que têm um único candidato pelo valor entre os que sobraram. O resto fica para
+    revisão.
+    """
+    usados = set()
+    decididos = {}
+
+    def livres(c):
+        return [pk for pk in indice.candidatos(c.valor, c.data) if pk not in usados]
+
+    ordem = sorted(range(len(creditos)), key=lambda i: (creditos[i].data, i))
+    for i in ordem:
+        c = creditos[i]
+        texto = normalizar(f"{c.descricao} {c.documento}")
+        pelo_nome = [pk for pk in livres(c) if indice.pagador_confere(pk, texto)]
+        if len(pelo_nome) == 1:
+            usados.add(pelo_nome[0])
+            decididos[i] = (MovimentoBancario.Status.CONCILIADO, pelo_nome[0], [])
+
+    for i in ordem:
+        if i in decididos:
+            continue
+        cands = livres(creditos[i])
+        if len(cands) == 1 and indice.por_condominio:
+            usados.add(cands[0])
+            decididos[i] = (MovimentoBancario.Status.CONCILIADO, cands[0], [])
+        elif cands:
+            decididos[i] = (MovimentoBancario.Status.REVISAO, None, cands[:MAX_CANDIDATOS])
+        elif parciais := indice.sem_encargos(creditos[i].valor, creditos[i].data):
+            # pagou o valor de face com atraso: os encargos ficam para o gestor decidir
+            decididos[i] = (MovimentoBancario.Status.REVISAO, None, parciais[:MAX_CANDIDATOS])
+        else:
+            decididos[i] = (MovimentoBancario.Status.SEM_CORRESPONDENCIA, None, [])
+    return [(creditos[i], *decididos[i]) for i in ordem]
+
+
+# ---------------- importação ----------------
+def _quita(credito, lancamento):
+    """A regra de `IndiceAbertos.candidatos`, conferida na linha travada."""
+    if lancamento is None:
+        return False
+    if credito.data <= lancamento.vencimento:
+        return credito.valor >= lancamento.valor
+    return credito.valor >= lancamento.valor_devido
+
+
+def hash_conteudo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def ja_importado(conteudo):
+    """O ExtratoImportado com o mesmo conteúdo, se houver."""
+    return ExtratoImportado.objects.filter(hash=hash_conteudo(conteudo)).first()
+
+
+def importar(extrato, simular=False):
+    """
+    Processa `extrato` (ExtratoImportado ainda não salvo, com `arquivo` e opcionalmente
+    `condominio`/`importado_por`). Retorna um Counter com creditos, repetidos e um
+    total por status. Levanta ValidationError se o arquivo já foi importado.
+    """
+    extrato.arquivo.seek(0)
+    conteudo = extrato.arquivo.read()
+    extrato.hash = hash_conteudo(conteudo)
+    anterior = ja_importado(conteudo)
+    if anterior:
+        raise ValidationError(f"Este extrato já foi importado em {anterior.importado_em:%d/%m/%Y %H:%M}.")
+
+    creditos = ler_extrato(extrato.arquivo.name, conteudo)
+    resumo = Counter(creditos=len(creditos))
+
+    # movimentos que já vieram em outro extrato
+    chaves = [c.chave for c in creditos]
+    vistos = set()
+    for i in range(0, len(chaves), LOTE):
+        vistos.update(MovimentoBancario.objects.filter(chave__in=chaves[i:i + LOTE]).values_list('chave', flat=True))
+    novos = [c for c in creditos if c.chave not in vistos]
+    resumo['repetidos'] = len(creditos) - len(novos)
+    if not novos:
+        casados = []
+    else:
+        indice = IndiceAbertos.carregar(
+            min(c.data for c in novos), max(c.data for c in novos), extrato.condominio,
+        )
+        casados = casar(novos, indice)
+    for _, status, _, _ in casados:
+        resumo[status] += 1
+    if simular:
+        return resumo
+
+    with transaction.atomic():
+        # pagos por outro caminho (admin, webhook) ou com encargos recalculados desde a
+        # leitura do índice voltam à revisão
+        ids = [lancamento_id for _, _, lancamento_id, _ in casados if lancamento_id]
+        abertos = Lancamento.objects.filter(pk__in=ids, pago_em__isnull=True).order_by('pk')
+        if connection.features.has_select_for_update:
+            abertos = abertos.select_for_update()
+        abertos = {l.pk: l for l in abertos.only('pk', 'valor', 'multa', 'juros', 'vencimento')}
+        for n, (c, status, lancamento_id, cands) in enumerate(casados):
+            if lancamento_id and not _quita(c, abertos.get(lancamento_id)):
+                casados[n] = (c, MovimentoBancario.Status.REVISAO, None, [lancamento_id])
+                resumo[status] -= 1
+                resumo[MovimentoBancario.Status.REVISAO] += 1
+
+        extrato.arquivo.seek(0)
+        extrato.creditos = len(novos)
+        extrato.conciliados = resumo[MovimentoBancario.Status.CONCILIADO]
+        extrato.em_revisao = len(novos) - extrato.conciliados
+        extrato.save()
+        MovimentoBancario.objects.bulk_create(
+            (
+                MovimentoBancario(
+                    extrato=extrato, chave=c.chave, data=c.data, valor=c.valor,
+                    descricao=c.descricao, documento=c.documento,
+                    status=status, lancamento_id=lancamento_id, candidatos=cands,
+                )
+                for c, status, lancamento_id, cands in casados
+            ),
+            batch_size=LOTE,
+        )
+        pagos = [Lancamento(pk=lancamento_id, pago_em=c.data) for c, _, lancamento_id, _ in casados if lancamento_id]
+        Lancamento.objects.bulk_update(pagos, ['pago_em'], batch_size=LOTE)
+        # bulk_update não dispara sinais
+        saldos.agendar(saldos.chaves_dos_lancamentos(l.pk for l in pagos))
+        fin_cache.invalidar()
+    return resumo
@@ -0,0 +1,112 @@
+# financeiro/encargos.py
+"""
+Multa e juros dos lançamentos vencidos (job noturno, comando `calcular_encargos`).
+
+Os lançamentos em aberto já vencidos, de condomínios com PoliticaMulta ativa — e os
+em aberto que ainda carregam multa/juros de um cálculo anterior — são lidos em lotes
+por id, com a política no mesmo JOIN. Os encargos são calculados em Python e gravados com `bulk_update`,
+um por lote, sem save() por linha. Cada mudança gera um AjusteEncargos (bulk_create);
+recalcular no mesmo dia não muda nada e não gera histórico.
+
+Regra: passada a carência, multa = valor × multa% e juros = valor × juros% ao mês
+÷ 30 × dias de atraso (juros simples, contados desde o vencimento). Em aberto sem
+atraso, sem política ativa ou com política zerada, os encargos voltam a zero. Lançamentos
+pagos mantêm os encargos do último cálculo.
+
+Editar valor ou vencimento de um lançamento em aberto recalcula só ele (`agendar`,
+pelos sinais).
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache as fin_cache
+from .models import AjusteEncargos, Lancamento
+
+ZERO = Decimal('0.00')
+CENTAVO = Decimal('0.01')
+CEM = Decimal('100')
+LOTE = 1000
+
+
+def calcular(valor, vencimento, politica, hoje):
+    """(dias_atraso, multa, juros) de um lançamento em aberto em `hoje`."""
+    dias = (hoje - vencimento).days
+    if dias <= politica.carencia_dias:
+        return max(dias, 0), Decimal('0.00'), Decimal('0.00')
+    multa = (valor * politica.multa_percentual / CEM).quantize(CENTAVO, ROUND_HALF_UP)
+    juros = (valor * politica.juros_mensal_percentual / CEM / 30 * dias).quantize(CENTAVO, ROUND_HALF_UP)
+    return dias, multa, juros
+
+
+def _politica(lancamento):
+    """PoliticaMulta ativa do condomínio do lançamento, ou None."""
+    if not lancamento.unidade_id:
+        return None
+    politica = getattr(lancamento.unidade.condominio, 'politica_multa', None)
+    return politica if politica and politica.ativa else None
+
+
+def aplicar(hoje=None, lote=LOTE, simular=False, lancamentos=None):
+    """
+    Recalcula os encargos até `hoje` (só dos ids em `lancamentos`, se informado).
+    Retorna (analisados, alterados). Com `simular=True` nada é gravado.
+    """
+    hoje = hoje or timezone.localdate()
+    base = (
+        Lancamento.objects.em_aberto()
+        .filter(
+            Q(vencimento__lt=hoje, unidade__condominio__politica_multa__ativa=True)
+            | Q(multa__gt=0) | Q(juros__gt=0)
+        )
+        .select_related('unidade__condominio__politica_multa')
+        .order_by('pk')
+    )
+    if lancamentos is not None:
+        base = base.filter(pk__in=list(lancamentos))
+    analisados = alterados = 0
+    ultimo = 0
+    while True:
+        itens = list(base.filter(pk__gt=ultimo)[:lote])
+        if not itens:
+            break
+        ultimo = itens[-1].pk
+        analisados += len(itens)
+
+        mudaram, historico = [], []
+        for l in itens:
+            politica = _politica(l)
+            if politica:
+                dias, multa, juros = calcular(l.valor, l.vencimento, politica, hoje)
+            else:
+                # política desativada ou removida: o que foi cobrado antes é zerado
+                dias, multa, juros = max((hoje - l.vencimento).days, 0), ZERO, ZERO
+            if (multa, juros) == (l.multa, l.juros):
+                continue
+            historico.append(AjusteEncargos(
+                lancamento=l, referencia=hoje, dias_atraso=dias,
+                multa_anterior=l.multa, juros_anterior=l.juros, multa=multa, juros=juros,
+                multa_percentual=politica.multa_percentual if politica else ZERO,
+                juros_mensal_percentual=politica.juros_mensal_percentual if politica else ZERO,
+            ))
+            l.multa, l.juros, l.encargos_calculados_em = multa, juros, hoje
+            mudaram.append(l)
+
+        alterados += len(mudaram)
+        if mudaram and not simular:
+            with transaction.atomic():
+                Lancamento.objects.bulk_update(mudaram, ['multa', 'juros', 'encargos_calculados_em'])
+                AjusteEncargos.objects.bulk_create(historico)
+
+    if alterados and not simular:
+        fin_cache.invalidar()  # bulk_update não dispara sinais
+    return analisados, alterados
+
+
+def agendar(lancamento_ids):
+    """Recalcula os encargos de `lancamento_ids` depois do commit da transação atual."""
+    ids = set(lancamento_ids)
+    if ids:
+        transaction.on_commit(lambda: aplicar(lancamentos=ids))
@@ -0,0 +1,191 @@
+# financeiro/exportacao.py
+"""
+Exportação do razão de lançamentos para a contabilidade (CSV ou XLSX).
+
+Tudo é gerado em fluxo: uma única query com os JOINs de condomínio, bloco, unidade
+e pagador, percorrida com `.iterator()` (cursor no servidor no PostgreSQL), e cada
+bloco de linhas é entregue assim que fica pronto. A memória não cresce com o número
+de lançamentos, e a resposta HTTP começa a sair antes de a query terminar.
+
+O XLSX é escrito à mão (planilha única, strings inline) num zip em fluxo, já que o
+projeto não depende de openpyxl.
+
+Campos digitados por usuários (nomes, descrição) que começam com = + - @ ganham um
+apóstrofo na frente, para o Excel/LibreOffice não os executarem como fórmula.
+"""
+import csv
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+
+from .models import Lancamento
+
+CHUNK = 2000  # linhas por ida ao cursor
+
+_INICIO_DE_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+# caracteres que o XML 1.0 não aceita (controles, exceto \t \n \r; surrogates; U+FFFE/FFFF)
+_XML_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+
+COLUNAS = [
+    "Condomínio", "Bloco", "Unidade", "Lançamento", "Tipo", "Competência", "Vencimento",
+    "Valor", "Status", "Pago em", "Pagador", "Descrição", "Boleto", "Comprovante",
+]
+_CAMPOS = (
+    'unidade__condominio__nome', 'unidade__bloco__nome', 'unidade__numero',
+    'pk', 'tipo', 'competencia', 'vencimento', 'valor', 'status_atual', 'pago_em',
+    'morador_alvo__first_name', 'morador_alvo__last_name', 'morador_alvo__username',
+    'unidade__morador__first_name', 'unidade__morador__last_name', 'unidade__morador__username',
+    'descricao', 'boleto_pdf', 'comprovante_pdf',
+)
+
+
+def _nome(primeiro, ultimo, username):
+    return f"{primeiro} {ultimo}".strip() or username or ""
+
+
+def _texto(valor):
+    """Texto livre como célula inerte: sem o prefixo, "=HYPERLINK(...)" vira fórmula."""
+    valor = valor or ""
+    return f"'{valor}" if valor.startswith(_INICIO_DE_FORMULA) else valor
+
+
+def linhas(lancamentos, base_url=''):
+    """
+    Linhas (listas) do razão, ordenadas por condomínio, competência e unidade.
+    Pagador = morador alvo ou, na falta dele, o morador da unidade. `base_url`
+    (ex.: "https://condox.app") torna absolutos os links dos anexos.
+    """
+    tipos = dict(Lancamento.Tipo.choices)
+    midia = f"{base_url}{settings.MEDIA_URL}"
+    qs = (
+        lancamentos.prefetch_related(None)
+        .annotate_status()
+        .order_by('unidade__condominio__nome', 'competencia', 'unidade__bloco__nome', 'unidade__numero', 'pk')
+        .values_list(*_CAMPOS)
+    )
+    for (condominio, bloco, unidade, pk, tipo, competencia, vencimento, valor, status, pago_em,
+         alvo_p, alvo_u, alvo_user, mor_p, mor_u, mor_user, descricao, boleto, comprovante) in qs.iterator(CHUNK):
+        yield [
+            _texto(condominio), _texto(bloco), _texto(unidade), pk, tipos.get(tipo, tipo),
+            f"{competencia:%m/%Y}", vencimento.isoformat(), valor, status,
+            pago_em.isoformat() if pago_em else "",
+            _texto(_nome(alvo_p, alvo_u, alvo_user) if alvo_user else _nome(mor_p, mor_u, mor_user)),
+            _texto(descricao),
+            f"{midia}{boleto}" if boleto else "",
+            f"{midia}{comprovante}" if comprovante else "",
+        ]
+
+
+class _Buffer:
+    """Arquivo só de escrita que guarda o que foi escrito até alguém esvaziá-lo."""
+
+    def __init__(self, vazio=b''):
+        self.vazio = vazio
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = self.vazio.join(self.partes)
+        self.partes = []
+        return dados
+
+
+def csv_em_blocos(linhas, por_bloco=CHUNK):
+    """Bytes do CSV (UTF-8 com BOM, separador ';' — abre direto no Excel) em blocos."""
+    buf = _Buffer('')
+    w = csv.writer(buf, delimiter=';')
+    buf.write('\ufeff')
+    w.writerow(COLUNAS)
+    for i, linha in enumerate(linhas, start=1):
+        w.writerow(linha)
+        if i % por_bloco == 0:
+            yield buf.esvaziar().encode('utf-8')
+    yield buf.esvaziar().encode('utf-8')
+
+
+# ---------------- XLSX ----------------
+_XLSX_FIXOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Lançamentos" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+
+def _celula(valor):
+    if isinstance(valor, (int, Decimal)):
+        return f'<c t="n"><v>{valor}</v></c>'
+    texto = escape(_XML_INVALIDOS.sub('', str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _linha_xml(valores):
+    return '<row>' + ''.join(_celula(v) for v in valores) + '</row>'
+
+
+def xlsx_em_blocos(linhas, por_bloco=CHUNK):
+    """Bytes do XLSX em blocos; o zip é escrito em fluxo (sem seek)."""
+    buf = _Buffer()
+    with zipfile.ZipFile(buf, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+        for nome, conteudo in _XLSX_FIXOS.items():
+            z.writestr(nome, conteudo)
+        with z.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            planilha.write(_linha_xml(COLUNAS).encode())
+            for i, linha in enumerate(linhas, start=1):
+                planilha.write(_linha_xml(linha).encode())
+                if i % por_bloco == 0:
+                    yield buf.esvaziar()
+            planilha.write(b'</sheetData></worksheet>')
+    yield buf.esvaziar()
+
+
+FORMATOS = {
+    'csv': (csv_em_blocos, 'text/csv; charset=utf-8'),
+    'xlsx': (xlsx_em_blocos, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def exportar(lancamentos, formato='csv', base_url=''):
+    """Gerador de bytes do arquivo no `formato` ('csv' ou 'xlsx')."""
+    gerar, _ = FORMATOS[formato]
+    return gerar(linhas(lancamentos, base_url))
@@ -0,0 +1,49 @@
+from django import forms
+from django.core.exceptions import ImproperlyConfigured
+
+from . import boletos
+
+
+class GerarCotasForm(forms.Form):
+    """Parâmetros da rodada de cotas (admin de Condomínio → ação "Gerar cotas do mês")."""
+    FIXO = 'FIXO'
+    FRACAO = 'FRACAO'
+
+    competencia = forms.DateField(
+        label="Competência", input_formats=['%Y-%m'],
+        widget=forms.DateInput(attrs={'type': 'month'}, format='%Y-%m'),
+    )
+    vencimento = forms.DateField(label="Vencimento", widget=forms.DateInput(attrs={'type': 'date'}))
+    regra = forms.ChoiceField(
+        label="Regra de valor",
+        choices=[(FIXO, 'Valor fixo por unidade'), (FRACAO, 'Total rateado pela fração ideal')],
+        initial=FIXO,
+    )
+    valor = forms.DecimalField(
+        label="Valor", max_digits=12, decimal_places=2, min_value=0,
+        help_text="Por unidade (fixo) ou total do condomínio (fração ideal).",
+    )
+    descricao = forms.CharField(label="Descrição", max_length=180, required=False)
+    boletos = forms.BooleanField(
+        label="Gerar boletos", required=False, initial=True,
+        help_text="Os PDFs são gerados em segundo plano (comando gerar_boletos).",
+    )
+
+    def clean_boletos(self):
+        if self.cleaned_data['boletos']:
+            try:
+                boletos.verificar_configuracao()
+            except ImproperlyConfigured as e:
+                raise forms.ValidationError(str(e))
+        return self.cleaned_data['boletos']
+
+    def parametros(self):
+        d = self.cleaned_data
+        fixo = d['regra'] == self.FIXO
+        return {
+            'competencia': d['competencia'],
+            'vencimento': d['vencimento'],
+            'valor': d['valor'] if fixo else None,
+            'total': None if fixo else d['valor'],
+            'descricao': d['descricao'],
+        }
@@ -0,0 +1,101 @@
+# financeiro/inadimplencia.py
+"""
+Relatório de inadimplência por unidade e por condomínio.
+
+Tudo é agregado no banco a partir dos lançamentos vencidos (índice parcial
+`lanc_aberto_unidade_venc`): total devido (valor + multa + juros, como em
+`Lancamento.valor_devido`), com principal e encargos em separado, quantidade,
+vencimento mais antigo e as faixas de atraso (até 30, 31–60, 61–90 e mais de
+90 dias) como Sum condicionais do valor devido.
+O resultado fica no cache sob a versão de `financeiro.cache` e o dia de referência.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F, Min, Q, Sum
+from django.utils import timezone
+
+from . import cache as fin_cache
+from .models import Lancamento
+
+TIMEOUT = 60 * 60 * 6  # segundos; a versão já garante a consistência
+
+# (chave, rótulo, dias mínimos de atraso, dias máximos de atraso ou None)
+FAIXAS = (
+    ('ate_30', 'Até 30 dias', 1, 30),
+    ('de_31_a_60', '31–60 dias', 31, 60),
+    ('de_61_a_90', '61–90 dias', 61, 90),
+    ('acima_90', 'Mais de 90 dias', 91, None),
+)
+
+
+def _agregados(hoje):
+    """Sum/Count/Min comuns às duas visões, com uma Sum condicional por faixa."""
+    devido = F('valor') + F('multa') + F('juros')
+    campos = {
+        'total': Sum(devido),
+        'principal': Sum('valor'),
+        'encargos': Sum(F('multa') + F('juros')),
+        'lancamentos': Count('id'),
+        'vencimento_mais_antigo': Min('vencimento'),
+    }
+    for chave, _, minimo, maximo in FAIXAS:
+        filtro = Q(vencimento__lte=hoje - timedelta(days=minimo))
+        if maximo is not None:
+            filtro &= Q(vencimento__gte=hoje - timedelta(days=maximo))
+        campos[chave] = Sum(devido, filter=filtro)
+    return campos
+
+
+def _completar(linha, hoje):
+    for chave, *_ in FAIXAS:
+        linha[chave] = linha[chave] or 0
+    linha['dias_atraso'] = (hoje - linha['vencimento_mais_antigo']).days
+    return linha
+
+
+def _calcular(hoje, condominio_id):
+    base = Lancamento.objects.vencidos(hoje).filter(unidade__isnull=False)
+    if condominio_id:
+        base = base.filter(unidade__condominio_id=condominio_id)
+
+    unidades = [
+        _completar(linha, hoje)
+        for linha in base.order_by()
+        .values(
+            'unidade_id', 'unidade__numero', 'unidade__bloco__nome',
+            'unidade__condominio_id', 'unidade__condominio__nome',
+            'unidade__morador__username', 'unidade__morador__first_name', 'unidade__morador__last_name',
+        )
+        .annotate(**_agregados(hoje))
+        .order_by('unidade__condominio__nome', '-total')
+    ]
+    condominios = [
+        _completar(linha, hoje)
+        for linha in base.order_by()
+        .values('unidade__condominio_id', 'unidade__condominio__nome')
+        .annotate(unidades=Count('unidade', distinct=True), **_agregados(hoje))
+        .order_by('-total')
+    ]
+    return {'hoje': hoje, 'unidades': unidades, 'condominios': condominios}
+
+
+def relatorio(condominio_id=None, hoje=None):
+    """
+    {'hoje', 'unidades': [...], 'condominios': [...]} — linhas com total (devido),
+    principal, encargos, lancamentos,
+    vencimento_mais_antigo, dias_atraso e uma chave por faixa de FAIXAS. Em cache
+    até algum lançamento mudar (ou o dia virar).
+    """
+    hoje = hoje or timezone.localdate()
+    chave = f"financeiro:inadimplencia:{fin_cache.versao()}:{hoje.isoformat()}:{condominio_id or 'todos'}"
+    dados = cache.get(chave)
+    if dados is None:
+        dados = _calcular(hoje, condominio_id)
+        cache.set(chave, dados, TIMEOUT)
+    return dados
+
+
+def nome_morador(linha):
+    nome = f"{linha['unidade__morador__first_name'] or ''} {linha['unidade__morador__last_name'] or ''}".strip()
+    return nome or linha['unidade__morador__username'] or '—'
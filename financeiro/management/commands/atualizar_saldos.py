@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from financeiro import saldos
+
+
+class Command(BaseCommand):
+    help = (
+        'Atualiza os saldos por unidade: passa para "vencido" o que venceu desde a última '
+        'execução (agende uma vez por dia, logo após a meia-noite). --reconstruir refaz a tabela inteira.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconstruir', action='store_true', help='Recalcula todos os saldos a partir dos lançamentos.')
+        parser.add_argument('--lote', type=int, default=saldos.LOTE, help='Unidades por lote na reconstrução.')
+
+    def handle(self, *args, **opts):
+        if opts['reconstruir']:
+            total = saldos.reconstruir(lote=opts['lote'])
+            self.stdout.write(self.style.SUCCESS(f"{total} saldo(s) reconstruído(s)."))
+        else:
+            total = saldos.virar_dia()
+            self.stdout.write(self.style.SUCCESS(f"{total} saldo(s) com novos vencidos."))
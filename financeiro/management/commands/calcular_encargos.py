@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financeiro import encargos
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula multa e juros dos lançamentos vencidos conforme a política de cada '
+        'condomínio e zera os que deixaram de se aplicar (agende uma vez por dia, após a meia-noite).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help='Data de referência AAAA-MM-DD (padrão: hoje).')
+        parser.add_argument('--lote', type=int, default=encargos.LOTE)
+        parser.add_argument('--dry-run', action='store_true', help='Só conta o que mudaria.')
+
+    def handle(self, *args, **opts):
+        hoje = None
+        if opts['data']:
+            try:
+                hoje = datetime.strptime(opts['data'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Data inválida: {opts['data']}")
+        analisados, alterados = encargos.aplicar(hoje, lote=opts['lote'], simular=opts['dry_run'])
+        self.stdout.write(self.style.SUCCESS(
+            ('[simulação] ' if opts['dry_run'] else '')
+            + f"{analisados} lançamento(s) em aberto analisado(s), {alterados} com encargos atualizados."
+        ))
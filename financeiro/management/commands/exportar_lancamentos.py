@@ -0,0 +1,50 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financeiro.exportacao import FORMATOS, exportar
+from financeiro.models import Lancamento
+
+
+def _mes(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f"Competência inválida: {valor}")
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta os lançamentos (razão para a contabilidade) em CSV ou XLSX, em fluxo. '
+        'Ex.: exportar_lancamentos --condominio 1 --de 2025-01 --ate 2025-12 --formato xlsx -o razao.xlsx'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--condominio', type=int, action='append', help='ID do condomínio (pode repetir).')
+        parser.add_argument('--de', help='Competência inicial AAAA-MM.')
+        parser.add_argument('--ate', help='Competência final AAAA-MM.')
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+        parser.add_argument('-o', '--saida', default='-', help='Arquivo de saída (padrão: stdout).')
+        parser.add_argument('--base-url', default='', help='Prefixo dos links dos anexos, ex.: https://condox.app')
+
+    def handle(self, *args, **opts):
+        qs = Lancamento.objects.all()
+        if opts['condominio']:
+            qs = qs.filter(unidade__condominio_id__in=opts['condominio'])
+        if opts['de']:
+            qs = qs.filter(competencia__gte=_mes(opts['de']))
+        if opts['ate']:
+            qs = qs.filter(competencia__lte=_mes(opts['ate']))
+
+        blocos = exportar(qs, opts['formato'], base_url=opts['base_url'].rstrip('/'))
+        if opts['saida'] == '-':
+            saida = sys.stdout.buffer
+            for bloco in blocos:
+                saida.write(bloco)
+            saida.flush()
+            return
+        with open(opts['saida'], 'wb') as f:
+            for bloco in blocos:
+                f.write(bloco)
+        self.stderr.write(self.style.SUCCESS(f"Exportado para {opts['saida']}."))
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from financeiro.boletos import gerar_boletos, processar_solicitados, verificar_configuracao
+from financeiro.models import Lancamento
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera os boletos em PDF em paralelo. Sem filtros, processa a fila do admin (agende a '
+        'cada poucos minutos). Ex.: gerar_boletos --condominio 1 --competencia 2025-11'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--condominio', type=int, help='Gera para os lançamentos em aberto deste condomínio.')
+        parser.add_argument('--competencia', help='AAAA-MM (com --condominio).')
+        parser.add_argument('--processos', type=int, default=None, help='Processos de renderização (padrão: nº de CPUs, até 8).')
+        parser.add_argument('--lote', type=int, default=500, help='Lançamentos por lote da fila.')
+        parser.add_argument(
+            '--sobrescrever', action='store_true',
+            help='Com --condominio: substitui também os boletos existentes (por padrão são pulados).',
+        )
+
+    def handle(self, *args, **opts):
+        try:
+            verificar_configuracao()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        if opts['competencia'] and not opts['condominio']:
+            raise CommandError("--competencia exige --condominio.")
+        if not opts['condominio']:
+            n = processar_solicitados(lote=opts['lote'], processos=opts['processos'])
+            self.stdout.write(self.style.SUCCESS(f"{n} boleto(s) gerado(s) da fila."))
+            return
+
+        qs = Lancamento.objects.em_aberto().filter(unidade__condominio_id=opts['condominio'])
+        if opts['competencia']:
+            try:
+                competencia = datetime.strptime(opts['competencia'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError(f"Data inválida: {opts['competencia']}")
+            qs = qs.filter(competencia=competencia)
+        n = gerar_boletos(qs, processos=opts['processos'], sobrescrever=opts['sobrescrever'])
+        self.stdout.write(self.style.SUCCESS(f"{n} boleto(s) gerado(s)."))
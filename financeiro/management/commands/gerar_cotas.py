@@ -0,0 +1,58 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from financeiro.cobranca import gerar_cotas
+
+
+def _data(valor, formato):
+    try:
+        return datetime.strptime(valor, formato).date()
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor}")
+
+
+def _decimal(valor):
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise CommandError(f"Valor inválido: {valor}")
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera a COTA do mês para todas as unidades de um condomínio (bulk, idempotente). '
+        'Ex.: gerar_cotas --condominio 1 --competencia 2025-11 --vencimento 2025-11-10 --valor 450'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--condominio', type=int, required=True, help='ID do condomínio.')
+        parser.add_argument('--competencia', required=True, help='AAAA-MM.')
+        parser.add_argument('--vencimento', required=True, help='AAAA-MM-DD.')
+        regra = parser.add_mutually_exclusive_group(required=True)
+        regra.add_argument('--valor', help='Valor fixo por unidade.')
+        regra.add_argument('--total', help='Total a ratear pela fração ideal das unidades.')
+        parser.add_argument('--descricao', default='')
+        parser.add_argument('--dry-run', action='store_true', help='Só mostra o que seria criado.')
+
+    def handle(self, *args, **opts):
+        try:
+            rodada = gerar_cotas(
+                opts['condominio'],
+                competencia=_data(opts['competencia'], '%Y-%m'),
+                vencimento=_data(opts['vencimento'], '%Y-%m-%d'),
+                valor=_decimal(opts['valor']) if opts['valor'] else None,
+                total=_decimal(opts['total']) if opts['total'] else None,
+                descricao=opts['descricao'],
+                simular=opts['dry_run'],
+            )
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        if opts['verbosity'] > 1 or opts['dry_run']:
+            for sinal, unidade, valor in rodada.linhas():
+                self.stdout.write(f"  {sinal} {unidade}" + (f"  R$ {valor}" if valor is not None else ''))
+        estilo = self.style.SUCCESS if rodada.gravada or not rodada.novas else self.style.WARNING
+        self.stdout.write(estilo(('[simulação] ' if opts['dry_run'] else '') + str(rodada)))
@@ -0,0 +1,45 @@
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from condominios.models import Condominio
+from financeiro.conciliacao import importar
+from financeiro.models import ExtratoImportado, MovimentoBancario
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa um extrato bancário (CSV ou OFX) e concilia os créditos com os lançamentos '
+        'em aberto. Reimportar o mesmo arquivo não faz nada. Ex.: importar_extrato extrato.ofx --condominio 1'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo')
+        parser.add_argument('--condominio', type=int, help='Concilia só com lançamentos deste condomínio.')
+        parser.add_argument('--dry-run', action='store_true', help='Mostra o resultado sem gravar.')
+
+    def handle(self, *args, **opts):
+        condominio = None
+        if opts['condominio']:
+            try:
+                condominio = Condominio.objects.get(pk=opts['condominio'])
+            except Condominio.DoesNotExist:
+                raise CommandError(f"Condomínio {opts['condominio']} não existe.")
+        try:
+            with open(opts['arquivo'], 'rb') as f:
+                extrato = ExtratoImportado(arquivo=File(f, name=os.path.basename(f.name)), condominio=condominio)
+                resumo = importar(extrato, simular=opts['dry_run'])
+        except OSError as e:
+            raise CommandError(str(e))
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        S = MovimentoBancario.Status
+        self.stdout.write(self.style.SUCCESS(
+            ('[simulação] ' if opts['dry_run'] else '')
+            + f"{resumo['creditos']} crédito(s): {resumo[S.CONCILIADO]} conciliado(s), "
+            f"{resumo[S.REVISAO]} em revisão, {resumo[S.SEM_CORRESPONDENCIA]} sem correspondência, "
+            f"{resumo['repetidos']} já importado(s)."
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from financeiro import pagamentos
+
+
+class Command(BaseCommand):
+    help = (
+        'Dá baixa nos lançamentos a partir dos avisos de pagamento recebidos por webhook '
+        '(agende a cada minuto ou rode com --continuo). Pode rodar em vários processos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=pagamentos.LOTE, help='Eventos por lote.')
+        parser.add_argument('--continuo', action='store_true', help='Não termina: verifica a fila a cada --intervalo segundos.')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre verificações (com --continuo).')
+
+    def handle(self, *args, **opts):
+        while True:
+            eventos, pagos = pagamentos.processar(lote=opts['lote'])
+            if eventos or not opts['continuo']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{eventos} evento(s) processado(s), {pagos} lançamento(s) pago(s)."
+                ))
+            if not opts['continuo']:
+                return
+            time.sleep(opts['intervalo'])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from financeiro import visibilidade
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói a tabela de visibilidade dos lançamentos (quem vê o quê no portal). '
+        'Use após importações ou UPDATEs em massa que não disparam sinais.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=visibilidade.LOTE, help='Lançamentos por lote.')
+
+    def handle(self, *args, **opts):
+        total = visibilidade.reconstruir(lote=opts['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{total} lançamento(s) sincronizado(s)."))
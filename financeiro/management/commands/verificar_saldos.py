@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from financeiro import saldos
+
+
+class Command(BaseCommand):
+    help = (
+        'Confere os saldos por unidade contra os lançamentos e lista as divergências (só '
+        'leitura). --corrigir recalcula as chaves divergentes. Sai com erro se houver divergência não corrigida.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corrigir', action='store_true')
+        parser.add_argument('--lote', type=int, default=saldos.LOTE, help='Unidades por lote.')
+
+    def handle(self, *args, **opts):
+        divergentes = set()
+        for unidade_id, competencia, campo, gravado, esperado in saldos.verificar(lote=opts['lote']):
+            divergentes.add((unidade_id, competencia))
+            self.stdout.write(f"  unidade {unidade_id} {competencia:%m/%Y} {campo}: gravado={gravado} esperado={esperado}")
+
+        if not divergentes:
+            self.stdout.write(self.style.SUCCESS("Saldos consistentes."))
+            return
+        if opts['corrigir']:
+            saldos.recalcular(divergentes)
+            self.stdout.write(self.style.SUCCESS(f"{len(divergentes)} saldo(s) recalculado(s)."))
+            return
+        raise CommandError(f"{len(divergentes)} saldo(s) divergente(s). Rode com --corrigir.")
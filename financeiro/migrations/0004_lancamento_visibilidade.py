@@ -0,0 +1,48 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def popular(apps, schema_editor):
+    # mesma regra de financeiro.visibilidade, com os modelos históricos
+    Lancamento = apps.get_model('financeiro', 'Lancamento')
+    Visibilidade = apps.get_model('financeiro', 'LancamentoVisibilidade')
+    pares = set()
+    for pk, morador_id, alvo_id in Lancamento.objects.values_list('pk', 'unidade__morador_id', 'morador_alvo_id'):
+        pares.update((u, pk) for u in (morador_id, alvo_id) if u)
+    pares.update(
+        (u, pk) for pk, u in Lancamento.destinatarios.through.objects.values_list('lancamento_id', 'user_id')
+    )
+    Visibilidade.objects.bulk_create(
+        (Visibilidade(usuario_id=u, lancamento_id=pk) for u, pk in pares), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0003_lancamento_boleto_pdf_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LancamentoVisibilidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lancamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibilidades', to='financeiro.lancamento')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fin_visibilidades', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Visibilidade de lançamento',
+                'verbose_name_plural': 'Visibilidade de lançamentos',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='lancamentovisibilidade',
+            constraint=models.UniqueConstraint(fields=('usuario', 'lancamento'), name='fin_visibilidade_unica'),
+        ),
+        migrations.RunPython(popular, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominios', '0001_initial'),
+        ('financeiro', '0004_lancamento_visibilidade'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(condition=models.Q(('pago_em__isnull', True)), fields=['vencimento'], name='lanc_aberto_vencimento'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(condition=models.Q(('pago_em__isnull', True)), fields=['unidade', 'vencimento'], name='lanc_aberto_unidade_venc'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+LOTE = 1000
+
+
+def normalizar_competencias(apps, schema_editor):
+    """Competência é o mês: leva tudo para o dia 1 e recusa COTAs repetidas no mês."""
+    Lancamento = apps.get_model('financeiro', 'Lancamento')
+    fora = Lancamento.objects.exclude(competencia__day=1).order_by('pk')
+    while True:
+        lote = list(fora.only('pk', 'competencia')[:LOTE])
+        if not lote:
+            break
+        for l in lote:
+            l.competencia = l.competencia.replace(day=1)
+        Lancamento.objects.bulk_update(lote, ['competencia'])
+
+    repetidas = list(
+        Lancamento.objects.filter(tipo='COTA', unidade__isnull=False)
+        .values('unidade_id', 'competencia')
+        .annotate(n=Count('pk'))
+        .filter(n__gt=1)
+        .order_by('unidade_id', 'competencia')
+    )
+    if repetidas:
+        linhas = "\n".join(
+            f"  unidade {r['unidade_id']}, competência {r['competencia']:%m/%Y}: {r['n']} cotas"
+            for r in repetidas[:50]
+        )
+        raise RuntimeError(
+            f"Há {len(repetidas)} unidade(s)/competência(s) com mais de uma COTA. Remova ou mude o "
+            f"tipo das repetidas (p.ex. para EXTRA) e rode a migração de novo:\n{linhas}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominios', '0002_unidade_fracao_ideal'),
+        ('financeiro', '0005_lancamento_indices_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_competencias, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lancamento',
+            constraint=models.UniqueConstraint(condition=models.Q(('tipo', 'COTA'), ('unidade__isnull', False)), fields=('unidade', 'competencia', 'tipo'), name='lanc_cota_unica_unidade_competencia'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:38
+
+import django.db.models.deletion
+import financeiro.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominios', '0002_unidade_fracao_ideal'),
+        ('financeiro', '0006_cota_unica'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtratoImportado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arquivo', models.FileField(upload_to=financeiro.models.extrato_upload_path)),
+                ('hash', models.CharField(editable=False, max_length=64, unique=True)),
+                ('importado_em', models.DateTimeField(auto_now_add=True)),
+                ('creditos', models.PositiveIntegerField(default=0, editable=False)),
+                ('conciliados', models.PositiveIntegerField(default=0, editable=False)),
+                ('em_revisao', models.PositiveIntegerField(default=0, editable=False)),
+                ('condominio', models.ForeignKey(blank=True, help_text='Restringe a conciliação aos lançamentos deste condomínio (opcional).', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='extratos', to='condominios.condominio')),
+                ('importado_por', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Extrato bancário',
+                'verbose_name_plural': 'Extratos bancários',
+                'ordering': ['-importado_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimentoBancario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=100, unique=True)),
+                ('data', models.DateField()),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('descricao', models.CharField(blank=True, max_length=255)),
+                ('documento', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('CONCILIADO', 'Conciliado'), ('REVISAO', 'Em revisão (ambíguo)'), ('SEM_CORRESPONDENCIA', 'Sem correspondência'), ('IGNORADO', 'Ignorado')], max_length=20)),
+                ('candidatos', models.JSONField(blank=True, default=list, help_text='IDs dos lançamentos possíveis (revisão).')),
+                ('extrato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimentos', to='financeiro.extratoimportado')),
+                ('lancamento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimentos_bancarios', to='financeiro.lancamento')),
+            ],
+            options={
+                'verbose_name': 'Movimento bancário',
+                'verbose_name_plural': 'Movimentos bancários',
+                'ordering': ['-data', 'pk'],
+                'indexes': [models.Index(condition=models.Q(('status__in', ['REVISAO', 'SEM_CORRESPONDENCIA'])), fields=['data'], name='movimento_pendente_revisao')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominios', '0002_unidade_fracao_ideal'),
+        ('financeiro', '0007_conciliacao_bancaria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lancamento',
+            name='boleto_solicitado_em',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Geração do boleto pendente (ver financeiro.boletos).', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(condition=models.Q(('boleto_solicitado_em__isnull', False)), fields=['boleto_solicitado_em'], name='lanc_boleto_solicitado'),
+        ),
+    ]
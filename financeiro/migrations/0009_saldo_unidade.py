@@ -0,0 +1,66 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def popular(apps, schema_editor):
+    # mesma agregação de financeiro.saldos, com os modelos históricos
+    Lancamento = apps.get_model('financeiro', 'Lancamento')
+    SaldoUnidade = apps.get_model('financeiro', 'SaldoUnidade')
+    hoje = timezone.localdate()
+    zero = models.Value(0, output_field=models.DecimalField(max_digits=12, decimal_places=2))
+    linhas = (
+        Lancamento.objects.filter(unidade__isnull=False)
+        .order_by()
+        .values('unidade_id', 'competencia')
+        .annotate(
+            lancamentos=Count('pk'),
+            faturado=Coalesce(Sum('valor'), zero),
+            pago=Coalesce(Sum('valor', filter=Q(pago_em__isnull=False)), zero),
+            em_aberto=Coalesce(Sum('valor', filter=Q(pago_em__isnull=True)), zero),
+            vencido=Coalesce(Sum('valor', filter=Q(pago_em__isnull=True, vencimento__lt=hoje)), zero),
+        )
+    )
+    SaldoUnidade.objects.bulk_create(
+        (SaldoUnidade(vencido_em=hoje, **l) for l in linhas.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominios', '0002_unidade_fracao_ideal'),
+        ('financeiro', '0008_boleto_solicitado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoUnidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField()),
+                ('lancamentos', models.PositiveIntegerField(default=0)),
+                ('faturado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pago', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('em_aberto', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('vencido', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('vencido_em', models.DateField()),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('unidade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='condominios.unidade')),
+            ],
+            options={
+                'verbose_name': 'Saldo da unidade',
+                'verbose_name_plural': 'Saldos das unidades',
+                'ordering': ['unidade', 'competencia'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='saldounidade',
+            constraint=models.UniqueConstraint(fields=('unidade', 'competencia'), name='saldo_unidade_competencia_unico'),
+        ),
+        migrations.RunPython(popular, migrations.RunPython.noop),
+    ]
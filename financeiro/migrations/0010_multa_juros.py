@@ -0,0 +1,68 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:56
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominios', '0002_unidade_fracao_ideal'),
+        ('financeiro', '0009_saldo_unidade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lancamento',
+            name='encargos_calculados_em',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lancamento',
+            name='juros',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='lancamento',
+            name='multa',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='AjusteEncargos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('referencia', models.DateField(help_text='Data até a qual os encargos foram calculados.')),
+                ('dias_atraso', models.PositiveIntegerField()),
+                ('multa_anterior', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('juros_anterior', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('multa', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('juros', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('multa_percentual', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('juros_mensal_percentual', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('lancamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ajustes_encargos', to='financeiro.lancamento')),
+            ],
+            options={
+                'verbose_name': 'Ajuste de encargos',
+                'verbose_name_plural': 'Ajustes de encargos',
+                'ordering': ['lancamento', '-referencia', '-pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PoliticaMulta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('multa_percentual', models.DecimalField(decimal_places=2, default=Decimal('2.00'), help_text='Sobre o valor do lançamento. O Código Civil (art. 1.336) limita a 2%.', max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(2)])),
+                ('juros_mensal_percentual', models.DecimalField(decimal_places=2, default=Decimal('1.00'), help_text='Juros simples ao mês, cobrados por dia de atraso (mês de 30 dias).', max_digits=5, validators=[django.core.validators.MinValueValidator(0)])),
+                ('carencia_dias', models.PositiveIntegerField(default=0, help_text='Dias após o vencimento sem encargos.')),
+                ('ativa', models.BooleanField(default=True)),
+                ('condominio', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='politica_multa', to='condominios.condominio')),
+            ],
+            options={
+                'verbose_name': 'Política de multa e juros',
+                'verbose_name_plural': 'Políticas de multa e juros',
+            },
+        ),
+    ]
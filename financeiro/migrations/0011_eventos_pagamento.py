@@ -0,0 +1,40 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0010_multa_juros'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoPagamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provedor', models.CharField(max_length=30)),
+                ('chave', models.CharField(help_text='Identificador do pagamento no provedor (ex.: endToEndId do PIX).', max_length=100)),
+                ('referencia', models.CharField(blank=True, help_text='txid da cobrança.', max_length=100)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('pago_em', models.DateField()),
+                ('payload', models.JSONField(default=dict)),
+                ('recebido_em', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSADO', 'Processado (lançamento pago)'), ('JA_PAGO', 'Lançamento já estava pago'), ('VALOR_DIVERGENTE', 'Valor menor que o lançamento'), ('SEM_CORRESPONDENCIA', 'Sem correspondência')], default='PENDENTE', max_length=20)),
+                ('processado_em', models.DateTimeField(blank=True, null=True)),
+                ('lancamento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos_pagamento', to='financeiro.lancamento')),
+            ],
+            options={
+                'verbose_name': 'Evento de pagamento',
+                'verbose_name_plural': 'Eventos de pagamento',
+                'ordering': ['-recebido_em', '-pk'],
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDENTE')), fields=['recebido_em', 'id'], name='evento_pagamento_pendente')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eventopagamento',
+            constraint=models.UniqueConstraint(fields=('provedor', 'chave'), name='evento_pagamento_unico'),
+        ),
+    ]
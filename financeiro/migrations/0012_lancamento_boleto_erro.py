@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0011_eventos_pagamento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lancamento',
+            name='boleto_erro',
+            field=models.CharField(blank=True, editable=False, help_text='Motivo da última geração de boleto que falhou (ver financeiro.boletos).', max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0012_lancamento_boleto_erro'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventopagamento',
+            name='status',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSADO', 'Processado (lançamento pago)'), ('JA_PAGO', 'Lançamento já estava pago'), ('VALOR_DIVERGENTE', 'Valor menor que o devido (com multa e juros)'), ('SEM_CORRESPONDENCIA', 'Sem correspondência')], default='PENDENTE', max_length=20),
+        ),
+    ]
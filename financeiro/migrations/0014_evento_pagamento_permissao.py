@@ -0,0 +1,17 @@
+# Generated by Django 5.0.8 on 2026-10-18 16:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0013_evento_pagamento_valor_devido'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='eventopagamento',
+            options={'ordering': ['-recebido_em', '-pk'], 'permissions': [('reprocessar_eventopagamento', 'Pode devolver eventos de pagamento à fila')], 'verbose_name': 'Evento de pagamento', 'verbose_name_plural': 'Eventos de pagamento'},
+        ),
+    ]
@@ -1,8 +1,11 @@
 # financeiro/models.py
+from decimal import Decimal
+
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils import timezone
 from django.conf import settings
-from condominios.models import Unidade
+from condominios.models import Condominio, Unidade
 
 def boleto_upload_path(instance, filename):
     # media/financeiro/lancamentos/<id>/boleto/<arquivo>
@@ -12,6 +15,57 @@ def comprovante_upload_path(instance, filename):
     # media/financeiro/lancamentos/<id>/comprovantes/<arquivo>
     return f"financeiro/lancamentos/{instance.id or 'novo'}/comprovantes/{filename}"
 
+class LancamentoQuerySet(models.QuerySet):
+    """
+    Status no banco. PAGO = pago_em preenchido; em aberto = pago_em vazio, que se
+    divide em VENCIDO (vencimento < hoje) e PENDENTE. Os filtros de em aberto casam
+    com os índices parciais `WHERE pago_em IS NULL` de Lancamento.Meta.
+    """
+    STATUS = ('PENDENTE', 'VENCIDO', 'PAGO')
+
+    def pagos(self):
+        return self.filter(pago_em__isnull=False)
+
+    def em_aberto(self):
+        return self.filter(pago_em__isnull=True)
+
+    def vencidos(self, hoje=None):
+        return self.em_aberto().filter(vencimento__lt=hoje or timezone.localdate())
+
+    def pendentes(self, hoje=None):
+        return self.em_aberto().filter(vencimento__gte=hoje or timezone.localdate())
+
+    def com_status(self, status, hoje=None):
+        """Filtra por 'PENDENTE' | 'VENCIDO' | 'PAGO'; qualquer outro valor não filtra."""
+        if status == 'PAGO':
+            return self.pagos()
+        if status == 'VENCIDO':
+            return self.vencidos(hoje)
+        if status == 'PENDENTE':
+            return self.pendentes(hoje)
+        return self
+
+    def annotate_status(self, hoje=None):
+        """
+        Anota `status_atual` (mesma regra da property `status`), para ordenar e
+        agrupar no banco.
+        """
+        return self.annotate(status_atual=models.Case(
+            models.When(pago_em__isnull=False, then=models.Value('PAGO')),
+            models.When(vencimento__lt=hoje or timezone.localdate(), then=models.Value('VENCIDO')),
+            default=models.Value('PENDENTE'),
+            output_field=models.CharField(),
+        ))
+
+    def visiveis_para(self, user):
+        """
+        Lançamentos que aparecem no portal de `user` (unidade, morador_alvo ou
+        destinatários), via tabela LancamentoVisibilidade: um lookup indexado, sem
+        OR entre joins e sem linhas duplicadas.
+        """
+        return self.filter(visibilidades__usuario=user)
+
+
 class Lancamento(models.Model):
     class Tipo(models.TextChoices):
         COTA = 'COTA', 'Cota condominial'
@@ -56,25 +110,76 @@ class Lancamento(models.Model):
         upload_to=boleto_upload_path, null=True, blank=True,
         help_text="Anexe o boleto/2ª via ou documento de cobrança (opcional)."
     )
+    boleto_solicitado_em = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="Geração do boleto pendente (ver financeiro.boletos)."
+    )
+    boleto_erro = models.CharField(
+        max_length=255, blank=True, editable=False,
+        help_text="Motivo da última geração de boleto que falhou (ver financeiro.boletos)."
+    )
     comprovante_pdf = models.FileField(
         upload_to=comprovante_upload_path, null=True, blank=True,
         help_text="Comprovante enviado pelo morador."
     )
     comprovante_enviado_em = models.DateTimeField(null=True, blank=True)
 
+    # Encargos por atraso (ver financeiro.encargos): recalculados pelo job noturno
+    multa = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    juros = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    encargos_calculados_em = models.DateField(null=True, blank=True, editable=False)
+
     criado_em = models.DateTimeField(auto_now_add=True)
 
+    objects = LancamentoQuerySet.as_manager()
+
     class Meta:
         ordering = ['-vencimento', '-criado_em']
+        indexes = [
+            # em aberto por vencimento: KPIs de vencidos/pendentes e filtro de status
+            models.Index(
+                fields=['vencimento'],
+                condition=models.Q(pago_em__isnull=True),
+                name='lanc_aberto_vencimento',
+            ),
+            # inadimplência por unidade
+            models.Index(
+                fields=['unidade', 'vencimento'],
+                condition=models.Q(pago_em__isnull=True),
+                name='lanc_aberto_unidade_venc',
+            ),
+            # fila de boletos a gerar
+            models.Index(
+                fields=['boleto_solicitado_em'],
+                condition=models.Q(boleto_solicitado_em__isnull=False),
+                name='lanc_boleto_solicitado',
+            ),
+        ]
+        constraints = [
+            # uma cota por unidade e competência: torna `gerar_cotas` idempotente
+            models.UniqueConstraint(
+                fields=['unidade', 'competencia', 'tipo'],
+                condition=models.Q(tipo='COTA', unidade__isnull=False),
+                name='lanc_cota_unica_unidade_competencia',
+            ),
+        ]
 
     @property
     def status(self):
+        anotado = self.__dict__.get('status_atual')
+        if anotado:
+            return anotado  # veio de annotate_status()
         if self.pago_em:
             return 'PAGO'
         if self.vencimento < timezone.localdate():
             return 'VENCIDO'
         return 'PENDENTE'
 
+    @property
+    def valor_devido(self):
+        """Valor + multa + juros do último cálculo (sem query)."""
+        return self.valor + self.multa + self.juros
+
     @property
     def status_color(self):
         return {
@@ -84,6 +189,7 @@ class Lancamento(models.Model):
         }.get(self.status, '#64748b')
 
     def clean(self):
+        self._normalizar_competencia()
         has_unit = bool(self.unidade_id)
         has_direct = bool(self.morador_alvo_id)
         has_many = self.destinatarios.exists() if self.pk else False
@@ -91,8 +197,235 @@ class Lancamento(models.Model):
             from django.core.exceptions import ValidationError
             raise ValidationError("Defina pelo menos um destinatário: Unidade, Morador alvo ou Destinatários.")
 
+    def _normalizar_competencia(self):
+        # competência é o mês: sempre dia 1 (cota única por mês, saldos, filtros por período)
+        if self.competencia and self.competencia.day != 1:
+            self.competencia = self.competencia.replace(day=1)
+
+    def save(self, *args, **kwargs):
+        self._normalizar_competencia()
+        super().save(*args, **kwargs)
+
     def marcar_comprovante(self):
         self.comprovante_enviado_em = timezone.now()
 
     def __str__(self):
-        return f"{self.get_tipo_display()} • {self.valor} • vence {self.vencimento:%d/%m/%Y}"
\ No newline at end of file
+        return f"{self.get_tipo_display()} • {self.valor} • vence {self.vencimento:%d/%m/%Y}"
+
+
+class LancamentoVisibilidade(models.Model):
+    """
+    Quem vê cada lançamento no portal: (usuário, lançamento) já resolvido a partir de
+    unidade→morador, morador_alvo e destinatarios. Mantida por financeiro.visibilidade
+    (sinais de Lancamento, do M2M e de Unidade.morador); reconstrução completa com
+    `manage.py reconstruir_visibilidade`.
+    """
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='fin_visibilidades')
+    lancamento = models.ForeignKey(Lancamento, on_delete=models.CASCADE, related_name='visibilidades')
+
+    class Meta:
+        verbose_name = 'Visibilidade de lançamento'
+        verbose_name_plural = 'Visibilidade de lançamentos'
+        constraints = [
+            # também serve de índice para "lançamentos do usuário"
+            models.UniqueConstraint(fields=['usuario', 'lancamento'], name='fin_visibilidade_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} → {self.lancamento_id}"
+
+
+# ---------------- Conciliação bancária ----------------
+def extrato_upload_path(instance, filename):
+    # media/financeiro/extratos/<aaaa>/<mm>/<arquivo>
+    return f"financeiro/extratos/{timezone.now():%Y/%m}/{filename}"
+
+
+class ExtratoImportado(models.Model):
+    """
+    Arquivo de extrato (CSV ou OFX) importado. O hash do conteúdo é único: importar o
+    mesmo arquivo de novo não faz nada (ver financeiro.conciliacao).
+    """
+    arquivo = models.FileField(upload_to=extrato_upload_path)
+    hash = models.CharField(max_length=64, unique=True, editable=False)
+    condominio = models.ForeignKey(
+        'condominios.Condominio', on_delete=models.SET_NULL, null=True, blank=True, related_name='extratos',
+        help_text="Restringe a conciliação aos lançamentos deste condomínio (opcional)."
+    )
+    importado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, editable=False)
+    importado_em = models.DateTimeField(auto_now_add=True)
+    creditos = models.PositiveIntegerField(default=0, editable=False)
+    conciliados = models.PositiveIntegerField(default=0, editable=False)
+    em_revisao = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        ordering = ['-importado_em']
+        verbose_name = 'Extrato bancário'
+        verbose_name_plural = 'Extratos bancários'
+
+    def __str__(self):
+        return f"{self.arquivo.name.rsplit('/', 1)[-1]} ({self.importado_em:%d/%m/%Y})"
+
+
+class MovimentoBancario(models.Model):
+    """
+    Crédito lido de um extrato. `chave` identifica o movimento no banco (FITID do OFX
+    ou hash da linha do CSV) e é única: extratos com períodos sobrepostos não
+    conciliam o mesmo crédito duas vezes.
+    """
+    class Status(models.TextChoices):
+        CONCILIADO = 'CONCILIADO', 'Conciliado'
+        REVISAO = 'REVISAO', 'Em revisão (ambíguo)'
+        SEM_CORRESPONDENCIA = 'SEM_CORRESPONDENCIA', 'Sem correspondência'
+        IGNORADO = 'IGNORADO', 'Ignorado'
+
+    extrato = models.ForeignKey(ExtratoImportado, on_delete=models.CASCADE, related_name='movimentos')
+    chave = models.CharField(max_length=100, unique=True)
+    data = models.DateField()
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    descricao = models.CharField(max_length=255, blank=True)
+    documento = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices)
+    lancamento = models.ForeignKey(Lancamento, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimentos_bancarios')
+    candidatos = models.JSONField(default=list, blank=True, help_text="IDs dos lançamentos possíveis (revisão).")
+
+    class Meta:
+        ordering = ['-data', 'pk']
+        verbose_name = 'Movimento bancário'
+        verbose_name_plural = 'Movimentos bancários'
+        indexes = [
+            # fila de revisão
+            models.Index(
+                fields=['data'],
+                condition=models.Q(status__in=['REVISAO', 'SEM_CORRESPONDENCIA']),
+                name='movimento_pendente_revisao',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} • R$ {self.valor} • {self.descricao[:40]}"
+
+
+# ---------------- Saldos por unidade ----------------
+class SaldoUnidade(models.Model):
+    """
+    Totais de uma unidade numa competência, mantidos a partir dos lançamentos (ver
+    financeiro.saldos). `vencido` vale para a data `vencido_em`: o comando
+    `atualizar_saldos` (diário) avança essa data.
+    """
+    unidade = models.ForeignKey(Unidade, on_delete=models.CASCADE, related_name='saldos')
+    competencia = models.DateField()
+    lancamentos = models.PositiveIntegerField(default=0)
+    faturado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    pago = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    em_aberto = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    vencido = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    vencido_em = models.DateField()
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['unidade', 'competencia']
+        verbose_name = 'Saldo da unidade'
+        verbose_name_plural = 'Saldos das unidades'
+        constraints = [
+            models.UniqueConstraint(fields=['unidade', 'competencia'], name='saldo_unidade_competencia_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.unidade_id} • {self.competencia:%m/%Y} • em aberto R$ {self.em_aberto}"
+
+
+# ---------------- Multa e juros ----------------
+class PoliticaMulta(models.Model):
+    """
+    Regra de encargos por atraso de um condomínio: multa fixa sobre o valor e juros
+    simples pro rata die a partir do vencimento (após a carência).
+    """
+    condominio = models.OneToOneField(Condominio, on_delete=models.CASCADE, related_name='politica_multa')
+    multa_percentual = models.DecimalField(
+        max_digits=5, decimal_places=2, default=Decimal('2.00'),
+        validators=[MinValueValidator(0), MaxValueValidator(2)],
+        help_text="Sobre o valor do lançamento. O Código Civil (art. 1.336) limita a 2%.",
+    )
+    juros_mensal_percentual = models.DecimalField(
+        max_digits=5, decimal_places=2, default=Decimal('1.00'),
+        validators=[MinValueValidator(0)],
+        help_text="Juros simples ao mês, cobrados por dia de atraso (mês de 30 dias).",
+    )
+    carencia_dias = models.PositiveIntegerField(default=0, help_text="Dias após o vencimento sem encargos.")
+    ativa = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = 'Política de multa e juros'
+        verbose_name_plural = 'Políticas de multa e juros'
+
+    def __str__(self):
+        return f"{self.condominio}: multa {self.multa_percentual}% + juros {self.juros_mensal_percentual}% a.m."
+
+
+class AjusteEncargos(models.Model):
+    """Histórico (só inserção) de cada mudança de multa/juros de um lançamento."""
+    lancamento = models.ForeignKey(Lancamento, on_delete=models.CASCADE, related_name='ajustes_encargos')
+    referencia = models.DateField(help_text="Data até a qual os encargos foram calculados.")
+    dias_atraso = models.PositiveIntegerField()
+    multa_anterior = models.DecimalField(max_digits=10, decimal_places=2)
+    juros_anterior = models.DecimalField(max_digits=10, decimal_places=2)
+    multa = models.DecimalField(max_digits=10, decimal_places=2)
+    juros = models.DecimalField(max_digits=10, decimal_places=2)
+    multa_percentual = models.DecimalField(max_digits=5, decimal_places=2)
+    juros_mensal_percentual = models.DecimalField(max_digits=5, decimal_places=2)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['lancamento', '-referencia', '-pk']
+        verbose_name = 'Ajuste de encargos'
+        verbose_name_plural = 'Ajustes de encargos'
+
+    def __str__(self):
+        return f"{self.lancamento_id} • {self.referencia:%d/%m/%Y} • multa {self.multa} + juros {self.juros}"
+
+
+# ---------------- Pagamentos (webhook) ----------------
+class EventoPagamento(models.Model):
+    """
+    Confirmação de pagamento recebida de um provedor (webhook). Gravada como chegou,
+    sem tocar nos lançamentos; `financeiro.pagamentos.processar` dá a baixa depois.
+    (provedor, chave) é único: o mesmo aviso reenviado não é registrado duas vezes.
+    """
+    class Status(models.TextChoices):
+        PENDENTE = 'PENDENTE', 'Pendente'
+        PROCESSADO = 'PROCESSADO', 'Processado (lançamento pago)'
+        JA_PAGO = 'JA_PAGO', 'Lançamento já estava pago'
+        VALOR_DIVERGENTE = 'VALOR_DIVERGENTE', 'Valor menor que o devido (com multa e juros)'
+        SEM_CORRESPONDENCIA = 'SEM_CORRESPONDENCIA', 'Sem correspondência'
+
+    provedor = models.CharField(max_length=30)
+    chave = models.CharField(max_length=100, help_text="Identificador do pagamento no provedor (ex.: endToEndId do PIX).")
+    referencia = models.CharField(max_length=100, blank=True, help_text="txid da cobrança.")
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    pago_em = models.DateField()
+    payload = models.JSONField(default=dict)
+    recebido_em = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
+    processado_em = models.DateTimeField(null=True, blank=True)
+    lancamento = models.ForeignKey(Lancamento, on_delete=models.SET_NULL, null=True, blank=True, related_name='eventos_pagamento')
+
+    class Meta:
+        ordering = ['-recebido_em', '-pk']
+        verbose_name = 'Evento de pagamento'
+        verbose_name_plural = 'Eventos de pagamento'
+        permissions = [('reprocessar_eventopagamento', 'Pode devolver eventos de pagamento à fila')]
+        constraints = [
+            models.UniqueConstraint(fields=['provedor', 'chave'], name='evento_pagamento_unico'),
+        ]
+        indexes = [
+            # fila do processamento
+            models.Index(
+                fields=['recebido_em', 'id'],
+                condition=models.Q(status='PENDENTE'),
+                name='evento_pagamento_pendente',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.provedor} • {self.chave} • R$ {self.valor}"
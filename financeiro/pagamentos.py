@@ -0,0 +1,239 @@
+# financeiro/pagamentos.py
+"""
+Confirmações de pagamento por webhook (PIX).
+
+1. Recebimento (`views.webhook_pagamento`): confere a assinatura, lê os eventos e
+   grava tudo num único INSERT (`bulk_create(ignore_conflicts=True)`) em
+   EventoPagamento. Não consulta nem trava lançamentos: a resposta sai logo, mesmo
+   nas rajadas de dia de vencimento. Um aviso reenviado cai na chave única
+   (provedor, chave) e é simplesmente ignorado.
+2. Processamento (`processar`, comando `processar_pagamentos`): pega os eventos
+   pendentes em lotes — no PostgreSQL com SKIP LOCKED, então vários workers não
+   processam o mesmo evento — e dá baixa nos lançamentos com `bulk_update`.
+
+O lançamento é identificado pelo txid da cobrança (`txid(lancamento)`), que o morador
+recebe no PIX copia e cola (`copia_e_cola`) mostrado em "minhas cobranças" e no boleto
+gerado, desde que settings.PIX_CHAVE esteja configurada. PIX feito sem esse código
+(digitando a chave) chega sem txid e fica SEM_CORRESPONDENCIA, para baixa manual. O pagamento
+tem de cobrir o valor devido (valor + multa + juros, ver financeiro.encargos). Eventos
+sem lançamento, com valor menor que o devido ou de lançamento já pago ficam
+registrados com o status correspondente, para conferência no admin.
+"""
+import hashlib
+import hmac
+import json
+import re
+import unicodedata
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache as fin_cache
+from . import saldos
+from .models import EventoPagamento, Lancamento
+
+LOTE = 500
+CABECALHO_ASSINATURA = 'HTTP_X_ASSINATURA'  # X-Assinatura: sha256=<hex>
+
+_TXID = re.compile(r'^CDX0*(\d+)$')
+
+
+def txid(lancamento):
+    """txid da cobrança PIX de um lançamento (25 caracteres: o limite do BR Code estático)."""
+    return f"CDX{lancamento.pk:022d}"
+
+
+def lancamento_do_txid(valor):
+    """pk do lançamento de um txid gerado por `txid()`, ou None."""
+    m = _TXID.match(valor or '')
+    return int(m.group(1)) if m else None
+
+
+# ---------------- PIX copia e cola (BR Code estático) ----------------
+def _campo(id_, valor):
+    return f"{id_}{len(valor):02d}{valor}"
+
+
+def _ascii(texto, tamanho):
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if c.isascii() and not unicodedata.combining(c)).upper()[:tamanho].strip()
+
+
+def _crc16(dados):
+    """CRC16-CCITT (polinômio 0x1021, início 0xFFFF), como pede o BR Code."""
+    crc = 0xFFFF
+    for byte in dados.encode():
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+            crc &= 0xFFFF
+    return f"{crc:04X}"
+
+
+def copia_e_cola(lancamento):
+    """
+    PIX copia e cola do lançamento (valor devido, com o txid que identifica o
+    pagamento no webhook), ou None se settings.PIX_CHAVE não está configurada.
+    """
+    if not settings.PIX_CHAVE:
+        return None
+    conta = _campo('00', 'br.gov.bcb.pix') + _campo('01', settings.PIX_CHAVE)
+    payload = (
+        _campo('00', '01')
+        + _campo('26', conta)
+        + _campo('52', '0000')
+        + _campo('53', '986')
+        + _campo('54', f"{lancamento.valor_devido:.2f}")
+        + _campo('58', 'BR')
+        + _campo('59', _ascii(settings.PIX_RECEBEDOR, 25))
+        + _campo('60', _ascii(settings.PIX_CIDADE, 15))
+        + _campo('62', _campo('05', txid(lancamento)))
+        + '6304'
+    )
+    return payload + _crc16(payload)
+
+
+def assinar(segredo, corpo):
+    return 'sha256=' + hmac.new(segredo.encode(), corpo, hashlib.sha256).hexdigest()
+
+
+# ---------------- provedores ----------------
+class ProvedorPix:
+    """
+    Webhook no formato da API PIX do Banco Central: {"pix": [{"endToEndId", "txid",
+    "valor", "horario", ...}]}, assinado com HMAC-SHA256 do corpo no cabeçalho
+    X-Assinatura. O segredo vem de settings.PAGAMENTOS_SEGREDOS[nome]; sem segredo o
+    provedor fica desligado.
+    """
+    nome = 'pix'
+
+    @property
+    def segredo(self):
+        return settings.PAGAMENTOS_SEGREDOS.get(self.nome, '')
+
+    def verificar(self, request):
+        recebida = request.META.get(CABECALHO_ASSINATURA, '')
+        if not hmac.compare_digest(recebida, assinar(self.segredo, request.body)):
+            raise PermissionDenied("Assinatura inválida.")
+
+    def eventos(self, corpo):
+        """EventoPagamento (não salvos) do corpo da requisição. ValidationError se inválido."""
+        try:
+            itens = json.loads(corpo)['pix']
+            eventos = []
+            for item in itens:
+                horario = datetime.fromisoformat(item['horario'].replace('Z', '+00:00'))
+                if timezone.is_naive(horario):
+                    horario = timezone.make_aware(horario)
+                eventos.append(EventoPagamento(
+                    provedor=self.nome,
+                    chave=str(item['endToEndId'])[:100],
+                    referencia=str(item.get('txid') or '')[:100],
+                    valor=Decimal(str(item['valor'])),
+                    pago_em=timezone.localdate(horario),
+                    payload=item,
+                ))
+        except (ValueError, KeyError, TypeError, AttributeError, InvalidOperation) as e:
+            raise ValidationError(f"Corpo inválido: {e!r}")
+        return eventos
+
+
+class ProvedorStub(ProvedorPix):
+    """
+    Provedor local para testes e desenvolvimento: mesmo formato do PIX, com segredo
+    próprio (PAGAMENTOS_SEGREDOS['stub']). `aviso()` monta a requisição que o
+    provedor enviaria.
+    """
+    nome = 'stub'
+
+    def aviso(self, pagamentos):
+        """
+        (corpo, cabeçalhos) de um webhook para `pagamentos`: lista de (chave,
+        lançamento, valor, horário) — valor e horário podem ser None (valor devido
+        do lançamento, agora).
+        """
+        pix = [
+            {
+                'endToEndId': chave,
+                'txid': txid(lancamento),
+                'valor': str(valor if valor is not None else lancamento.valor_devido),
+                'horario': (horario or timezone.now()).isoformat(),
+            }
+            for chave, lancamento, valor, horario in pagamentos
+        ]
+        corpo = json.dumps({'pix': pix}).encode()
+        return corpo, {CABECALHO_ASSINATURA: assinar(self.segredo, corpo)}
+
+
+PROVEDORES = {p.nome: p for p in (ProvedorPix(), ProvedorStub())}
+
+
+def provedor(nome):
+    """Provedor habilitado (com segredo configurado) ou None."""
+    p = PROVEDORES.get(nome)
+    return p if p and p.segredo else None
+
+
+# ---------------- recebimento ----------------
+def registrar(eventos):
+    """Grava os eventos novos; repetidos (mesma chave) são ignorados pelo banco."""
+    EventoPagamento.objects.bulk_create(eventos, ignore_conflicts=True)
+
+
+# ---------------- processamento ----------------
+def _baixar(eventos, agora):
+    """Casa os eventos de um lote com os lançamentos e grava tudo. Retorna os pagos."""
+    ids = {e.lancamento_id for e in eventos if e.lancamento_id}
+    qs = Lancamento.objects.filter(pk__in=ids).order_by('pk')
+    if connection.features.has_select_for_update:
+        qs = qs.select_for_update()
+    lancamentos = {l.pk: l for l in qs.only('pk', 'valor', 'multa', 'juros', 'pago_em')}
+
+    pagos = []
+    for e in eventos:
+        l = lancamentos.get(e.lancamento_id)
+        e.processado_em = agora
+        if l is None:
+            e.lancamento_id, e.status = None, EventoPagamento.Status.SEM_CORRESPONDENCIA
+        elif l.pago_em:
+            e.status = EventoPagamento.Status.JA_PAGO
+        elif e.valor < l.valor_devido:  # encargos não são perdoados em silêncio
+            e.status = EventoPagamento.Status.VALOR_DIVERGENTE
+        else:
+            e.status = EventoPagamento.Status.PROCESSADO
+            l.pago_em = e.pago_em
+            pagos.append(l)
+
+    EventoPagamento.objects.bulk_update(eventos, ['status', 'lancamento', 'processado_em'])
+    Lancamento.objects.bulk_update(pagos, ['pago_em'])
+    # bulk_update não dispara sinais
+    saldos.agendar(saldos.chaves_dos_lancamentos(l.pk for l in pagos))
+    return len(pagos)
+
+
+def processar(lote=LOTE):
+    """
+    Processa os eventos pendentes em lotes de `lote`. Retorna (eventos, pagos). No
+    PostgreSQL os eventos são travados com SKIP LOCKED: workers simultâneos dividem a
+    fila em vez de esperar uns pelos outros ou repetir a baixa.
+    """
+    total = pagos = 0
+    while True:
+        with transaction.atomic():
+            qs = EventoPagamento.objects.filter(status=EventoPagamento.Status.PENDENTE)
+            if connection.features.has_select_for_update_skip_locked:
+                qs = qs.select_for_update(skip_locked=True)
+            eventos = list(qs.order_by('recebido_em', 'pk')[:lote])
+            if not eventos:
+                break
+            for e in eventos:
+                e.lancamento_id = lancamento_do_txid(e.referencia)
+            pagos += _baixar(eventos, timezone.now())
+            total += len(eventos)
+    if pagos:
+        fin_cache.invalidar()
+    return total, pagos
@@ -0,0 +1,239 @@
+# financeiro/saldos.py
+"""
+Saldos por unidade e competência (SaldoUnidade).
+
+Cada linha é recalculada só a partir dos lançamentos da sua chave (unidade,
+competência). O trabalho de uma escrita fica proporcional aos lançamentos de um
+mês de uma unidade, e extratos e totais passam a ler uma linha por mês.
+
+- `agendar(chaves)`: recalcula depois do commit (sinais de Lancamento e caminhos
+  em massa — bulk_create/bulk_update não disparam sinais).
+- `virar_dia(hoje)`: lançamentos em aberto que venceram desde a última execução
+  passam para `vencido` (comando `atualizar_saldos`, diário).
+- `reconstruir()` / `verificar()`: reconstrução completa e conferência contra os
+  lançamentos (comandos `atualizar_saldos --reconstruir` e `verificar_saldos`).
+
+Lançamentos sem unidade (só morador_alvo/destinatários) não entram nos saldos.
+
+Concorrência: `recalcular` trava as linhas das unidades (SELECT ... FOR UPDATE) antes
+de ler os agregados. Dois recálculos da mesma unidade rodam um depois do outro, e o
+último sempre lê o que o outro já gravou — sem isso, um recálculo que leu antes do
+commit de outra transação e gravou depois deixaria o saldo velho.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from condominios.models import Unidade
+
+from .models import Lancamento, SaldoUnidade
+
+LOTE = 500  # unidades por lote na reconstrução/verificação
+CAMPOS = ('lancamentos', 'faturado', 'pago', 'em_aberto', 'vencido')
+ZERO = Decimal('0.00')
+
+
+def _agregados(filtro, hoje):
+    """{(unidade_id, competencia): {campo: valor}} dos lançamentos em `filtro`."""
+    linhas = (
+        Lancamento.objects.filter(filtro, unidade__isnull=False)
+        .order_by()
+        .values('unidade_id', 'competencia')
+        .annotate(
+            lancamentos=Count('pk'),
+            faturado=Coalesce(Sum('valor'), ZERO),
+            pago=Coalesce(Sum('valor', filter=Q(pago_em__isnull=False)), ZERO),
+            em_aberto=Coalesce(Sum('valor', filter=Q(pago_em__isnull=True)), ZERO),
+            vencido=Coalesce(Sum('valor', filter=Q(pago_em__isnull=True, vencimento__lt=hoje)), ZERO),
+        )
+    )
+    return {(l.pop('unidade_id'), l.pop('competencia')): l for l in linhas}
+
+
+def _filtro_chaves(chaves):
+    """Um filtro por unidade (competências da unidade em IN), não um OR por chave."""
+    por_unidade = defaultdict(set)
+    for unidade_id, competencia in chaves:
+        por_unidade[unidade_id].add(competencia)
+    filtro = Q()
+    for unidade_id, competencias in por_unidade.items():
+        filtro |= Q(unidade_id=unidade_id, competencia__in=competencias)
+    return filtro
+
+
+def _gravar(chaves, agregados, hoje):
+    """Upsert das chaves com lançamentos; apaga as que ficaram vazias."""
+    SaldoUnidade.objects.bulk_create(
+        [
+            SaldoUnidade(unidade_id=u, competencia=c, vencido_em=hoje, atualizado_em=timezone.now(), **valores)
+            for (u, c), valores in agregados.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['unidade', 'competencia'],
+        update_fields=[*CAMPOS, 'vencido_em', 'atualizado_em'],
+        batch_size=LOTE,
+    )
+    vazias = [k for k in chaves if k not in agregados]
+    if vazias:
+        SaldoUnidade.objects.filter(_filtro_chaves(vazias)).delete()
+
+
+def _travar_unidades(unidade_ids):
+    """Serializa os recálculos por unidade (na ordem do pk, sem deadlock entre eles)."""
+    list(
+        Unidade.objects.select_for_update().filter(pk__in=unidade_ids)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def recalcular(chaves, hoje=None):
+    """Recalcula as chaves (unidade_id, competencia) informadas."""
+    chaves = {k for k in chaves if k[0]}
+    if not chaves:
+        return
+    hoje = hoje or timezone.localdate()
+    with transaction.atomic():
+        _travar_unidades({u for u, _ in chaves})
+        filtro = _filtro_chaves(chaves)
+        agregados = {k: v for k, v in _agregados(filtro, hoje).items() if k in chaves}
+        _gravar(chaves, agregados, hoje)
+
+
+def agendar(chaves):
+    """Recalcula `chaves` depois do commit da transação atual."""
+    chaves = {k for k in chaves if k[0]}
+    if chaves:
+        transaction.on_commit(lambda: recalcular(chaves))
+
+
+def chaves_dos_lancamentos(lancamento_ids):
+    return set(
+        Lancamento.objects.filter(pk__in=list(lancamento_ids), unidade__isnull=False)
+        .values_list('unidade_id', 'competencia').distinct()
+    )
+
+
+def virar_dia(hoje=None):
+    """
+    Atualiza `vencido` até `hoje`: só as chaves com lançamentos em aberto que venceram
+    desde a data mais antiga já avaliada (índice parcial `lanc_aberto_vencimento`).
+    Retorna o nº de chaves recalculadas.
+    """
+    hoje = hoje or timezone.localdate()
+    desde = SaldoUnidade.objects.filter(vencido_em__lt=hoje).aggregate(d=Min('vencido_em'))['d']
+    if desde is None:
+        return 0
+    chaves = set(
+        Lancamento.objects.em_aberto()
+        .filter(vencimento__gte=desde, vencimento__lt=hoje, unidade__isnull=False)
+        .values_list('unidade_id', 'competencia').distinct()
+    )
+    with transaction.atomic():
+        recalcular(chaves, hoje)
+        # nas demais nada venceu no intervalo: o `vencido` gravado continua certo
+        SaldoUnidade.objects.filter(vencido_em__lt=hoje).update(vencido_em=hoje)
+    return len(chaves)
+
+
+def _lotes_de_unidades(lote):
+    ultimo = 0
+    while True:
+        ids = list(
+            Lancamento.objects.filter(unidade_id__gt=ultimo)
+            .order_by('unidade_id').values_list('unidade_id', flat=True).distinct()[:lote]
+        )
+        if not ids:
+            return
+        yield ids
+        ultimo = ids[-1]
+
+
+def reconstruir(lote=LOTE, hoje=None):
+    """Refaz a tabela inteira, em lotes de unidades. Retorna o nº de saldos gravados."""
+    hoje = hoje or timezone.localdate()
+    total = 0
+    with transaction.atomic():
+        SaldoUnidade.objects.all().delete()
+        for ids in _lotes_de_unidades(lote):
+            agregados = _agregados(Q(unidade_id__in=ids), hoje)
+            _gravar(agregados.keys(), agregados, hoje)
+            total += len(agregados)
+    return total
+
+
+def _vencido_em(ids, gravados):
+    """`vencido` esperado de cada saldo gravado, na data em que ele foi avaliado (vencido_em)."""
+    vencido = defaultdict(lambda: ZERO)
+    abertos = (
+        Lancamento.objects.em_aberto().filter(unidade_id__in=ids)
+        .order_by().values_list('unidade_id', 'competencia', 'vencimento')
+        .annotate(total=Sum('valor'))
+    )
+    for unidade_id, competencia, vencimento, total in abertos:
+        gravado = gravados.get((unidade_id, competencia))
+        if gravado and vencimento < gravado['vencido_em']:
+            vencido[unidade_id, competencia] += total
+    return vencido
+
+
+def verificar(lote=LOTE, hoje=None):
+    """
+    Compara a tabela com os lançamentos, sem gravar nada. Gera (unidade_id,
+    competencia, campo, gravado, esperado) para cada divergência; campo '*' = linha
+    sobrando ou faltando. `vencido` é conferido na data em que cada saldo foi
+    avaliado (`vencido_em`), então não depende de `virar_dia` já ter rodado hoje.
+    """
+    hoje = hoje or timezone.localdate()
+    for ids in _lotes_de_unidades(lote):
+        esperados = _agregados(Q(unidade_id__in=ids), hoje)
+        gravados = {
+            (s['unidade_id'], s['competencia']): s
+            for s in SaldoUnidade.objects.filter(unidade_id__in=ids)
+            .values('unidade_id', 'competencia', 'vencido_em', *CAMPOS)
+        }
+        vencido = _vencido_em(ids, gravados)
+        for chave, esperado in esperados.items():
+            if chave in gravados:
+                esperado['vencido'] = vencido[chave]
+        for chave in esperados.keys() | gravados.keys():
+            esperado, gravado = esperados.get(chave), gravados.get(chave)
+            if esperado is None or gravado is None:
+                yield (*chave, '*', bool(gravado), bool(esperado))
+                continue
+            for campo in CAMPOS:
+                if gravado[campo] != esperado[campo]:
+                    yield (*chave, campo, gravado[campo], esperado[campo])
+    # saldos de unidades que não têm mais nenhum lançamento
+    com_lancamentos = Lancamento.objects.filter(unidade__isnull=False).values('unidade_id')
+    for u, c in SaldoUnidade.objects.exclude(unidade_id__in=com_lancamentos).values_list('unidade_id', 'competencia'):
+        yield (u, c, '*', True, False)
+
+
+# ---------------- leitura ----------------
+def extrato(unidade_id, de=None, ate=None):
+    """Saldos mensais de uma unidade (um registro por competência)."""
+    qs = SaldoUnidade.objects.filter(unidade_id=unidade_id)
+    if de:
+        qs = qs.filter(competencia__gte=de)
+    if ate:
+        qs = qs.filter(competencia__lte=ate)
+    return qs.order_by('competencia')
+
+
+def totais(condominio_id=None, de=None, ate=None):
+    """Soma dos saldos (carteira inteira ou de um condomínio) no período."""
+    qs = SaldoUnidade.objects.all()
+    if condominio_id:
+        qs = qs.filter(unidade__condominio_id=condominio_id)
+    if de:
+        qs = qs.filter(competencia__gte=de)
+    if ate:
+        qs = qs.filter(competencia__lte=ate)
+    return qs.aggregate(
+        lancamentos=Coalesce(Sum('lancamentos'), 0),
+        **{campo: Coalesce(Sum(campo), ZERO) for campo in CAMPOS[1:]},
+    )
@@ -0,0 +1,75 @@
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from condominios.models import Unidade
+
+from . import cache as fin_cache
+from . import encargos, saldos, visibilidade
+from .models import Lancamento
+
+
+@receiver(post_init, sender=Lancamento)
+def guardar_chave_saldo(sender, instance: Lancamento, **kwargs):
+    # (unidade, competência) de origem: editar pode mover o lançamento de saldo
+    instance._chave_saldo = (instance.__dict__.get('unidade_id'), instance.__dict__.get('competencia'))
+    # valor/vencimento de origem: editar muda multa e juros
+    instance._base_encargos = (instance.__dict__.get('valor'), instance.__dict__.get('vencimento'))
+
+
+@receiver(post_save, sender=Lancamento)
+def sincronizar_lancamento(sender, instance: Lancamento, raw=False, **kwargs):
+    fin_cache.invalidar()
+    if not raw:
+        visibilidade.sincronizar([instance.pk])
+        saldos.agendar({getattr(instance, '_chave_saldo', (None, None)), (instance.unidade_id, instance.competencia)})
+        base = (instance.valor, instance.vencimento)
+        if not instance.pago_em and getattr(instance, '_base_encargos', base) != base:
+            encargos.agendar([instance.pk])
+    instance._chave_saldo = (instance.unidade_id, instance.competencia)
+    instance._base_encargos = (instance.valor, instance.vencimento)
+
+
+@receiver(post_delete, sender=Lancamento)
+def invalidar_lancamento_removido(sender, instance: Lancamento, **kwargs):
+    fin_cache.invalidar()
+    saldos.agendar({(instance.unidade_id, instance.competencia)})
+
+
+@receiver(m2m_changed, sender=Lancamento.destinatarios.through)
+def sincronizar_destinatarios(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        visibilidade.sincronizar([instance.pk])
+    elif pk_set:
+        # user.fin_lancamentos_recebidos.add/remove(...)
+        visibilidade.sincronizar(pk_set)
+    else:
+        # user.fin_lancamentos_recebidos.clear(): pk_set não é informado
+        visibilidade.sincronizar_usuario(instance.pk)
+
+
+# ---- Unidade.morador ----
+@receiver(post_init, sender=Unidade)
+def guardar_morador_original(sender, instance: Unidade, **kwargs):
+    instance._morador_original = instance.__dict__.get('morador_id')
+
+
+@receiver(post_save, sender=Unidade)
+def sincronizar_morador_unidade(sender, instance: Unidade, created=False, raw=False, **kwargs):
+    if not created and not raw and instance.morador_id != getattr(instance, '_morador_original', None):
+        visibilidade.sincronizar_unidades([instance.pk])
+        fin_cache.invalidar()  # relatórios mostram o morador da unidade
+    instance._morador_original = instance.morador_id
+
+
+@receiver(pre_delete, sender=Unidade)
+def guardar_lancamentos_da_unidade(sender, instance: Unidade, **kwargs):
+    # Lancamento.unidade é SET_NULL (UPDATE em massa, sem sinais): guarda quem refazer
+    instance._lancamentos = list(instance.fin_lancamentos.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Unidade)
+def sincronizar_unidade_removida(sender, instance: Unidade, **kwargs):
+    visibilidade.sincronizar(getattr(instance, '_lancamentos', []))
+    fin_cache.invalidar()
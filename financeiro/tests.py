@@ -1,3 +1,177 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+from condominios.models import Condominio, Unidade
+
+from . import conciliacao, pagamentos
+from .models import EventoPagamento, ExtratoImportado, Lancamento, MovimentoBancario
+
+
+# o manifest do whitenoise só existe depois do collectstatic
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class LancamentoAdminChangelistTests(TestCase):
+    """A lista de lançamentos do admin não pode fazer queries por linha."""
+
+    # sessão + usuário, contagens da paginação, date_hierarchy, a página e o prefetch
+    ORCAMENTO = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        cls.condominio = Condominio.objects.create(nome='Condomínio Teste')
+        cls.grupo = [User.objects.create_user(f'grupo{i}', first_name=f'Grupo {i}') for i in range(3)]
+
+    def _criar(self, quantidade):
+        for i in range(quantidade):
+            morador = User.objects.create_user(f'morador{Lancamento.objects.count()}', first_name='Morador')
+            unidade = Unidade.objects.create(condominio=self.condominio, numero=f'{morador.pk}', morador=morador)
+            lanc = Lancamento.objects.create(
+                unidade=unidade, morador_alvo=self.grupo[0], tipo=Lancamento.Tipo.EXTRA,
+                competencia=date(2025, 11, 1), vencimento=date(2025, 11, 10 + i % 10), valor=100,
+            )
+            lanc.destinatarios.set(self.grupo)
+
+    def _queries_da_lista(self, **params):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('admin:financeiro_lancamento_changelist'), params)
+        self.assertEqual(resp.status_code, 200)
+        return len(queries)
+
+    def test_queries_nao_crescem_com_as_linhas(self):
+        self._criar(3)
+        poucas = self._queries_da_lista()
+        self._criar(40)
+        muitas = self._queries_da_lista()
+        self.assertEqual(poucas, muitas)
+        self.assertLessEqual(muitas, self.ORCAMENTO)
+
+    def test_ordenar_por_status_e_destino(self):
+        self._criar(5)
+        Lancamento.objects.filter(pk=Lancamento.objects.first().pk).update(pago_em=date(2025, 11, 5))
+        # colunas: resumo(1), destino(2), status_badge(3)
+        for o in ('3', '-3', '2'):
+            self.assertLessEqual(self._queries_da_lista(o=o), self.ORCAMENTO)
+
+    def test_busca_por_unidade(self):
+        self._criar(2)
+        self.assertLessEqual(self._queries_da_lista(q='Morador'), self.ORCAMENTO)
+
+
+@override_settings(PAGAMENTOS_SEGREDOS={'stub': 'segredo-de-teste'})
+class WebhookPagamentoTests(TestCase):
+    """Avisos do provedor stub: recebidos pelo webhook e baixados por `processar`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        condominio = Condominio.objects.create(nome='Condomínio Teste')
+        unidade = Unidade.objects.create(condominio=condominio, numero='101')
+        cls.lancamento = Lancamento.objects.create(
+            unidade=unidade, tipo=Lancamento.Tipo.EXTRA,
+            competencia=date(2025, 11, 1), vencimento=date(2025, 11, 10), valor=100,
+        )
+
+    def _avisar(self, pagamentos_, assinatura=None):
+        corpo, cabecalhos = pagamentos.PROVEDORES['stub'].aviso(pagamentos_)
+        if assinatura is not None:
+            cabecalhos = {pagamentos.CABECALHO_ASSINATURA: assinatura}
+        return self.client.post(
+            reverse('financeiro:webhook_pagamento', args=['stub']), corpo,
+            content_type='application/json', **cabecalhos,
+        )
+
+    def _processar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pagamentos.processar()
+        self.lancamento.refresh_from_db()
+
+    def _status(self, chave):
+        return EventoPagamento.objects.get(chave=chave).status
+
+    def test_assinatura_invalida(self):
+        resp = self._avisar([('E1', self.lancamento, None, None)], assinatura='sha256=00')
+        self.assertEqual(resp.status_code, 403)
+        self.assertFalse(EventoPagamento.objects.exists())
+
+    def test_aviso_reenviado_nao_repete(self):
+        for _ in range(2):
+            resp = self._avisar([('E1', self.lancamento, None, None)])
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(EventoPagamento.objects.count(), 1)
+        self._processar()
+        self.assertEqual(self._status('E1'), EventoPagamento.Status.PROCESSADO)
+        self.assertIsNotNone(self.lancamento.pago_em)
+
+    def test_valor_menor_que_o_devido(self):
+        Lancamento.objects.filter(pk=self.lancamento.pk).update(multa=2, juros=1)
+        self._avisar([('E1', self.lancamento, '100.00', None)])
+        self._processar()
+        self.assertEqual(self._status('E1'), EventoPagamento.Status.VALOR_DIVERGENTE)
+        self.assertIsNone(self.lancamento.pago_em)
+
+    def test_dois_pagamentos_do_mesmo_lancamento(self):
+        self._avisar([('E1', self.lancamento, None, None), ('E2', self.lancamento, None, None)])
+        self._processar()
+        self.assertEqual(self._status('E1'), EventoPagamento.Status.PROCESSADO)
+        self.assertEqual(self._status('E2'), EventoPagamento.Status.JA_PAGO)
+
+    @override_settings(PIX_CHAVE='pix@condox.app', PIX_RECEBEDOR='Condomínio Teste', PIX_CIDADE='Fortaleza')
+    def test_copia_e_cola_leva_o_txid(self):
+        codigo = pagamentos.copia_e_cola(self.lancamento)
+        self.assertIn(pagamentos.txid(self.lancamento), codigo)
+        self.assertEqual(pagamentos.lancamento_do_txid(pagamentos.txid(self.lancamento)), self.lancamento.pk)
+        self.assertEqual(codigo[-4:], pagamentos._crc16(codigo[:-4]))
+
+
+
+class ConciliacaoEncargosTests(TestCase):
+    """O extrato quita pelo valor devido (com multa e juros), como o webhook."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.condominio = Condominio.objects.create(nome='Condomínio Teste')
+        morador = User.objects.create_user('ana', first_name='Ana', last_name='Sá')
+        cls.unidade = Unidade.objects.create(condominio=cls.condominio, numero='101', morador=morador)
+
+    def _lancamento(self, valor, vencimento, multa=0, juros=0):
+        lanc = Lancamento.objects.create(
+            unidade=self.unidade, tipo=Lancamento.Tipo.EXTRA,
+            competencia=vencimento.replace(day=1), vencimento=vencimento, valor=valor,
+        )
+        Lancamento.objects.filter(pk=lanc.pk).update(multa=multa, juros=juros)
+        return lanc
+
+    def _importar(self, *linhas):
+        csv_ = "Data;Histórico;Documento;Valor\n" + "".join(f"{d};PIX ANA SA;;{v}\n" for d, v in linhas)
+        extrato = ExtratoImportado(arquivo=SimpleUploadedFile('extrato.csv', csv_.encode()), condominio=self.condominio)
+        with self.captureOnCommitCallbacks(execute=True):
+            conciliacao.importar(extrato)
+        return {m.valor: m for m in MovimentoBancario.objects.all()}
+
+    def test_valor_de_face_em_atraso_vai_para_revisao(self):
+        lanc = self._lancamento(450, date(2025, 10, 10), multa=9, juros=3)
+        mov = self._importar(('20/11/2025', '450,00'))[Decimal('450.00')]
+        self.assertEqual(mov.status, MovimentoBancario.Status.REVISAO)
+        self.assertEqual(mov.candidatos, [lanc.pk])
+        lanc.refresh_from_db()
+        self.assertIsNone(lanc.pago_em)
+
+    def test_valor_devido_em_atraso_quita(self):
+        lanc = self._lancamento(200, date(2025, 9, 10), multa=4, juros=2)
+        mov = self._importar(('20/11/2025', '206,00'))[Decimal('206.00')]
+        self.assertEqual(mov.status, MovimentoBancario.Status.CONCILIADO)
+        lanc.refresh_from_db()
+        self.assertEqual(lanc.pago_em, date(2025, 11, 20))
+
+    def test_valor_de_face_em_dia_quita(self):
+        lanc = self._lancamento(300, date(2025, 11, 10), multa=6, juros=1)
+        mov = self._importar(('05/11/2025', '300,00'))[Decimal('300.00')]
+        self.assertEqual(mov.status, MovimentoBancario.Status.CONCILIADO)
+        self.assertEqual(mov.lancamento_id, lanc.pk)
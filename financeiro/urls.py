@@ -6,5 +6,7 @@ app_name = "financeiro"
 
 urlpatterns = [
     path("meus/", views.minhas_cobrancas, name="minhas_cobrancas"),
+    path("inadimplencia/", views.inadimplencia, name="inadimplencia"),
     path("enviar-comprovante/<int:pk>/", views.enviar_comprovante, name="enviar_comprovante"),
+    path("webhook/pagamentos/<slug:provedor>/", views.webhook_pagamento, name="webhook_pagamento"),
 ]
\ No newline at end of file
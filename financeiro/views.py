@@ -1,14 +1,20 @@
 # financeiro/views.py
+import csv
 from datetime import datetime
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
 from django.utils import timezone
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import Http404, HttpResponse, JsonResponse
 
+from condominios.models import Condominio
+
+from . import arquivos, pagamentos
+from . import inadimplencia as relatorio_inadimplencia
 from .models import Lancamento
 
 @login_required
@@ -18,6 +24,7 @@ def minhas_cobrancas(request):
       - Unidade onde ele é morador
       - OU direcionados diretamente (morador_alvo)
       - OU incluído em destinatarios (M2M)
+    (resolvidos de antemão em LancamentoVisibilidade — ver financeiro.visibilidade)
     Suporta filtros por status e intervalo de datas (vencimento).
     """
     hoje = timezone.localdate()
@@ -27,19 +34,10 @@ def minhas_cobrancas(request):
     de_str = request.GET.get("de", "")
     ate_str = request.GET.get("ate", "")
 
-    qs = Lancamento.objects.filter(
-        Q(unidade__morador=request.user) |
-        Q(morador_alvo=request.user) |
-        Q(destinatarios=request.user)
-    )
+    qs = Lancamento.objects.visiveis_para(request.user)
 
     # filtro por status
-    if status == "PENDENTE":
-        qs = qs.filter(pago_em__isnull=True, vencimento__gte=hoje)
-    elif status == "VENCIDO":
-        qs = qs.filter(pago_em__isnull=True, vencimento__lt=hoje)
-    elif status == "PAGO":
-        qs = qs.filter(pago_em__isnull=False)
+    qs = qs.com_status(status, hoje)
 
     # filtro por data de vencimento (DateField → sem __date)
     try:
@@ -55,11 +53,15 @@ def minhas_cobrancas(request):
     except Exception:
         ate_str = ""
 
-    qs = qs.order_by("-vencimento", "-id")
+    # unidade (com condomínio e bloco) aparece em cada card: vem no mesmo SELECT
+    qs = qs.select_related("unidade__condominio", "unidade__bloco").order_by("-vencimento", "-id")
 
     # paginação
     paginator = Paginator(qs, 12)
     page_obj = paginator.get_page(request.GET.get("page"))
+    for l in page_obj:
+        if not l.pago_em:
+            l.pix = pagamentos.copia_e_cola(l)
 
     ctx = {
         "page_obj": page_obj,
@@ -72,31 +74,107 @@ def minhas_cobrancas(request):
 
 @login_required
 @require_POST
+@csrf_exempt
 def enviar_comprovante(request, pk):
     """
     Upload do comprovante pelo morador, somente se o lançamento for visível a ele.
+    O handler de upload precisa entrar antes de o CSRF ler o POST; a verificação de
+    CSRF é feita logo em seguida, em _enviar_comprovante.
     """
-    lanc = get_object_or_404(Lancamento, pk=pk)
+    verificado = arquivos.UploadVerificado(request)
+    request.upload_handlers.insert(0, verificado)
+    return _enviar_comprovante(request, pk, verificado)
 
-    user = request.user
-    autorizado = False
-    if getattr(lanc, "morador_alvo_id", None) == user.id:
-        autorizado = True
-    elif getattr(lanc, "unidade_id", None) and getattr(lanc.unidade, "morador_id", None) == user.id:
-        autorizado = True
-    elif lanc.destinatarios.filter(pk=user.pk).exists():
-        autorizado = True
+@csrf_protect
+def _enviar_comprovante(request, pk, verificado):
+    lanc = get_object_or_404(Lancamento, pk=pk)
 
-    if not autorizado:
+    if not lanc.visibilidades.filter(usuario=request.user).exists():
         raise PermissionDenied("Sem permissão para enviar comprovante deste lançamento.")
 
+    voltar = redirect(request.META.get("HTTP_REFERER", "/"))
     file = request.FILES.get("comprovante_pdf")
     if not file:
-        messages.error(request, "Selecione um arquivo.")
-        return redirect(request.META.get("HTTP_REFERER", "/"))
+        messages.error(request, verificado.recusados.get("comprovante_pdf", "Selecione um arquivo."))
+        return voltar
+
+    try:
+        nome = arquivos.guardar(file, hash_conteudo=verificado.hashes.get("comprovante_pdf"))
+    except ValidationError as e:
+        messages.error(request, " ".join(e.messages))
+        return voltar
+    if lanc.comprovante_pdf.name == nome:
+        messages.info(request, "Este comprovante já tinha sido enviado.")
+        return voltar
 
-    lanc.comprovante_pdf = file
+    lanc.comprovante_pdf = nome
     lanc.marcar_comprovante()
     lanc.save(update_fields=["comprovante_pdf", "comprovante_enviado_em"])
     messages.success(request, "Comprovante enviado! Aguarde conferência do gestor.")
-    return redirect(request.META.get("HTTP_REFERER", "/"))
\ No newline at end of file
+    return voltar
+
+@csrf_exempt
+@require_POST
+def webhook_pagamento(request, provedor):
+    """
+    Aviso de pagamento do provedor: só confere a assinatura e registra os eventos
+    (um INSERT). A baixa nos lançamentos é feita pelo comando processar_pagamentos.
+    """
+    p = pagamentos.provedor(provedor)
+    if p is None:
+        raise Http404("Provedor desconhecido.")
+    p.verificar(request)
+    try:
+        eventos = p.eventos(request.body)
+    except ValidationError as e:
+        return JsonResponse({"erro": " ".join(e.messages)}, status=400)
+    pagamentos.registrar(eventos)
+    return JsonResponse({"recebidos": len(eventos)})
+
+def _is_gestor(user):
+    return getattr(user, "role", "") == "GESTOR" or user.is_staff
+
+@login_required
+def inadimplencia(request):
+    """
+    Relatório de inadimplência por unidade e condomínio (faixas de atraso), agregado
+    no banco e servido do cache — ver financeiro.inadimplencia. `?formato=csv` exporta
+    as linhas por unidade.
+    """
+    if not _is_gestor(request.user):
+        raise PermissionDenied("Relatório disponível apenas para a gestão.")
+
+    condominio_id = request.GET.get("condominio", "")
+    condominio_id = int(condominio_id) if condominio_id.isdigit() else None
+    dados = relatorio_inadimplencia.relatorio(condominio_id)
+
+    if request.GET.get("formato") == "csv":
+        resp = HttpResponse(content_type="text/csv; charset=utf-8")
+        resp["Content-Disposition"] = f'attachment; filename="inadimplencia-{dados["hoje"]:%Y%m%d}.csv"'
+        resp.write("\ufeff")  # BOM: acentos corretos no Excel
+        w = csv.writer(resp, delimiter=";")
+        faixas = relatorio_inadimplencia.FAIXAS
+        w.writerow(
+            ["Condomínio", "Bloco", "Unidade", "Morador", "Lançamentos", "Principal", "Encargos",
+             "Total devido", "Vencimento mais antigo", "Dias de atraso"] + [rotulo for _, rotulo, *_ in faixas]
+        )
+        for l in dados["unidades"]:
+            w.writerow(
+                [l["unidade__condominio__nome"], l["unidade__bloco__nome"] or "", l["unidade__numero"],
+                 relatorio_inadimplencia.nome_morador(l), l["lancamentos"], l["principal"], l["encargos"], l["total"],
+                 l["vencimento_mais_antigo"].isoformat(), l["dias_atraso"]]
+                + [l[chave] for chave, *_ in faixas]
+            )
+        return resp
+
+    # o template não indexa dict por variável: valores das faixas em lista, na ordem de FAIXAS
+    for l in dados["unidades"] + dados["condominios"]:
+        l["por_faixa"] = [l[chave] for chave, *_ in relatorio_inadimplencia.FAIXAS]
+    for l in dados["unidades"]:
+        l["morador"] = relatorio_inadimplencia.nome_morador(l)
+    return render(request, "financeiro/inadimplencia.html", {
+        **dados,
+        "faixas": relatorio_inadimplencia.FAIXAS,
+        "condominio_id": condominio_id,
+        "condominios_opcoes": Condominio.objects.order_by("nome"),
+    })
@@ -0,0 +1,99 @@
+# financeiro/visibilidade.py
+"""
+Sincronização da tabela LancamentoVisibilidade.
+
+Para um conjunto de lançamentos, calcula os pares (usuario, lancamento) esperados
+— morador atual da unidade, morador_alvo e destinatarios — com duas consultas,
+compara com o que está gravado e aplica só a diferença (bulk_create + delete).
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import Lancamento, LancamentoVisibilidade
+
+LOTE = 1000
+
+
+def _destinatarios():
+    campo = Lancamento._meta.get_field('destinatarios')
+    return (
+        campo.remote_field.through,
+        f"{campo.m2m_field_name()}_id",
+        f"{campo.m2m_reverse_field_name()}_id",
+    )
+
+
+def pares_esperados(lancamento_ids):
+    """{lancamento_id: {usuario_id, ...}} para os lançamentos informados."""
+    esperados = defaultdict(set)
+    for pk, morador_id, alvo_id in (
+        Lancamento.objects.filter(pk__in=lancamento_ids)
+        .values_list('pk', 'unidade__morador_id', 'morador_alvo_id')
+    ):
+        esperados[pk]  # lançamento sem destinatário continua presente (e vazio)
+        for usuario_id in (morador_id, alvo_id):
+            if usuario_id:
+                esperados[pk].add(usuario_id)
+
+    through, col_lanc, col_user = _destinatarios()
+    for pk, usuario_id in through.objects.filter(**{f"{col_lanc}__in": lancamento_ids}).values_list(col_lanc, col_user):
+        esperados[pk].add(usuario_id)
+    return esperados
+
+
+def sincronizar(lancamento_ids):
+    """Deixa a visibilidade de `lancamento_ids` igual ao estado atual dos lançamentos."""
+    lancamento_ids = list(lancamento_ids)
+    if not lancamento_ids:
+        return
+    esperados = pares_esperados(lancamento_ids)
+
+    atuais = defaultdict(set)
+    for pk, usuario_id in LancamentoVisibilidade.objects.filter(
+        lancamento_id__in=lancamento_ids
+    ).values_list('lancamento_id', 'usuario_id'):
+        atuais[pk].add(usuario_id)
+
+    novos = [
+        LancamentoVisibilidade(lancamento_id=pk, usuario_id=u)
+        for pk, usuarios in esperados.items()
+        for u in usuarios - atuais[pk]
+    ]
+    remover = Q()
+    for pk in set(atuais) | set(esperados):
+        sobrando = atuais[pk] - esperados.get(pk, set())
+        if sobrando:
+            remover |= Q(lancamento_id=pk, usuario_id__in=sobrando)
+
+    if remover:
+        LancamentoVisibilidade.objects.filter(remover).delete()
+    if novos:
+        LancamentoVisibilidade.objects.bulk_create(novos, batch_size=LOTE, ignore_conflicts=True)
+
+
+def sincronizar_unidades(unidade_ids):
+    """O morador de uma unidade mudou: refaz os lançamentos dessa unidade."""
+    sincronizar(Lancamento.objects.filter(unidade_id__in=unidade_ids).values_list('pk', flat=True))
+
+
+def sincronizar_usuario(usuario_id):
+    """Refaz os lançamentos hoje visíveis a `usuario_id` (ex.: M2M limpo pelo lado do usuário)."""
+    sincronizar(
+        LancamentoVisibilidade.objects.filter(usuario_id=usuario_id).values_list('lancamento_id', flat=True)
+    )
+
+
+def reconstruir(lote=LOTE):
+    """Reconstrói a tabela inteira em lotes por ordem de id. Retorna o nº de lançamentos."""
+    total = 0
+    ultimo = 0
+    while True:
+        ids = list(
+            Lancamento.objects.filter(pk__gt=ultimo).order_by('pk').values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return total
+        sincronizar(ids)
+        total += len(ids)
+        ultimo = ids[-1]
@@ -1,7 +1,6 @@
 # portal/templatetags/admin_dashboard.py
 from django import template
 from django.utils import timezone
-from django.db.models import Q
 from reservas.models import Reserva
 from financeiro.models import Lancamento
 
@@ -13,8 +12,8 @@ register = template.Library()
 def kpi_em_uso_agora():
     agora = timezone.localtime()
     return (
-        Reserva.objects.filter(inicio__lte=agora, fim__gt=agora)
-        .exclude(status=Reserva.Status.CANCELADA)
+        Reserva.objects.em_uso(agora)
+        .ativas()
         .count()
     )
 
@@ -23,8 +22,8 @@ def kpi_em_uso_agora():
 def kpi_reservas_hoje():
     hoje = timezone.localdate()
     return (
-        Reserva.objects.filter(inicio__date=hoje)
-        .exclude(status=Reserva.Status.CANCELADA)
+        Reserva.objects.do_dia(hoje)
+        .ativas()
         .count()
     )
 
@@ -32,13 +31,13 @@ def kpi_reservas_hoje():
 @register.simple_tag
 def kpi_inadimplentes():
     hoje = timezone.localdate()
-    return Lancamento.objects.filter(pago_em__isnull=True, vencimento__lt=hoje).count()
+    return Lancamento.objects.vencidos(hoje).count()
 
 
 @register.simple_tag
 def kpi_pendentes():
     hoje = timezone.localdate()
-    return Lancamento.objects.filter(pago_em__isnull=True, vencimento__gte=hoje).count()
+    return Lancamento.objects.pendentes(hoje).count()
 
 
 # --------------- Bloco detalhado ---------------
@@ -51,27 +50,27 @@ def admin_stats_cards(context):
     hoje = timezone.localdate()
 
     em_uso = (
-        Reserva.objects.filter(inicio__lte=agora, fim__gt=agora)
-        .exclude(status=Reserva.Status.CANCELADA)
+        Reserva.objects.em_uso(agora)
+        .ativas()
         .select_related("area", "morador", "area__condominio")
         .order_by("fim")[:8]
     )
 
     reservas_hoje = (
-        Reserva.objects.filter(inicio__date=hoje)
-        .exclude(status=Reserva.Status.CANCELADA)
+        Reserva.objects.do_dia(hoje)
+        .ativas()
         .select_related("area", "morador", "area__condominio")
         .order_by("inicio")[:10]
     )
 
     inadimplentes = (
-        Lancamento.objects.filter(pago_em__isnull=True, vencimento__lt=hoje)
+        Lancamento.objects.vencidos(hoje)
         .select_related("unidade", "unidade__morador", "morador_alvo")
         .order_by("vencimento")[:10]
     )
 
     pendentes = (
-        Lancamento.objects.filter(pago_em__isnull=True, vencimento__gte=hoje)
+        Lancamento.objects.pendentes(hoje)
         .select_related("unidade", "unidade__morador", "morador_alvo")
         .order_by("vencimento")[:10]
     )
@@ -5,4 +5,5 @@ app_name = 'portal'
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('porteiro/eventos/', views.porteiro_eventos, name='porteiro_eventos'),
 ]
\ No newline at end of file
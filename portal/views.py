@@ -1,15 +1,30 @@
 # portal/views.py
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.utils import timezone
 from django.db.models import Q
 
-from reservas.models import Reserva, AreaReservavel
+from reservas.models import Reserva, AreaReservavel, intervalo_do_dia
+from financeiro import saldos
 from financeiro.models import Lancamento
 from comunicados.models import Aviso
 from galeria.models import Evento
 from assembleias.models import Assembleia
 from condominios.models import Unidade
+from reservas.cache import aversao_global
+
+# Feed ao vivo do porteiro (SSE)
+FEED_INTERVALO = 2          # s entre checagens (só relógio + versão no cache)
+FEED_HEARTBEAT = 20         # s sem eventos até mandar um comentário keep-alive
+FEED_DURACAO_MAX = 30 * 60  # s; o EventSource reconecta sozinho e recebe novo snapshot
 
 @login_required
 def home(request):
@@ -19,18 +34,21 @@ def home(request):
 
     if role == "GESTOR":
         ctx = {
-            "inadimplentes": Lancamento.objects.filter(pago_em__isnull=True, vencimento__lt=hoje).count(),
-            "pendentes": Lancamento.objects.filter(pago_em__isnull=True, vencimento__gte=hoje).count(),
+            "inadimplentes": Lancamento.objects.vencidos(hoje).count(),
+            "pendentes": Lancamento.objects.pendentes(hoje).count(),
+            # somas dos saldos por unidade/competência (uma linha por mês, não por lançamento)
+            "saldo_total": saldos.totais(),
+            "saldo_ano": saldos.totais(de=hoje.replace(month=1, day=1)),
             "areas": AreaReservavel.objects.all()[:12],
             "em_uso_agora": (
-                Reserva.objects.filter(inicio__lte=agora, fim__gt=agora)
-                .exclude(status=Reserva.Status.CANCELADA)
+                Reserva.objects.em_uso(agora)
+                .ativas()
                 .select_related('morador','area','area__condominio')
                 .order_by('fim')[:20]
             ),
             "reservas_proximas": (
-                Reserva.objects.filter(inicio__date__gte=hoje)
-                .exclude(status=Reserva.Status.CANCELADA)
+                Reserva.objects.a_partir_de(hoje)
+                .ativas()
                 .exclude(inicio__lte=agora, fim__gt=agora)
                 .select_related('morador','area','area__condominio')
                 .order_by("inicio")[:20]
@@ -44,19 +62,21 @@ def home(request):
     if role == "PORTEIRO":
         ctx = {}
         reservas_hoje = (
-            Reserva.objects.filter(inicio__date=hoje)
-            .exclude(status=Reserva.Status.CANCELADA)
+            Reserva.objects.do_dia(hoje)
+            .ativas()
             .select_related("morador", "area", "area__condominio")
             .order_by("inicio")
         )
         ctx["reservas_hoje"] = reservas_hoje
         ctx["em_uso_agora"] = (
-            Reserva.objects.filter(inicio__lte=agora, fim__gt=agora)
-            .exclude(status=Reserva.Status.CANCELADA)
+            Reserva.objects.em_uso(agora)
+            .ativas()
             .select_related("morador", "area", "area__condominio")
             .order_by("fim")
         )
         ctx["agora"] = agora
+        ctx["ao_vivo"] = settings.PORTEIRO_AO_VIVO
+        ctx["eventos_url"] = settings.PORTEIRO_EVENTOS_URL
         return render(request, "portal/dashboard_porteiro.html", ctx)
 
     # MORADOR
@@ -72,11 +92,7 @@ def home(request):
     ctx = {
         "minhas_reservas": minhas,
         "meus_lancamentos": (
-            Lancamento.objects.filter(
-                Q(unidade__morador=request.user)
-                | Q(morador_alvo=request.user)
-                | Q(destinatarios=request.user)
-            ).order_by("-vencimento")[:10]
+            Lancamento.objects.visiveis_para(request.user).order_by("-vencimento")[:10]
         ),
         "eventos": Evento.objects.all().order_by("id")[:6],  # ajuste se tiver campo de data
         "assembleias_proximas": asm_qs.order_by("quando")[:6],
@@ -84,4 +100,132 @@ def home(request):
         "cancelaveis_ids": [r.id for r in minhas if r.inicio > agora],
         "avisos": Aviso.objects.all()[:6],
     }
-    return render(request, "portal/dashboard_morador.html", ctx)
\ No newline at end of file
+    return render(request, "portal/dashboard_morador.html", ctx)
+
+
+# ---------------- Feed ao vivo do porteiro (Server-Sent Events) ----------------
+def _reservas_porteiro():
+    """
+    Estado que o painel do porteiro exibe: reservas ativas que começam hoje ou estão
+    em uso agora, como dicts serializáveis indexados por id. Uma query.
+    """
+    agora = timezone.localtime()
+    dia_ini, dia_fim = intervalo_do_dia(agora.date())
+    qs = (
+        Reserva.objects.ativas()
+        .filter(Q(inicio__gte=dia_ini, inicio__lt=dia_fim) | Q(inicio__lte=agora, fim__gt=agora))
+        .select_related("morador", "area", "area__condominio")
+        .order_by("inicio")
+    )
+    return {r.id: _reserva_feed(r, agora) for r in qs}
+
+
+def _reserva_feed(r, agora):
+    inicio, fim = timezone.localtime(r.inicio), timezone.localtime(r.fim)
+    return {
+        "id": r.id,
+        "area": r.area.nome,
+        "condominio": r.area.condominio.nome if r.area.condominio_id else "",
+        "morador": (r.morador.get_full_name() or r.morador.username) if r.morador_id else "",
+        "inicio": inicio.strftime("%H:%M"),
+        "fim": fim.strftime("%H:%M"),
+        "inicio_iso": inicio.isoformat(),
+        "fim_iso": fim.isoformat(),
+        "status": r.status,
+        "hoje": inicio.date() == agora.date(),
+        "em_uso": r.inicio <= agora < r.fim,
+    }
+
+
+def _sse(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+def _diferencas(antes, depois, agora):
+    """
+    Eventos (nome, dados) que levam o painel do estado `antes` ao `depois`. Quem sai do
+    painel é "expirada" se começou antes de hoje e já acabou (em uso desde ontem, ou o
+    dia virou); senão, "cancelada".
+    """
+    eventos = []
+    for rid, r in depois.items():
+        anterior = antes.get(rid)
+        if anterior is None:
+            eventos.append(("nova", r))
+        elif anterior != r:
+            if anterior["em_uso"] != r["em_uso"]:
+                eventos.append(("iniciada" if r["em_uso"] else "encerrada", r))
+            else:
+                eventos.append(("alterada", r))
+    for rid in antes.keys() - depois.keys():
+        r = antes[rid]
+        expirou = (
+            datetime.fromisoformat(r["inicio_iso"]).date() < agora.date()
+            and datetime.fromisoformat(r["fim_iso"]) <= agora
+        )
+        eventos.append(("expirada" if expirou else "cancelada", {"id": rid}))
+    return eventos
+
+
+async def _fluxo_porteiro():
+    estado = await sync_to_async(_reservas_porteiro)()
+    versao = await aversao_global()
+    dia = timezone.localdate()
+    yield "retry: 5000\n" + _sse("snapshot", list(estado.values()))
+
+    inicio = ultimo_envio = time.monotonic()
+    while time.monotonic() - inicio < FEED_DURACAO_MAX:
+        await asyncio.sleep(FEED_INTERVALO)
+        agora = timezone.localtime()
+
+        nova_versao = await aversao_global()
+        if nova_versao != versao or agora.date() != dia:
+            # houve escrita em reservas (ou virou o dia): UMA query e enviamos só a diferença
+            versao, dia = nova_versao, agora.date()
+            novo = await sync_to_async(_reservas_porteiro)()
+        else:
+            # sem escrita: início/fim de uso são calculados só com o relógio
+            novo = {}
+            for rid, r in estado.items():
+                fim = datetime.fromisoformat(r["fim_iso"])
+                if fim <= agora and not r["hoje"]:
+                    continue  # estava em uso desde ontem e acabou: sai do painel
+                em_uso = datetime.fromisoformat(r["inicio_iso"]) <= agora < fim
+                novo[rid] = r if em_uso == r["em_uso"] else {**r, "em_uso": em_uso}
+
+        eventos = _diferencas(estado, novo, agora)
+        estado = novo
+        if eventos:
+            ultimo_envio = time.monotonic()
+            yield "".join(_sse(nome, dados) for nome, dados in eventos)
+        elif time.monotonic() - ultimo_envio >= FEED_HEARTBEAT:
+            ultimo_envio = time.monotonic()
+            yield ": ping\n\n"
+
+
+async def porteiro_eventos(request):
+    """
+    Stream SSE para o painel do porteiro: snapshot inicial e depois apenas mudanças
+    (nova, cancelada, expirada, alterada, iniciada, encerrada). Entre eventos a única
+    leitura é o contador de versão no cache; o banco só é consultado quando algo muda.
+    Em produção é servido pelo processo `eventos` do procfile (condox/asgi.py, worker
+    Uvicorn, só esta URL); o resto do site segue em WSGI. Sob WSGI (p.ex. runserver) ou
+    sem Redis (PORTEIRO_AO_VIVO) responde 204 e o painel segue com o recarregamento
+    periódico.
+    """
+    user = await request.auser()
+    if not user.is_authenticated or getattr(user, "role", "MORADOR") not in ("PORTEIRO", "GESTOR"):
+        return HttpResponseForbidden("Sem permissão.")
+    if not hasattr(request, "scope") or not settings.PORTEIRO_AO_VIVO:
+        return HttpResponse(status=204)
+
+    resposta = StreamingHttpResponse(_fluxo_porteiro(), content_type="text/event-stream")
+    resposta["Cache-Control"] = "no-cache"
+    resposta["X-Accel-Buffering"] = "no"
+    # o painel vem do processo `web` (outra origem): libera o EventSource com o cookie de sessão
+    origem = request.headers.get("Origin")
+    if origem in settings.CSRF_TRUSTED_ORIGINS:
+        resposta["Access-Control-Allow-Origin"] = origem
+        resposta["Access-Control-Allow-Credentials"] = "true"
+        resposta["Vary"] = "Origin"
+    return resposta
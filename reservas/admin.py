@@ -1,31 +1,39 @@
-from django.contrib import admin
-from django.utils.html import format_html
-from .models import AreaReservavel, Reserva
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.db.models import Count
+from django.utils.html import format_html, format_html_join
+from django.utils.timezone import localtime
+from . import estatisticas
+from .models import AreaReservavel, ListaEspera, Reserva, ResumoArea, SerieReserva
+from .forms import ReservaAdminForm
+from .servicos import criar_serie, reservar
+from .cache import atualizar_e_invalidar
+from .espera import liberar_horarios
 
 
 # ---------- AreaReservavel ----------
 @admin.register(AreaReservavel)
 class AreaReservavelAdmin(admin.ModelAdmin):
-    list_display = ("nome", "condominio", "janela", "dias_permitidos_str", "bloqueios_qtd")
+    list_display = ("nome", "condominio", "janela", "slot_minutos", "capacidade_str", "dias_permitidos_str", "bloqueios_qtd")
     list_filter = ("condominio",)
     search_fields = ("nome", "condominio__nome")
     ordering = ("condominio__nome", "nome")
 
     @admin.display(description="Janela")
     def janela(self, obj: AreaReservavel):
-        h1 = obj.hora_inicio.strftime("%H:%M") if obj.hora_inicio else "00:00"
-        h2 = obj.hora_fim.strftime("%H:%M") if obj.hora_fim else "23:59"
-        return f"{h1}–{h2}"
+        return obj.regras.rotulo_janela()
+
+    @admin.display(description="Capacidade", ordering="capacidade")
+    def capacidade_str(self, obj: AreaReservavel):
+        return obj.capacidade or "Sem limite"
 
     @admin.display(description="Dias")
     def dias_permitidos_str(self, obj: AreaReservavel):
-        if obj.dias_permitidos:
-            return ", ".join(str(d) for d in obj.dias_permitidos) + " (0=Seg..6=Dom)"
-        return "Todos"
+        return obj.regras.rotulo_dias()
 
     @admin.display(description="Datas bloqueadas")
     def bloqueios_qtd(self, obj: AreaReservavel):
-        return len(obj.datas_bloqueadas or [])
+        return len(obj.regras.datas_bloqueadas)
 
 
 # ---------- Reserva ----------
@@ -37,6 +45,7 @@ STATUS_COLORS = {
 
 @admin.register(Reserva)
 class ReservaAdmin(admin.ModelAdmin):
+    form = ReservaAdminForm
     list_display = ("area", "morador", "periodo", "status_badge")
     list_filter = ("status", "area__condominio", "area")
     search_fields = ("morador__username", "morador__first_name", "morador__last_name", "area__nome")
@@ -59,10 +68,178 @@ class ReservaAdmin(admin.ModelAdmin):
 
     @admin.action(description="Marcar como APROVADA")
     def aprovar_reservas(self, request, queryset):
-        updated = queryset.update(status=Reserva.Status.APROVADA)
+        # pendentes já ocupam o horário; canceladas voltam a ocupar e passam pela
+        # checagem de conflito com a área travada (servicos.reservar)
+        updated = atualizar_e_invalidar(queryset.ativas(), status=Reserva.Status.APROVADA)
+        conflitos = []
+        for reserva in queryset.filter(status=Reserva.Status.CANCELADA).select_related("area"):
+            reserva.status = Reserva.Status.APROVADA
+            try:
+                reservar(reserva)
+            except ValidationError as e:
+                conflitos.append(f"{reserva.area.nome} {localtime(reserva.inicio):%d/%m %H:%M}: {' '.join(e.messages)}")
+            else:
+                updated += 1
         self.message_user(request, f"{updated} reserva(s) marcada(s) como APROVADA.")
+        if conflitos:
+            self.message_user(
+                request, f"{len(conflitos)} não aprovada(s) — " + "; ".join(conflitos[:10]), messages.WARNING,
+            )
 
     @admin.action(description="Marcar como CANCELADA")
     def cancelar_reservas(self, request, queryset):
-        updated = queryset.update(status=Reserva.Status.CANCELADA)
-        self.message_user(request, f"{updated} reserva(s) marcada(s) como CANCELADA.")
\ No newline at end of file
+        # update() não dispara sinais: a lista de espera é chamada aqui
+        liberadas = list(queryset.ativas().values_list("area_id", "inicio", "fim"))
+        updated = atualizar_e_invalidar(queryset, status=Reserva.Status.CANCELADA)
+        liberar_horarios(liberadas)
+        self.message_user(request, f"{updated} reserva(s) marcada(s) como CANCELADA.")
+
+# ---------- ListaEspera ----------
+@admin.register(ListaEspera)
+class ListaEsperaAdmin(admin.ModelAdmin):
+    list_display = ("area", "morador", "periodo", "status", "criado_em", "reserva")
+    list_filter = ("status", "area__condominio", "area")
+    search_fields = ("morador__username", "morador__first_name", "morador__last_name", "area__nome")
+    list_select_related = ("area", "morador", "reserva")
+    autocomplete_fields = ("area", "morador")
+    readonly_fields = ("reserva", "criado_em", "atendido_em")
+    date_hierarchy = "inicio"
+
+    @admin.display(description="Período", ordering="inicio")
+    def periodo(self, obj: ListaEspera):
+        return f"{localtime(obj.inicio):%d/%m/%Y %H:%M} – {localtime(obj.fim):%H:%M}"
+
+
+# ---------- SerieReserva ----------
+class ReservaDaSerieInline(admin.TabularInline):
+    model = Reserva
+    fields = ("inicio", "fim", "status")
+    readonly_fields = ("inicio", "fim")
+    extra = 0
+    can_delete = False
+    show_change_link = True
+
+
+@admin.register(SerieReserva)
+class SerieReservaAdmin(admin.ModelAdmin):
+    list_display = ("area", "morador", "frequencia", "intervalo", "primeira", "ate", "quantidade", "ocorrencias_qtd")
+    list_filter = ("frequencia", "area__condominio", "area")
+    search_fields = ("morador__username", "morador__first_name", "morador__last_name", "area__nome")
+    autocomplete_fields = ("area", "morador")
+    inlines = (ReservaDaSerieInline,)
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .select_related("area", "morador")
+            .annotate(_ocorrencias=Count("reservas"))
+        )
+
+    @admin.display(description="Primeira ocorrência", ordering="inicio")
+    def primeira(self, obj: SerieReserva):
+        return f"{localtime(obj.inicio):%d/%m/%Y %H:%M} – {localtime(obj.fim):%H:%M}"
+
+    @admin.display(description="Ocorrências", ordering="_ocorrencias")
+    def ocorrencias_qtd(self, obj: SerieReserva):
+        return obj._ocorrencias
+
+    def get_readonly_fields(self, request, obj=None):
+        # a recorrência só é expandida na criação; depois edite as reservas individualmente
+        if obj:
+            return ("area", "inicio", "fim", "frequencia", "intervalo", "ate", "quantidade", "status", "permite_compartilhar")
+        return ()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            return
+        try:
+            criadas, conflitos = criar_serie(obj)
+        except ValidationError as e:
+            self.message_user(request, " ".join(e.messages), messages.ERROR)
+            return
+
+        self.message_user(request, f"{len(criadas)} reserva(s) criada(s) na série.", messages.SUCCESS)
+        if conflitos:
+            detalhes = "; ".join(
+                f"{localtime(ini):%d/%m %H:%M}: {motivo}" for ini, _fim, motivo in conflitos[:10]
+            )
+            extra = f" (+{len(conflitos) - 10})" if len(conflitos) > 10 else ""
+            self.message_user(
+                request,
+                f"{len(conflitos)} ocorrência(s) não criada(s) — {detalhes}{extra}",
+                messages.WARNING,
+            )
+
+
+# ---------- Estatísticas de uso ----------
+DIAS_SEMANA = ("Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom")
+
+
+@admin.register(ResumoArea)
+class ResumoAreaAdmin(admin.ModelAdmin):
+    """
+    Lê apenas as tabelas-resumo (reservas.estatisticas); nada é agregado na requisição.
+    Os resumos são atualizados pelo comando `atualizar_estatisticas` (agendado) ou pela ação.
+    """
+    list_display = ("area", "total", "canceladas", "taxa_cancelamento_pct", "horas_reservadas", "atualizado_em")
+    list_filter = ("area__condominio",)
+    search_fields = ("area__nome", "area__condominio__nome")
+    list_select_related = ("area", "area__condominio")
+    actions = ("recalcular",)
+    fields = ("area", "total", "canceladas", "taxa_cancelamento_pct", "horas_reservadas",
+              "atualizado_em", "mapa_de_calor", "ranking_moradores")
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Cancelamento")
+    def taxa_cancelamento_pct(self, obj: ResumoArea):
+        return f"{obj.taxa_cancelamento:.1%}"
+
+    @admin.display(description="Horas reservadas", ordering="minutos_reservados")
+    def horas_reservadas(self, obj: ResumoArea):
+        return f"{obj.minutos_reservados / 60:.1f} h"
+
+    @admin.display(description="Ocupação (minutos por dia/hora)")
+    def mapa_de_calor(self, obj: ResumoArea):
+        matriz = estatisticas.heatmap(obj.area_id)
+        maximo = max((m for linha in matriz for m in linha), default=0) or 1
+        cabecalho = format_html_join("", "<th style='padding:2px 4px;font-size:11px'>{}</th>", ((h,) for h in range(24)))
+        linhas = format_html_join(
+            "",
+            "<tr><th style='padding:2px 6px;font-size:11px'>{}</th>{}</tr>",
+            (
+                (
+                    DIAS_SEMANA[dia],
+                    format_html_join(
+                        "",
+                        "<td title='{} min' style='width:22px;height:18px;background:rgba(37,99,235,{})'></td>",
+                        ((m, f"{m / maximo:.2f}") for m in linha),
+                    ),
+                )
+                for dia, linha in enumerate(matriz)
+            ),
+        )
+        return format_html("<table><tr><th></th>{}</tr>{}</table>", cabecalho, linhas)
+
+    @admin.display(description="Moradores que mais reservam")
+    def ranking_moradores(self, obj: ResumoArea):
+        if not obj.top_moradores:
+            return "—"
+        return format_html(
+            "<ol>{}</ol>",
+            format_html_join(
+                "", "<li>{} — {} reserva(s), {} h</li>",
+                ((m["nome"], m["reservas"], f"{m['minutos'] / 60:.1f}") for m in obj.top_moradores),
+            ),
+        )
+
+    @admin.action(description="Recalcular estatísticas")
+    def recalcular(self, request, queryset):
+        ids = estatisticas.atualizar(completo=True, areas=queryset.values_list("area_id", flat=True))
+        self.message_user(request, f"{len(ids)} área(s) recalculada(s).")
@@ -0,0 +1,106 @@
+# reservas/cache.py
+"""
+Cache das listas de slots por (área, dia).
+
+A chave de cada lista inclui dois contadores de versão guardados no próprio cache:
+  - versão da área (muda quando as regras da AreaReservavel são editadas)
+  - versão do (área, dia) (muda quando uma reserva daquele dia é criada/alterada/cancelada)
+
+Invalidar = incrementar o contador; as listas antigas simplesmente deixam de ser
+lidas e expiram sozinhas. Funciona com qualquer backend do Django (locmem, arquivo,
+banco) porque só usa get/get_many/set/add/incr.
+"""
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+SLOTS_TIMEOUT = 60 * 60 * 24  # segundos; a versão já garante a consistência
+
+# muda a cada alteração de QUALQUER reserva (usado pelo feed ao vivo do porteiro)
+CHAVE_VERSAO_GLOBAL = "reservas:versao"
+
+
+def _chave_area(area_id):
+    return f"reservas:area:{area_id}:versao"
+
+
+def _chave_dia(area_id, dia):
+    return f"reservas:area:{area_id}:{dia.isoformat()}:versao"
+
+
+def _incrementar(chave):
+    try:
+        cache.incr(chave)
+    except ValueError:
+        # contador ausente (expirado/evictado): recomeça num valor que nunca foi usado
+        cache.set(chave, time.time_ns(), None)
+
+
+def slots_em_cache(area, dia, calcular):
+    """
+    Devolve a lista de slots de (area, dia) do cache, ou chama `calcular()` e guarda.
+    """
+    chaves = [_chave_area(area.pk), _chave_dia(area.pk, dia)]
+    versoes = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in versoes:
+            cache.add(chave, time.time_ns(), None)
+            versoes[chave] = cache.get(chave)
+
+    chave_slots = f"reservas:slots:{area.pk}:{dia.isoformat()}:{versoes[chaves[0]]}:{versoes[chaves[1]]}"
+    slots = cache.get(chave_slots)
+    if slots is None:
+        slots = calcular()
+        cache.set(chave_slots, slots, SLOTS_TIMEOUT)
+    return slots
+
+
+def _datas_locais(inicio, fim):
+    d = timezone.localtime(inicio).date()
+    ultimo = timezone.localtime(fim).date()
+    while d <= ultimo:
+        yield d
+        d += timedelta(days=1)
+
+
+def versao_global():
+    return cache.get(CHAVE_VERSAO_GLOBAL)
+
+
+async def aversao_global():
+    return await cache.aget(CHAVE_VERSAO_GLOBAL)
+
+
+def invalidar_area(area_id):
+    """Regras da área mudaram: todos os dias dela ficam inválidos."""
+    transaction.on_commit(lambda: _incrementar(_chave_area(area_id)))
+
+
+def invalidar_intervalos(intervalos):
+    """
+    `intervalos`: iterável de (area_id, inicio, fim). Invalida cada (área, dia local)
+    tocado. O incremento só acontece após o commit, para nenhuma leitura concorrente
+    recalcular a partir do estado antigo e gravar na versão nova.
+    """
+    chaves = {
+        _chave_dia(area_id, d)
+        for area_id, inicio, fim in intervalos
+        for d in _datas_locais(inicio, fim)
+    }
+    if chaves:
+        chaves.add(CHAVE_VERSAO_GLOBAL)
+        transaction.on_commit(lambda: [_incrementar(c) for c in chaves])
+
+
+def atualizar_e_invalidar(queryset, **campos):
+    """
+    `queryset.update(**campos)` não dispara sinais (nem preenche auto_now): coleta os
+    intervalos afetados antes do UPDATE e invalida os dias correspondentes depois dele.
+    """
+    intervalos = list(queryset.values_list('area_id', 'inicio', 'fim'))
+    atualizados = queryset.update(atualizado_em=timezone.now(), **campos)
+    invalidar_intervalos(intervalos)
+    return atualizados
@@ -0,0 +1,324 @@
+# reservas/disponibilidade.py
+"""
+Motor de disponibilidade das áreas reservaveis.
+
+Em vez de perguntar ao banco "este slot conflita?" uma vez por slot, carregamos
+os intervalos do dia numa única consulta, ordenamos e fazemos uma varredura
+(sweep) única contra a grade de slots. O custo em queries fica constante,
+independente do tamanho da janela da área.
+
+Em áreas compartilhadas (academia, piscina) a mesma varredura conta as reservas
+simultâneas e compara com `AreaReservavel.capacidade`: O(n log n) no número de
+reservas do período, sem consulta por slot.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.utils import timezone
+
+from .cache import slots_em_cache
+from .models import Reserva, intervalo_do_dia
+
+SLOT_MINUTOS_PADRAO = 60  # áreas definem o seu em AreaReservavel.slot_minutos
+
+
+def janela_do_dia(area, dia):
+    """
+    Retorna (inicio, fim) timezone-aware da janela de funcionamento da área em `dia`.
+    """
+    return area.regras.janela(dia)
+
+
+def dia_permitido(area, dia):
+    """Aplica `dias_permitidos` e `datas_bloqueadas` à data `dia`."""
+    return area.regras.permite_dia(dia)
+
+
+def intervalos_ocupados(area, inicio, fim):
+    """
+    Uma única query: (inicio, fim, permite_compartilhar) das reservas não canceladas
+    da área que tocam [inicio, fim), ordenadas por início.
+    """
+    return list(
+        Reserva.objects.filter(area=area, inicio__lt=fim, fim__gt=inicio)
+        .ativas()
+        .order_by('inicio')
+        .values_list('inicio', 'fim', 'permite_compartilhar')
+    )
+
+
+def _eventos(ocupados):
+    """
+    Pontos de mudança de ocupação, ordenados. No mesmo instante as saídas vêm antes
+    das entradas: intervalos são [inicio, fim), então quem termina às 10h não
+    concorre com quem começa às 10h.
+    """
+    eventos = []
+    for ini, fim, compartilhavel in ocupados:
+        exclusiva = 0 if compartilhavel else 1
+        eventos.append((ini, 1, 1, exclusiva))
+        eventos.append((fim, 0, -1, -exclusiva))
+    eventos.sort(key=lambda e: (e[0], e[1]))
+    return eventos
+
+
+def pico_simultaneo(ocupados):
+    """
+    Maior número de reservas simultâneas entre `ocupados` (varredura O(n log n)).
+    """
+    pico = atual = 0
+    for _, _, delta, _ in _eventos(ocupados):
+        atual += delta
+        pico = max(pico, atual)
+    return pico
+
+
+def mesclar_bloqueios(ocupados, capacidade=None):
+    """
+    Lista ordenada de intervalos disjuntos [ini, fim] em que a área NÃO aceita nova
+    reserva: há uma reserva exclusiva (que não permite compartilhar) ou o número de
+    reservas simultâneas já atingiu `capacidade` (None = sem limite). Mesma regra de
+    `Reserva.clean`.
+
+    Uma varredura única pelos eventos de entrada/saída mantém a contagem de
+    reservas ativas e de exclusivas.
+    """
+    mesclados = []
+    total = exclusivas = 0
+    inicio_bloqueio = None
+    for instante, _, delta, delta_exclusivas in _eventos(ocupados):
+        total += delta
+        exclusivas += delta_exclusivas
+        bloqueado = exclusivas > 0 or (capacidade is not None and total >= capacidade)
+        if bloqueado and inicio_bloqueio is None:
+            inicio_bloqueio = instante
+        elif not bloqueado and inicio_bloqueio is not None:
+            if mesclados and inicio_bloqueio <= mesclados[-1][1]:
+                mesclados[-1][1] = instante
+            elif instante > inicio_bloqueio:
+                mesclados.append([inicio_bloqueio, instante])
+            inicio_bloqueio = None
+    return mesclados
+
+
+def varrer_slots(dt_ini, dt_fim, ocupados, agora=None, passo=SLOT_MINUTOS_PADRAO, capacidade=None):
+    """
+    Gera os slots livres de `passo` minutos em [dt_ini, dt_fim] numa única passada
+    sobre os intervalos bloqueados (ver `mesclar_bloqueios`). Se `agora` for
+    informado, omite slots que já terminaram.
+    """
+    bloqueios = mesclar_bloqueios(ocupados, capacidade)
+    delta = timedelta(minutes=passo)
+
+    slots = []
+    j = 0
+    cursor = dt_ini
+    while cursor + delta <= dt_fim:
+        slot_inicio = cursor
+        slot_fim = cursor + delta
+        cursor = slot_fim
+
+        # pular slots do passado
+        if agora is not None and slot_fim <= agora:
+            continue
+
+        # bloqueios que terminaram antes deste slot não voltam a importar
+        while j < len(bloqueios) and bloqueios[j][1] <= slot_inicio:
+            j += 1
+        if j < len(bloqueios) and bloqueios[j][0] < slot_fim:
+            continue
+
+        slots.append((slot_inicio, slot_fim))
+
+    return slots
+
+
+def slots_do_dia(area, dia):
+    """
+    Todos os slots livres de `dia` (inclusive os que já passaram), sem cache.
+    """
+    if not dia_permitido(area, dia):
+        return []
+
+    dt_ini, dt_fim = janela_do_dia(area, dia)
+    ocupados = intervalos_ocupados(area, dt_ini, dt_fim)
+    return varrer_slots(dt_ini, dt_fim, ocupados, passo=area.slot_minutos, capacidade=area.capacidade)
+
+
+def slots_disponiveis(area, dia):
+    """
+    Gera slots livres (inicio, fim) para a data `dia`, respeitando:
+    - dias_permitidos
+    - hora_inicio / hora_fim
+    - datas_bloqueadas
+    - conflitos com reservas existentes (pendente ou aprovada) que não permitem compartilhar
+    - capacidade da área (reservas compartilhadas simultâneas)
+    - oculta slots totalmente no passado quando a data é hoje
+
+    A lista do dia vem do cache por (área, dia) — ver `reservas.cache`; o corte do
+    passado é aplicado depois, pois depende do horário da requisição.
+    """
+    slots = slots_em_cache(area, dia, lambda: slots_do_dia(area, dia))
+
+    now = timezone.localtime()
+    if dia == now.date():
+        slots = [s for s in slots if s[1] > now]
+    return slots
+
+
+def slots_lotados(area, dia):
+    """
+    Slots da grade de `dia` que ainda não passaram mas estão ocupados — candidatos à
+    lista de espera. Reaproveita a lista de livres do cache; a grade não consulta o banco.
+    """
+    if not dia_permitido(area, dia):
+        return []
+    livres = set(slots_disponiveis(area, dia))
+    dt_ini, dt_fim = janela_do_dia(area, dia)
+    return [
+        s for s in varrer_slots(dt_ini, dt_fim, [], agora=timezone.now(), passo=area.slot_minutos)
+        if s not in livres
+    ]
+
+
+# ---------------- Calendário (vários dias numa passada) ----------------
+LIVRE = 'livre'
+PARCIAL = 'parcial'
+CHEIO = 'cheio'
+BLOQUEADO = 'bloqueado'
+
+
+def _total_slots(dt_ini, dt_fim, agora=None, passo=SLOT_MINUTOS_PADRAO):
+    """Quantos slots a grade do dia teria sem nenhuma reserva."""
+    return len(varrer_slots(dt_ini, dt_fim, [], agora=agora, passo=passo))
+
+
+def calendario(area, inicio, dias):
+    """
+    Matriz de disponibilidade de `dias` dias a partir de `inicio` (date).
+
+    Uma única query de intervalo cobre toda a janela; as regras de dia
+    (dias_permitidos/datas_bloqueadas) são expandidas de uma vez e os intervalos
+    distribuídos por data local antes da varredura de cada dia.
+
+    Retorna lista de dicts: {data, status, livres, total, slots}.
+    """
+    datas = [inicio + timedelta(days=i) for i in range(dias)]
+    permitidas = {d for d in datas if dia_permitido(area, d)}
+    if not permitidas:
+        return [
+            {'data': d, 'status': BLOQUEADO, 'livres': 0, 'total': 0, 'slots': []}
+            for d in datas
+        ]
+
+    janelas = {d: janela_do_dia(area, d) for d in permitidas}
+    janela_ini = min(j[0] for j in janelas.values())
+    janela_fim = max(j[1] for j in janelas.values())
+
+    # distribui cada intervalo nas datas locais que ele toca
+    por_dia = {d: [] for d in permitidas}
+    for ini, fim, compartilhavel in intervalos_ocupados(area, janela_ini, janela_fim):
+        d = timezone.localtime(ini).date()
+        ultimo = timezone.localtime(fim).date()
+        while d <= ultimo:
+            if d in por_dia:
+                por_dia[d].append((ini, fim, compartilhavel))
+            d += timedelta(days=1)
+
+    now = timezone.localtime()
+    resultado = []
+    for d in datas:
+        if d not in permitidas or d < now.date():
+            resultado.append({'data': d, 'status': BLOQUEADO, 'livres': 0, 'total': 0, 'slots': []})
+            continue
+
+        dt_ini, dt_fim = janelas[d]
+        agora = now if d == now.date() else None
+        slots = varrer_slots(
+            dt_ini, dt_fim, por_dia[d], agora=agora,
+            passo=area.slot_minutos, capacidade=area.capacidade,
+        )
+        total = _total_slots(dt_ini, dt_fim, agora=agora, passo=area.slot_minutos)
+
+        if total == 0:
+            status = BLOQUEADO
+        elif len(slots) == total:
+            status = LIVRE
+        elif slots:
+            status = PARCIAL
+        else:
+            status = CHEIO
+
+        resultado.append({
+            'data': d, 'status': status,
+            'livres': len(slots), 'total': total, 'slots': slots,
+        })
+    return resultado
+
+
+# ---------------- Busca da próxima janela livre (várias áreas) ----------------
+def _janelas_da_area(area, ocupados, duracao, datas, agora):
+    """
+    Gera, em ordem, as janelas livres [inicio, inicio + duracao) de `area` nas `datas`.
+    Os inícios seguem a grade de slots da área e a janela inteira precisa caber no
+    horário de funcionamento do dia. Bloqueios e candidatas avançam juntos (um ponteiro).
+    """
+    bloqueios = mesclar_bloqueios(ocupados, area.capacidade)
+    passo = timedelta(minutes=area.slot_minutos)
+    j = 0
+    for d in datas:
+        if not dia_permitido(area, d):
+            continue
+        dt_ini, dt_fim = janela_do_dia(area, d)
+        cursor = dt_ini
+        while cursor + duracao <= dt_fim:
+            inicio, fim = cursor, cursor + duracao
+            cursor += passo
+            if inicio < agora:
+                continue
+            while j < len(bloqueios) and bloqueios[j][1] <= inicio:
+                j += 1
+            if j < len(bloqueios) and bloqueios[j][0] < fim:
+                continue
+            yield inicio, fim, area
+
+
+def proximas_janelas(areas, duracao, de, ate, limite, agora=None):
+    """
+    As `limite` primeiras janelas livres de `duracao` (timedelta) entre as datas `de`
+    e `ate` (inclusive) em qualquer uma das `areas`, respeitando as regras de cada
+    área (dias, horário, datas bloqueadas, capacidade).
+
+    Uma única query traz as reservas de todas as áreas no período; elas são separadas
+    em listas ordenadas por área e cada área vira um gerador ordenado de janelas.
+    `heapq.merge` intercala os geradores e a busca para assim que achar `limite`.
+
+    Retorna lista de (inicio, fim, area).
+    """
+    areas = list(areas)
+    if not areas or de > ate:
+        return []
+    agora = agora or timezone.now()
+    datas = [de + timedelta(days=i) for i in range((ate - de).days + 1)]
+    periodo_ini = intervalo_do_dia(de)[0]
+    periodo_fim = intervalo_do_dia(ate)[1]
+
+    por_area = defaultdict(list)
+    reservas = (
+        Reserva.objects.filter(area__in=areas, inicio__lt=periodo_fim, fim__gt=periodo_ini)
+        .ativas()
+        .order_by('area_id', 'inicio')
+        .values_list('area_id', 'inicio', 'fim', 'permite_compartilhar')
+    )
+    for area_id, ini, fim, compartilhavel in reservas:
+        por_area[area_id].append((ini, fim, compartilhavel))
+
+    def chaveadas(n, area):
+        # chave (inicio, posição da área): empates no mesmo horário nunca comparam a área
+        for ini, fim, _ in _janelas_da_area(area, por_area[area.pk], duracao, datas, agora):
+            yield ini, n, fim, area
+
+    ordenados = heapq.merge(*(chaveadas(n, area) for n, area in enumerate(areas)))
+    return [(ini, fim, area) for ini, _, fim, area in islice(ordenados, limite)]
@@ -0,0 +1,119 @@
+# reservas/espera.py
+"""
+Lista de espera: quando uma reserva deixa de ocupar um período (cancelada, removida
+ou remarcada), os pedidos AGUARDANDO que se sobrepõem a ele são tentados em ordem de
+chegada e viram reservas aprovadas se couberem.
+
+A busca dos pedidos é uma consulta de intervalo sobre o índice parcial
+`espera_area_periodo_aguardando`. O aviso ao morador vai para a fila de notificações
+(comunicados.Notificacao); nada é enviado durante a requisição.
+
+Isto roda no `on_commit` da requisição que liberou o horário, então o trabalho é
+limitado ao espaço liberado: a ocupação das áreas é lida uma vez (sem lock) e só os
+pedidos que cabem nela são tentados — no máximo MAX_TENTATIVAS transações com a área
+travada por liberação, em vez de uma por candidato.
+"""
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from comunicados.notificacoes import enfileirar
+
+from .disponibilidade import intervalos_ocupados, mesclar_bloqueios
+from .models import ListaEspera, Reserva
+from .servicos import travar_area
+
+MAX_CANDIDATOS = 50  # pedidos sobrepostos lidos por liberação
+MAX_TENTATIVAS = 5   # dos que cabem, quantos são tentados (cada um trava a área)
+EVENTO_ATENDIDO = 'reserva.lista_espera.atendida'
+
+
+def liberar_horarios(intervalos):
+    """
+    `intervalos`: iterável de (area_id, inicio, fim) que ficaram livres. A lista de
+    espera é processada depois do commit, quando a liberação já é visível.
+    """
+    intervalos = [i for i in intervalos if None not in i]
+    if intervalos:
+        transaction.on_commit(lambda: atender_lista_espera(intervalos))
+
+
+def _atender(pedido, agora):
+    """Tenta converter `pedido` em reserva. True se atendido."""
+    reserva = Reserva(
+        area=pedido.area, morador=pedido.morador,
+        inicio=pedido.inicio, fim=pedido.fim,
+        status=Reserva.Status.APROVADA,
+        permite_compartilhar=pedido.permite_compartilhar,
+        observacoes='Atendida pela lista de espera.',
+    )
+    try:
+        with transaction.atomic():
+            # o UPDATE condicional "reivindica" o pedido: outro processo atendendo a
+            # mesma liberação não o converte duas vezes
+            if not ListaEspera.objects.aguardando().filter(pk=pedido.pk).update(
+                status=ListaEspera.Status.ATENDIDA, atendido_em=agora
+            ):
+                return False
+            travar_area(pedido.area_id)
+            reserva.clean()
+            reserva.save()
+            ListaEspera.objects.filter(pk=pedido.pk).update(reserva=reserva)
+            enfileirar(
+                pedido.morador, EVENTO_ATENDIDO,
+                reserva_id=reserva.pk,
+                area=pedido.area.nome,
+                inicio=timezone.localtime(reserva.inicio).isoformat(),
+                fim=timezone.localtime(reserva.fim).isoformat(),
+            )
+    except (ValidationError, IntegrityError):
+        return False  # ainda não cabe: continua aguardando
+    return True
+
+
+def _cabe(pedido, ocupados):
+    bloqueios = mesclar_bloqueios(ocupados, pedido.area.capacidade)
+    return not any(ini < pedido.fim and pedido.inicio < fim for ini, fim in bloqueios)
+
+
+def atender_lista_espera(intervalos, agora=None):
+    """
+    Atende, por ordem de chegada, os pedidos que se sobrepõem a `intervalos` e cabem na
+    ocupação atual da área. Retorna a lista de pedidos atendidos.
+    """
+    agora = agora or timezone.now()
+    sobrepostos = Q()
+    for area_id, inicio, fim in intervalos:
+        sobrepostos |= Q(area_id=area_id, inicio__lt=fim, fim__gt=inicio)
+
+    candidatos = (
+        ListaEspera.objects.aguardando()
+        .filter(sobrepostos, inicio__gt=agora)
+        .select_related('area', 'morador')
+        .order_by('criado_em', 'pk')[:MAX_CANDIDATOS]
+    )
+    candidatos = list(candidatos)
+    if not candidatos:
+        return []
+
+    # uma leitura da ocupação por área, cobrindo todos os candidatos dela
+    ocupados = {}
+    for area_id in {p.area_id for p in candidatos}:
+        da_area = [p for p in candidatos if p.area_id == area_id]
+        ocupados[area_id] = intervalos_ocupados(
+            area_id, min(p.inicio for p in da_area), max(p.fim for p in da_area),
+        )
+
+    atendidos = []
+    tentativas = 0
+    for pedido in candidatos:
+        if tentativas == MAX_TENTATIVAS:
+            break
+        if not _cabe(pedido, ocupados[pedido.area_id]):
+            continue  # o horário liberado não basta para este pedido
+        tentativas += 1
+        if _atender(pedido, agora):
+            atendidos.append(pedido)
+            ocupados[pedido.area_id].append((pedido.inicio, pedido.fim, pedido.permite_compartilhar))
+    return atendidos
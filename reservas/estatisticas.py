@@ -0,0 +1,245 @@
+# reservas/estatisticas.py
+"""
+Estatísticas de uso das áreas (heatmap por dia da semana/hora, taxa de cancelamento,
+moradores que mais reservam), agregadas no banco e guardadas em ResumoArea,
+OcupacaoHora e UsoMorador.
+
+O heatmap agrupa as reservas no SQL por (dia da semana, hora, minuto de início locais,
+duração). Como as reservas seguem a grade de slots, milhões de linhas viram poucos
+milhares de grupos; só esses grupos são distribuídos em Python pelas horas que cada
+intervalo atravessa.
+
+A atualização é incremental: só as áreas com reservas alteradas (`Reserva.atualizado_em`)
+depois do último cálculo são atualizadas, e só com as reservas alteradas. Cada reserva
+contada fica em ReservaContabilizada como estava no cálculo; a atualização subtrai essas
+linhas, copia as reservas atuais por cima e soma a nova contribuição aos resumos. Reprocessar
+uma reserva não muda nada, então a marca d'água recua FOLGA para pegar escritas que
+terminaram depois da leitura. O cálculo completo (primeira vez, remoções, `--completo`)
+recopia a área inteira.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, DurationField, Exists, ExpressionWrapper, F, OuterRef, Q, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, ExtractMinute
+from django.utils import timezone
+
+from .models import AreaReservavel, OcupacaoHora, Reserva, ReservaContabilizada, ResumoArea, UsoMorador
+
+MINUTOS_SEMANA = 7 * 24 * 60
+TOP_MORADORES = 10
+FOLGA = timedelta(minutes=5)  # transações mais longas que isso podem escapar da marca d'água
+LIMITE_INCREMENTAL = 5000     # acima disso de reservas alteradas, recalcula a área inteira
+
+DURACAO = ExpressionWrapper(F('fim') - F('inicio'), output_field=DurationField())
+CAMPOS_CONTADOS = ('area_id', 'morador_id', 'inicio', 'fim', 'status')
+
+
+def _minutos(duracao):
+    return int(duracao.total_seconds() // 60) if duracao else 0
+
+
+def _ocupacao(reservas):
+    """
+    {(dia_semana, hora): [minutos, reservas]} a partir de grupos agregados no banco.
+    Intervalos que cruzam horas (ou a virada da semana) são repartidos entre os baldes.
+    """
+    tz = timezone.get_current_timezone()
+    grupos = (
+        reservas.annotate(
+            dia=ExtractIsoWeekDay('inicio', tzinfo=tz),
+            hora=ExtractHour('inicio', tzinfo=tz),
+            minuto=ExtractMinute('inicio', tzinfo=tz),
+            duracao=DURACAO,
+        )
+        .order_by()
+        .values('dia', 'hora', 'minuto', 'duracao')
+        .annotate(qtd=Count('pk'))
+    )
+
+    baldes = defaultdict(lambda: [0, 0])
+    for g in grupos:
+        inicio = ((g['dia'] - 1) * 24 + g['hora']) * 60 + g['minuto']
+        fim = inicio + min(_minutos(g['duracao']), MINUTOS_SEMANA)
+        cursor = inicio
+        while cursor < fim:
+            limite = min((cursor // 60 + 1) * 60, fim)
+            hora_semana = (cursor // 60) % (7 * 24)
+            balde = baldes[divmod(hora_semana, 24)]
+            balde[0] += (limite - cursor) * g['qtd']
+            balde[1] += g['qtd']
+            cursor = limite
+    return baldes
+
+
+def _contabilizar(contadas):
+    """Contribuição de um conjunto de ReservaContabilizada para os resumos da área."""
+    cancelada = Q(status=Reserva.Status.CANCELADA)
+    totais = contadas.aggregate(
+        total=Count('pk'),
+        canceladas=Count('pk', filter=cancelada),
+        duracao=Sum(DURACAO, filter=~cancelada),
+    )
+    ativas = contadas.exclude(cancelada)
+    por_morador = ativas.order_by().values('morador_id').annotate(qtd=Count('pk'), duracao=Sum(DURACAO))
+    return {
+        'total': totais['total'],
+        'canceladas': totais['canceladas'],
+        'minutos': _minutos(totais['duracao']),
+        'baldes': _ocupacao(ativas),
+        'moradores': {l['morador_id']: [_minutos(l['duracao']), l['qtd']] for l in por_morador},
+    }
+
+
+def _copiar(reservas):
+    """INSERT ... SELECT das reservas para ReservaContabilizada, sem passar pelo Python."""
+    sql, params = reservas.order_by().values('pk', *CAMPOS_CONTADOS).query.sql_with_params()
+    qn = connection.ops.quote_name
+    colunas = ', '.join(qn(c) for c in ('reserva_id', *CAMPOS_CONTADOS))
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {qn(ReservaContabilizada._meta.db_table)} ({colunas}) {sql}", params)
+
+
+def _ajustar(linhas, chave, mais, menos, nova):
+    """
+    Soma `mais` e subtrai `menos` ({chave: [minutos, reservas]}) nas linhas já gravadas:
+    atualiza as que mudaram, cria as que faltam e apaga as que zeraram.
+    """
+    existentes = {chave(l): l for l in linhas}
+    alteradas, novas, zeradas = [], [], []
+    for k in mais.keys() | menos.keys():
+        minutos = mais.get(k, (0, 0))[0] - menos.get(k, (0, 0))[0]
+        reservas = mais.get(k, (0, 0))[1] - menos.get(k, (0, 0))[1]
+        if not (minutos or reservas):
+            continue
+        linha = existentes.get(k)
+        if linha is None:
+            novas.append(nova(k, minutos, reservas))
+            continue
+        linha.minutos += minutos
+        linha.reservas += reservas
+        (zeradas if linha.reservas <= 0 else alteradas).append(linha)
+    modelo = linhas.model
+    modelo.objects.filter(pk__in=[l.pk for l in zeradas]).delete()
+    modelo.objects.bulk_update(alteradas, ['minutos', 'reservas'])
+    modelo.objects.bulk_create(novas)
+
+
+def _top_moradores(area_id):
+    linhas = (
+        UsoMorador.objects.filter(area_id=area_id)
+        .order_by('-minutos', '-reservas')
+        .values('morador_id', 'morador__username', 'morador__first_name', 'morador__last_name', 'reservas', 'minutos')
+        [:TOP_MORADORES]
+    )
+    return [
+        {
+            'morador_id': l['morador_id'],
+            'nome': f"{l['morador__first_name']} {l['morador__last_name']}".strip() or l['morador__username'],
+            'reservas': l['reservas'],
+            'minutos': l['minutos'],
+        }
+        for l in linhas
+    ]
+
+
+def _aplicar(resumo, mais, menos, marca):
+    area_id = resumo.area_id
+    _ajustar(
+        OcupacaoHora.objects.filter(area_id=area_id), lambda o: (o.dia_semana, o.hora),
+        mais['baldes'], menos['baldes'],
+        lambda k, minutos, reservas: OcupacaoHora(
+            area_id=area_id, dia_semana=k[0], hora=k[1], minutos=minutos, reservas=reservas,
+        ),
+    )
+    moradores = mais['moradores'].keys() | menos['moradores'].keys()
+    _ajustar(
+        UsoMorador.objects.filter(area_id=area_id, morador_id__in=moradores), lambda u: u.morador_id,
+        mais['moradores'], menos['moradores'],
+        lambda k, minutos, reservas: UsoMorador(area_id=area_id, morador_id=k, minutos=minutos, reservas=reservas),
+    )
+    resumo.total += mais['total'] - menos['total']
+    resumo.canceladas += mais['canceladas'] - menos['canceladas']
+    resumo.minutos_reservados += mais['minutos'] - menos['minutos']
+    resumo.top_moradores = _top_moradores(area_id)
+    resumo.atualizado_em = marca
+    resumo.save()
+
+
+def _travar_resumo(area_id):
+    """ResumoArea da área, travado: duas atualizações da mesma área não se somam."""
+    ResumoArea.objects.get_or_create(area_id=area_id)
+    qs = ResumoArea.objects.all()
+    if connection.features.has_select_for_update:
+        qs = qs.select_for_update()
+    return qs.get(area_id=area_id)
+
+
+def recalcular_area(area_id):
+    """Recalcula ResumoArea, OcupacaoHora e UsoMorador de uma área a partir de todas as reservas."""
+    marca = timezone.now() - FOLGA
+    with transaction.atomic():
+        resumo = _travar_resumo(area_id)
+        ReservaContabilizada.objects.filter(area_id=area_id).delete()
+        OcupacaoHora.objects.filter(area_id=area_id).delete()
+        UsoMorador.objects.filter(area_id=area_id).delete()
+        _copiar(Reserva.objects.filter(area_id=area_id))
+        resumo.total = resumo.canceladas = resumo.minutos_reservados = 0
+        vazio = {'total': 0, 'canceladas': 0, 'minutos': 0, 'baldes': {}, 'moradores': {}}
+        _aplicar(resumo, _contabilizar(ReservaContabilizada.objects.filter(area_id=area_id)), vazio, marca)
+
+
+def atualizar_area(area_id):
+    """
+    Aplica aos resumos só as reservas da área alteradas desde o último cálculo; sem
+    cálculo anterior (ou com alterações demais) recalcula a área inteira.
+    """
+    marca = timezone.now() - FOLGA
+    with transaction.atomic():
+        resumo = _travar_resumo(area_id)
+        if resumo.atualizado_em is None:
+            return recalcular_area(area_id)
+        ids = list(
+            Reserva.objects.filter(area_id=area_id, atualizado_em__gt=resumo.atualizado_em)
+            .values_list('pk', flat=True)[:LIMITE_INCREMENTAL + 1]
+        )
+        if len(ids) > LIMITE_INCREMENTAL:
+            return recalcular_area(area_id)
+        contadas = ReservaContabilizada.objects.filter(area_id=area_id, reserva_id__in=ids)
+        menos = _contabilizar(contadas)
+        # também as de outra área: a remarcação de área já força o recálculo da área antiga
+        ReservaContabilizada.objects.filter(reserva_id__in=ids).delete()
+        _copiar(Reserva.objects.filter(pk__in=ids, area_id=area_id))
+        _aplicar(resumo, _contabilizar(contadas), menos, marca)
+
+
+def areas_desatualizadas():
+    alteradas = Reserva.objects.filter(
+        area=OuterRef('pk'), atualizado_em__gt=OuterRef('resumo__atualizado_em')
+    )
+    return AreaReservavel.objects.filter(
+        Q(resumo__isnull=True) | Q(resumo__atualizado_em__isnull=True) | Exists(alteradas)
+    )
+
+
+def atualizar(completo=False, areas=None):
+    """
+    Atualiza os resumos. Por padrão só as áreas desatualizadas, com as reservas
+    alteradas; `completo=True` recalcula todas do zero. Retorna a lista de ids.
+    """
+    qs = AreaReservavel.objects.all() if completo else areas_desatualizadas()
+    if areas is not None:
+        qs = qs.filter(pk__in=areas)
+    ids = list(qs.values_list('pk', flat=True))
+    for area_id in ids:
+        (recalcular_area if completo else atualizar_area)(area_id)
+    return ids
+
+
+def heatmap(area_id):
+    """Matriz 7x24 de minutos reservados (linhas: Seg..Dom; colunas: 0h..23h)."""
+    matriz = [[0] * 24 for _ in range(7)]
+    for dia, hora, minutos in OcupacaoHora.objects.filter(area_id=area_id).values_list('dia_semana', 'hora', 'minutos'):
+        matriz[dia][hora] = minutos
+    return matriz
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Reserva
+from .servicos import travar_area
 
 class ReservaForm(forms.ModelForm):
     class Meta:
@@ -14,4 +15,21 @@ class ReservaForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         # morador sempre o usuário logado (não expõe no form)
-        self.user = user
\ No newline at end of file
+        self.user = user
+
+
+class ReservaAdminForm(forms.ModelForm):
+    """
+    Form do admin. O admin salva dentro de uma transação: travar a área aqui, antes de
+    `Reserva.clean`, mantém o lock da checagem de conflito até o INSERT/UPDATE, como em
+    `servicos.reservar`.
+    """
+    class Meta:
+        model = Reserva
+        fields = '__all__'
+
+    def clean(self):
+        dados = super().clean()
+        if dados.get('area') is not None:
+            travar_area(dados['area'].pk)
+        return dados
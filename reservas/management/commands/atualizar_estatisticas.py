@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reservas import estatisticas
+
+
+class Command(BaseCommand):
+    help = 'Atualiza as estatísticas de uso das áreas (só as áreas com reservas alteradas, por padrão).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Recalcula todas as áreas.')
+
+    def handle(self, *args, **opts):
+        ids = estatisticas.atualizar(completo=opts['completo'])
+        self.stdout.write(self.style.SUCCESS(f"{len(ids)} área(s) recalculada(s)."))
@@ -0,0 +1,163 @@
+import random
+import statistics
+import time as relogio
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from condominios.models import Condominio
+from reservas.models import AreaReservavel, Reserva, intervalo_do_dia
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark das consultas quentes de reservas (EXPLAIN + tempos) antes e depois '
+        'dos índices compostos/parciais, num banco de teste descartável.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=1_000_000, help='Reservas sintéticas.')
+        parser.add_argument('--areas', type=int, default=50)
+        parser.add_argument('--moradores', type=int, default=500)
+        parser.add_argument('--repeticoes', type=int, default=20, help='Execuções por consulta.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        random.seed(opts['seed'])
+        nome_original = connection.settings_dict['NAME']
+        # banco de teste: nunca toca nos dados reais
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._popular(opts['linhas'], opts['areas'], opts['moradores'])
+
+            indices = Reserva._meta.indexes
+            with connection.schema_editor() as editor:
+                for idx in indices:
+                    editor.remove_index(Reserva, idx)
+            self._analisar()
+            antes = self._medir('ANTES (sem índices, filtros com __date)', self._consultas_antigas(), opts['repeticoes'])
+
+            with connection.schema_editor() as editor:
+                for idx in indices:
+                    editor.add_index(Reserva, idx)
+            self._analisar()
+            depois = self._medir('DEPOIS (índices + intervalos [início, fim))', self._consultas_novas(), opts['repeticoes'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\nResumo (mediana, ms)'))
+            for nome in antes:
+                a, d = antes[nome], depois[nome]
+                ganho = f"{a / d:.1f}x" if d else '—'
+                self.stdout.write(f"  {nome:<28} {a:>10.2f} → {d:>8.2f}  ({ganho})")
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+    # ---------------- dados sintéticos ----------------
+    def _popular(self, linhas, n_areas, n_moradores):
+        User = get_user_model()
+        cond = Condominio.objects.create(nome='Benchmark')
+        AreaReservavel.objects.bulk_create(
+            AreaReservavel(condominio=cond, nome=f'Área {i}') for i in range(n_areas)
+        )
+        User.objects.bulk_create(
+            User(username=f'bench{i}', password='!') for i in range(n_moradores)
+        )
+        self.area_ids = list(AreaReservavel.objects.values_list('id', flat=True))
+        self.morador_ids = list(User.objects.values_list('id', flat=True))
+
+        # ~5 anos de histórico em torno de hoje
+        tz = timezone.get_current_timezone()
+        base = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=4 * 365), time(0)), tz)
+        minutos = 5 * 365 * 24 * 60
+        status = [Reserva.Status.APROVADA] * 8 + [Reserva.Status.PENDENTE, Reserva.Status.CANCELADA]
+
+        # Horários sorteados por área, em ordem, para saber quem sobrepõe quem: no
+        # PostgreSQL a migração 0003 proíbe reservas exclusivas sobrepostas, então a
+        # que cairia sobre uma exclusiva anterior entra como compartilhada. Depois tudo
+        # é embaralhado, para a ordem física da tabela não seguir área/horário.
+        inicio_t = relogio.perf_counter()
+        geradas = []
+        por_area, sobra = divmod(linhas, len(self.area_ids))
+        for n, area_id in enumerate(self.area_ids):
+            fim_exclusiva = None
+            for minuto in sorted(random.randrange(0, minutos, 30) for _ in range(por_area + (n < sobra))):
+                ini = base + timedelta(minutes=minuto)
+                fim = ini + timedelta(minutes=random.choice((60, 120, 180)))
+                situacao = random.choice(status)
+                compartilhada = situacao != Reserva.Status.CANCELADA and fim_exclusiva is not None and ini < fim_exclusiva
+                if situacao != Reserva.Status.CANCELADA and not compartilhada:
+                    fim_exclusiva = fim
+                geradas.append((area_id, ini, fim, situacao, compartilhada))
+        random.shuffle(geradas)
+
+        for i in range(0, len(geradas), 10_000):
+            Reserva.objects.bulk_create(
+                Reserva(
+                    area_id=area_id, morador_id=random.choice(self.morador_ids), inicio=ini, fim=fim,
+                    status=situacao, permite_compartilhar=compartilhada,
+                )
+                for area_id, ini, fim, situacao, compartilhada in geradas[i:i + 10_000]
+            )
+        self.stdout.write(f"{linhas} reservas criadas em {relogio.perf_counter() - inicio_t:.1f}s")
+
+    def _analisar(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE' if connection.vendor == 'sqlite' else 'ANALYZE reservas_reserva')
+
+    # ---------------- consultas ----------------
+    def _parametros(self):
+        hoje = timezone.localdate()
+        agora = timezone.localtime()
+        area_id = self.area_ids[0]
+        morador_id = self.morador_ids[0]
+        dia_ini, dia_fim = intervalo_do_dia(hoje)
+        return hoje, agora, area_id, morador_id, dia_ini, dia_fim
+
+    def _consultas_antigas(self):
+        hoje, agora, area_id, morador_id, dia_ini, dia_fim = self._parametros()
+        cancelada = Reserva.Status.CANCELADA
+        return {
+            'slots do dia (área)': Reserva.objects.filter(
+                area_id=area_id, inicio__lt=dia_fim, fim__gt=dia_ini).exclude(status=cancelada),
+            'agenda de hoje': Reserva.objects.filter(inicio__date=hoje).exclude(status=cancelada),
+            'próximas reservas': Reserva.objects.filter(inicio__date__gte=hoje)
+                .exclude(status=cancelada).order_by('inicio')[:20],
+            'em uso agora': Reserva.objects.filter(inicio__lte=agora, fim__gt=agora).exclude(status=cancelada),
+            'histórico do morador': Reserva.objects.filter(
+                morador_id=morador_id, inicio__date__gte=hoje - timedelta(days=30), fim__date__lte=hoje,
+            ).order_by('-inicio')[:100],
+        }
+
+    def _consultas_novas(self):
+        hoje, agora, area_id, morador_id, dia_ini, dia_fim = self._parametros()
+        return {
+            'slots do dia (área)': Reserva.objects.filter(
+                area_id=area_id, inicio__lt=dia_fim, fim__gt=dia_ini).ativas(),
+            'agenda de hoje': Reserva.objects.do_dia(hoje).ativas(),
+            'próximas reservas': Reserva.objects.a_partir_de(hoje).ativas().order_by('inicio')[:20],
+            'em uso agora': Reserva.objects.em_uso(agora).ativas(),
+            'histórico do morador': Reserva.objects.filter(
+                morador_id=morador_id,
+                inicio__gte=intervalo_do_dia(hoje - timedelta(days=30))[0],
+                fim__lt=dia_fim,
+            ).order_by('-inicio')[:100],
+        }
+
+    def _medir(self, titulo, consultas, repeticoes):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {titulo} =='))
+        tempos = {}
+        for nome, qs in consultas.items():
+            self.stdout.write(self.style.SUCCESS(f'\n-- {nome}'))
+            # no PostgreSQL, o plano executado (tempos reais e buffers lidos)
+            opcoes = {'analyze': True, 'buffers': True} if connection.vendor == 'postgresql' else {}
+            self.stdout.write(qs.explain(**opcoes))
+            amostras = []
+            for _ in range(repeticoes):
+                t0 = relogio.perf_counter()
+                list(qs.all())  # .all() descarta o cache do queryset
+                amostras.append((relogio.perf_counter() - t0) * 1000)
+            tempos[nome] = statistics.median(amostras)
+            self.stdout.write(f'mediana: {tempos[nome]:.2f} ms')
+        return tempos
@@ -0,0 +1,70 @@
+# Exclusion constraint (somente PostgreSQL) contra sobreposição de reservas exclusivas.
+
+from django.db import migrations
+
+CONSTRAINT = 'reserva_sem_sobreposicao_exclusiva'
+
+
+SOBREPOSTAS = """
+    SELECT a.id, b.id, a.area_id, a.inicio, a.fim
+    FROM reservas_reserva a
+    JOIN reservas_reserva b
+      ON b.area_id = a.area_id AND b.id > a.id AND b.inicio < a.fim AND a.inicio < b.fim
+    WHERE a.status <> 'CANCELADA' AND NOT a.permite_compartilhar
+      AND b.status <> 'CANCELADA' AND NOT b.permite_compartilhar
+    ORDER BY a.area_id, a.inicio
+"""
+
+
+def verificar_sobrepostas(schema_editor):
+    """
+    A EXCLUDE não aceita NOT VALID: com reservas exclusivas já sobrepostas o ALTER
+    falharia com um erro genérico. Lista os pares para o gestor cancelar um de cada.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(SOBREPOSTAS)
+        pares = cursor.fetchall()
+    if pares:
+        linhas = "\n".join(
+            f"  área {area}: reservas {a} e {b} ({inicio:%d/%m/%Y %H:%M}–{fim:%H:%M})"
+            for a, b, area, inicio, fim in pares[:50]
+        )
+        raise RuntimeError(
+            f"Há {len(pares)} par(es) de reservas exclusivas sobrepostas. Cancele uma de cada "
+            f"par (status CANCELADA) e rode a migração de novo:\n{linhas}"
+        )
+
+
+def criar_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return  # SQLite: proteção fica a cargo do lock em reservas.servicos
+    verificar_sobrepostas(schema_editor)
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'''
+        ALTER TABLE reservas_reserva
+        ADD CONSTRAINT {CONSTRAINT}
+        EXCLUDE USING gist (
+            area_id WITH =,
+            tstzrange(inicio, fim, '[)') WITH &&
+        )
+        WHERE (status <> 'CANCELADA' AND NOT permite_compartilhar)
+        '''
+    )
+
+
+def remover_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'ALTER TABLE reservas_reserva DROP CONSTRAINT IF EXISTS {CONSTRAINT}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0002_reserva_permite_compartilhar'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_constraint, remover_constraint),
+    ]
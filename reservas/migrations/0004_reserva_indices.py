@@ -0,0 +1,27 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0003_reserva_sem_sobreposicao_exclusiva'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('status', 'CANCELADA'), _negated=True), fields=['area', 'inicio', 'fim'], name='reserva_area_periodo_ativa'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('status', 'CANCELADA'), _negated=True), fields=['inicio', 'fim'], name='reserva_periodo_ativa'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['morador', 'inicio'], name='reserva_morador_inicio'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0004_reserva_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField(help_text='Início da primeira ocorrência.')),
+                ('fim', models.DateTimeField(help_text='Fim da primeira ocorrência.')),
+                ('frequencia', models.CharField(choices=[('DIARIA', 'Diária'), ('SEMANAL', 'Semanal'), ('MENSAL', 'Mensal')], default='SEMANAL', max_length=10)),
+                ('intervalo', models.PositiveSmallIntegerField(default=1, help_text='Repetir a cada N dias/semanas/meses.')),
+                ('ate', models.DateField(blank=True, help_text='Última data (inclusive).', null=True)),
+                ('quantidade', models.PositiveSmallIntegerField(blank=True, help_text='Ou: número de ocorrências.', null=True)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('APROVADA', 'Aprovada'), ('CANCELADA', 'Cancelada')], default='APROVADA', max_length=20)),
+                ('permite_compartilhar', models.BooleanField(default=False)),
+                ('observacoes', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='reservas.areareservavel')),
+                ('morador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series_reserva', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Série de reservas',
+                'verbose_name_plural': 'Séries de reservas',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='serie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas', to='reservas.seriereserva'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0005_serie_reserva'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='areareservavel',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
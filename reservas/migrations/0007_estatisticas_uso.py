@@ -0,0 +1,64 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0006_areareservavel_atualizado_em'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacaoHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('minutos', models.PositiveBigIntegerField(default=0)),
+                ('reservas', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumoArea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('canceladas', models.PositiveIntegerField(default=0)),
+                ('minutos_reservados', models.PositiveBigIntegerField(default=0)),
+                ('top_moradores', models.JSONField(blank=True, default=list)),
+                ('atualizado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Uso da área',
+                'verbose_name_plural': 'Uso das áreas',
+            },
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['area', 'atualizado_em'], name='reserva_area_atualizado'),
+        ),
+        migrations.AddField(
+            model_name='ocupacaohora',
+            name='area',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacao', to='reservas.areareservavel'),
+        ),
+        migrations.AddField(
+            model_name='resumoarea',
+            name='area',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumo', to='reservas.areareservavel'),
+        ),
+        migrations.AddConstraint(
+            model_name='ocupacaohora',
+            constraint=models.UniqueConstraint(fields=('area', 'dia_semana', 'hora'), name='ocupacao_area_dia_hora'),
+        ),
+    ]
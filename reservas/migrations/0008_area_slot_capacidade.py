@@ -0,0 +1,24 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:27
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0007_estatisticas_uso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='areareservavel',
+            name='capacidade',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Máximo de reservas compartilhadas simultâneas. Vazio = sem limite.', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='areareservavel',
+            name='slot_minutos',
+            field=models.PositiveSmallIntegerField(default=60, help_text='Duração de cada horário oferecido, em minutos.', validators=[django.core.validators.MinValueValidator(5)]),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.8 on 2026-10-18 15:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0008_area_slot_capacidade'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListaEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+                ('fim', models.DateTimeField()),
+                ('permite_compartilhar', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('AGUARDANDO', 'Aguardando'), ('ATENDIDA', 'Atendida'), ('DESISTIU', 'Desistiu')], default='AGUARDANDO', max_length=12)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atendido_em', models.DateTimeField(blank=True, null=True)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to='reservas.areareservavel')),
+                ('morador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to=settings.AUTH_USER_MODEL)),
+                ('reserva', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pedido_espera', to='reservas.reserva')),
+            ],
+            options={
+                'verbose_name': 'Pedido na lista de espera',
+                'verbose_name_plural': 'Lista de espera',
+                'ordering': ['criado_em'],
+                'indexes': [models.Index(condition=models.Q(('status', 'AGUARDANDO')), fields=['area', 'inicio', 'fim'], name='espera_area_periodo_aguardando')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='listaespera',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'AGUARDANDO')), fields=('area', 'morador', 'inicio', 'fim'), name='espera_pedido_unico'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.8 on 2026-10-18 16:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def invalidar_resumos(apps, schema_editor):
+    # os resumos atuais não têm ReservaContabilizada: o próximo cálculo é completo
+    apps.get_model('reservas', 'ResumoArea').objects.update(atualizado_em=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0009_lista_espera'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaContabilizada',
+            fields=[
+                ('reserva', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='reservas.reserva')),
+                ('inicio', models.DateTimeField()),
+                ('fim', models.DateTimeField()),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('APROVADA', 'Aprovada'), ('CANCELADA', 'Cancelada')], max_length=20)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reservas.areareservavel')),
+                ('morador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UsoMorador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minutos', models.PositiveBigIntegerField(default=0)),
+                ('reservas', models.PositiveIntegerField(default=0)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uso_moradores', to='reservas.areareservavel')),
+                ('morador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['area', '-minutos'], name='uso_morador_ranking')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='usomorador',
+            constraint=models.UniqueConstraint(fields=('area', 'morador'), name='uso_morador_area_morador'),
+        ),
+        migrations.RunPython(invalidar_resumos, migrations.RunPython.noop),
+    ]
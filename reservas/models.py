@@ -1,10 +1,22 @@
+from datetime import datetime, time, timedelta
+
 from django.db import models
+from django.db.models import Q
 from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.utils import timezone
 from condominios.models import Condominio
+from .regras import data_bloqueada, dia_da_semana, regras_da_area
 from django.conf import settings
 
 
+class AreaReservavelQuerySet(models.QuerySet):
+    def update(self, **campos):
+        # `atualizado_em` é a versão das regras compiladas (reservas.regras)
+        campos.setdefault('atualizado_em', timezone.now())
+        return super().update(**campos)
+
+
 class AreaReservavel(models.Model):
     condominio = models.ForeignKey(Condominio, on_delete=models.CASCADE, related_name='areas')
     nome = models.CharField(max_length=120)
@@ -15,11 +27,64 @@ class AreaReservavel(models.Model):
     hora_fim = models.TimeField(null=True, blank=True)
     # ['2025-12-25']
     datas_bloqueadas = models.JSONField(default=list, blank=True)
+    slot_minutos = models.PositiveSmallIntegerField(
+        default=60, validators=[MinValueValidator(5)], help_text="Duração de cada horário oferecido, em minutos."
+    )
+    capacidade = models.PositiveSmallIntegerField(
+        null=True, blank=True, validators=[MinValueValidator(1)],
+        help_text="Máximo de reservas compartilhadas simultâneas. Vazio = sem limite.",
+    )
+    # versão das regras: invalida as regras compiladas (reservas.regras)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    objects = AreaReservavelQuerySet.as_manager()
+
+    def clean(self):
+        erros = {}
+        if not isinstance(self.dias_permitidos, list) or any(dia_da_semana(d) is None for d in self.dias_permitidos):
+            erros['dias_permitidos'] = 'Informe uma lista de dias da semana de 0 (Seg) a 6 (Dom), ex.: [0, 1, 2].'
+        if not isinstance(self.datas_bloqueadas, list) or any(data_bloqueada(d) is None for d in self.datas_bloqueadas):
+            erros['datas_bloqueadas'] = 'Informe uma lista de datas AAAA-MM-DD, ex.: ["2025-12-25"].'
+        if erros:
+            raise ValidationError(erros)
+
+    @property
+    def regras(self):
+        return regras_da_area(self)
 
     def __str__(self):
         return f"{self.condominio} - {self.nome}"
 
 
+def intervalo_do_dia(dia):
+    """
+    [inicio, fim) timezone-aware do dia local `dia`.
+    Use no lugar de `campo__date=dia`, que envolve a coluna numa função e impede o
+    uso de índice.
+    """
+    tz = timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(dia, time.min), tz)
+    fim = timezone.make_aware(datetime.combine(dia + timedelta(days=1), time.min), tz)
+    return inicio, fim
+
+
+class ReservaQuerySet(models.QuerySet):
+    def ativas(self):
+        return self.exclude(status=Reserva.Status.CANCELADA)
+
+    def do_dia(self, dia):
+        """Reservas que COMEÇAM no dia local `dia` (equivale a inicio__date=dia)."""
+        inicio, fim = intervalo_do_dia(dia)
+        return self.filter(inicio__gte=inicio, inicio__lt=fim)
+
+    def a_partir_de(self, dia):
+        """Reservas que começam no dia local `dia` ou depois (equivale a inicio__date__gte=dia)."""
+        return self.filter(inicio__gte=intervalo_do_dia(dia)[0])
+
+    def em_uso(self, agora):
+        return self.filter(inicio__lte=agora, fim__gt=agora)
+
+
 class Reserva(models.Model):
     class Status(models.TextChoices):
         PENDENTE = 'PENDENTE', 'Pendente'
@@ -33,45 +98,301 @@ class Reserva(models.Model):
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
     observacoes = models.TextField(blank=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    # marca d'água para a atualização incremental das estatísticas (reservas.estatisticas)
+    atualizado_em = models.DateTimeField(auto_now=True)
 
     # NOVO: se True, esta reserva permite compartilhamento do espaço com outros moradores
     permite_compartilhar = models.BooleanField(default=False)
 
+    # ocorrência de uma série recorrente (opcional)
+    serie = models.ForeignKey(
+        'SerieReserva', on_delete=models.SET_NULL, null=True, blank=True, related_name='reservas'
+    )
+
+    objects = ReservaQuerySet.as_manager()
+
     class Meta:
         ordering = ['inicio']
+        indexes = [
+            # slots do dia / conflitos: area + sobreposição de período, só reservas ativas
+            models.Index(
+                fields=['area', 'inicio', 'fim'],
+                condition=~Q(status='CANCELADA'),
+                name='reserva_area_periodo_ativa',
+            ),
+            # agenda de hoje / em uso agora (todas as áreas)
+            models.Index(
+                fields=['inicio', 'fim'],
+                condition=~Q(status='CANCELADA'),
+                name='reserva_periodo_ativa',
+            ),
+            # "minhas reservas" e histórico do morador
+            models.Index(fields=['morador', 'inicio'], name='reserva_morador_inicio'),
+            # áreas com reservas alteradas desde a última atualização das estatísticas
+            models.Index(fields=['area', 'atualizado_em'], name='reserva_area_atualizado'),
+        ]
 
     def clean(self):
+        if self.area_id is None or self.inicio is None or self.fim is None:
+            return  # o form já acusa o campo obrigatório vazio
+        self.validar_regras()
+
+        # conflitos com outras reservas (ignorando canceladas e a própria).
+        # Só é permitido sobrepor se TODAS as conflitantes permitirem compartilhar
+        # e, havendo capacidade definida, se ainda couber mais uma no pico de ocupação.
+        from .disponibilidade import pico_simultaneo
+
+        sobrepostas = list(
+            Reserva.objects.filter(area=self.area, inicio__lt=self.fim, fim__gt=self.inicio)
+            .exclude(pk=self.pk)
+            .ativas()
+            .values_list('inicio', 'fim', 'permite_compartilhar')
+        )
+        if any(not compartilhavel for _, _, compartilhavel in sobrepostas):
+            raise ValidationError('Já existe reserva que conflita com este período.')
+
+        capacidade = self.area.capacidade
+        if capacidade is not None and pico_simultaneo(sobrepostas) + 1 > capacidade:
+            raise ValidationError('A área já atingiu a capacidade máxima neste período.')
+
+    def validar_regras(self):
+        """Regras que não dependem de outras reservas (nenhuma query)."""
         # início/fim válidos
         if self.inicio >= self.fim:
             raise ValidationError('Período inválido: início deve ser antes do fim.')
 
         # regras da área (dia permitido, janela de horário, datas bloqueadas)
+        regras = self.area.regras
         local_date = timezone.localtime(self.inicio).date()
-        weekday = local_date.weekday()  # 0=Seg ... 6=Dom
 
-        if self.area.dias_permitidos and weekday not in self.area.dias_permitidos:
+        if not regras.dia_da_semana_permitido(local_date):
             raise ValidationError('Dia da semana não permitido para esta área.')
 
-        if self.area.hora_inicio and self.inicio.time() < self.area.hora_inicio:
+        if regras.hora_inicio and timezone.localtime(self.inicio).time() < regras.hora_inicio:
             raise ValidationError('Horário de início antes do permitido.')
-        if self.area.hora_fim and self.fim.time() > self.area.hora_fim:
+        if regras.hora_fim and timezone.localtime(self.fim).time() > regras.hora_fim:
             raise ValidationError('Horário de fim após o permitido.')
 
-        if local_date.isoformat() in (self.area.datas_bloqueadas or []):
+        if regras.data_bloqueada(local_date):
             raise ValidationError('Esta data está bloqueada para reservas nesta área.')
 
-        # conflitos com outras reservas (ignorando canceladas e a própria)
-        qs = Reserva.objects.filter(area=self.area).exclude(pk=self.pk)
-        qs = qs.exclude(status=Reserva.Status.CANCELADA)
-        conflitos = list(qs.filter(inicio__lt=self.fim, fim__gt=self.inicio))
+    def __str__(self):
+        return f"{self.area.nome} ({self.inicio:%d/%m %H:%M}-{self.fim:%H:%M}) - {self.morador}"
+
+
+class SerieReserva(models.Model):
+    """
+    Reserva recorrente (ex.: aula semanal na academia). A primeira ocorrência é
+    [inicio, fim); as demais repetem o mesmo horário a cada `intervalo` dias/semanas/meses
+    até `ate` ou até completar `quantidade` ocorrências.
+    """
+    MAX_OCORRENCIAS = 366
+
+    class Frequencia(models.TextChoices):
+        DIARIA = 'DIARIA', 'Diária'
+        SEMANAL = 'SEMANAL', 'Semanal'
+        MENSAL = 'MENSAL', 'Mensal'
+
+    area = models.ForeignKey(AreaReservavel, on_delete=models.CASCADE, related_name='series')
+    morador = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='series_reserva')
+    inicio = models.DateTimeField(help_text="Início da primeira ocorrência.")
+    fim = models.DateTimeField(help_text="Fim da primeira ocorrência.")
+    frequencia = models.CharField(max_length=10, choices=Frequencia.choices, default=Frequencia.SEMANAL)
+    intervalo = models.PositiveSmallIntegerField(default=1, help_text="Repetir a cada N dias/semanas/meses.")
+    ate = models.DateField(null=True, blank=True, help_text="Última data (inclusive).")
+    quantidade = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Ou: número de ocorrências.")
+    status = models.CharField(max_length=20, choices=Reserva.Status.choices, default=Reserva.Status.APROVADA)
+    permite_compartilhar = models.BooleanField(default=False)
+    observacoes = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-criado_em']
+        verbose_name = 'Série de reservas'
+        verbose_name_plural = 'Séries de reservas'
+
+    def clean(self):
+        if not self.ate and not self.quantidade:
+            raise ValidationError('Informe a data final ou a quantidade de ocorrências.')
+        if not self.intervalo:
+            raise ValidationError('O intervalo deve ser de pelo menos 1.')
+        if self.inicio and self.fim:
+            if self.inicio >= self.fim:
+                raise ValidationError('Período inválido: início deve ser antes do fim.')
+            if self.frequencia == self.Frequencia.DIARIA and self.fim - self.inicio > timedelta(days=self.intervalo):
+                raise ValidationError('A duração não pode ser maior que o intervalo entre ocorrências.')
 
-        if conflitos:
-            # Se QUALQUER reserva conflitante NÃO permite compartilhar -> bloqueia
-            # Só é permitido se TODAS as conflitantes tiverem permite_compartilhar=True
-            if not all(r.permite_compartilhar for r in conflitos):
-                raise ValidationError('Já existe reserva que conflita com este período.')
+    def ocorrencias(self):
+        """
+        Lista [(inicio, fim)] (aware, horário local preservado) de todas as ocorrências,
+        limitada a MAX_OCORRENCIAS.
+        """
+        tz = timezone.get_current_timezone()
+        local_ini = timezone.localtime(self.inicio)
+        duracao = self.fim - self.inicio
+        limite = min(self.quantidade or self.MAX_OCORRENCIAS, self.MAX_OCORRENCIAS)
 
-        # caso contrário, permitido (compartilhamento)
+        resultado = []
+        n = 0
+        while len(resultado) < limite:
+            dia = self._data_da_ocorrencia(local_ini.date(), n)
+            n += 1
+            if dia is None:
+                continue  # ex.: dia 31 num mês de 30 dias
+            if self.ate and dia > self.ate:
+                break
+            ini = timezone.make_aware(datetime.combine(dia, local_ini.time()), tz)
+            resultado.append((ini, ini + duracao))
+        return resultado
+
+    def _data_da_ocorrencia(self, primeira, n):
+        passo = n * self.intervalo
+        if self.frequencia == self.Frequencia.DIARIA:
+            return primeira + timedelta(days=passo)
+        if self.frequencia == self.Frequencia.SEMANAL:
+            return primeira + timedelta(weeks=passo)
+        ano, mes = divmod(primeira.month - 1 + passo, 12)
+        try:
+            return primeira.replace(year=primeira.year + ano, month=mes + 1)
+        except ValueError:
+            return None
 
     def __str__(self):
-        return f"{self.area.nome} ({self.inicio:%d/%m %H:%M}-{self.fim:%H:%M}) - {self.morador}"
\ No newline at end of file
+        return f"{self.area.nome} • {self.get_frequencia_display()} desde {timezone.localtime(self.inicio):%d/%m/%Y %H:%M}"
+
+
+
+# ---------------- Lista de espera ----------------
+class ListaEsperaQuerySet(models.QuerySet):
+    def aguardando(self):
+        return self.filter(status=ListaEspera.Status.AGUARDANDO)
+
+
+class ListaEspera(models.Model):
+    """
+    Pedido de um morador por [inicio, fim) numa área lotada. Quando uma reserva que
+    ocupava o período é cancelada/removida, os pedidos são atendidos em ordem de
+    chegada (ver `reservas.espera`).
+    """
+    class Status(models.TextChoices):
+        AGUARDANDO = 'AGUARDANDO', 'Aguardando'
+        ATENDIDA = 'ATENDIDA', 'Atendida'
+        DESISTIU = 'DESISTIU', 'Desistiu'
+
+    area = models.ForeignKey(AreaReservavel, on_delete=models.CASCADE, related_name='lista_espera')
+    morador = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='lista_espera')
+    inicio = models.DateTimeField()
+    fim = models.DateTimeField()
+    permite_compartilhar = models.BooleanField(default=False)
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.AGUARDANDO)
+    reserva = models.OneToOneField(Reserva, on_delete=models.SET_NULL, null=True, blank=True, related_name='pedido_espera')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atendido_em = models.DateTimeField(null=True, blank=True)
+
+    objects = ListaEsperaQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['criado_em']
+        verbose_name = 'Pedido na lista de espera'
+        verbose_name_plural = 'Lista de espera'
+        indexes = [
+            # pedidos que se sobrepõem ao período liberado, só os que aguardam
+            models.Index(
+                fields=['area', 'inicio', 'fim'],
+                condition=Q(status='AGUARDANDO'),
+                name='espera_area_periodo_aguardando',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['area', 'morador', 'inicio', 'fim'],
+                condition=Q(status='AGUARDANDO'),
+                name='espera_pedido_unico',
+            ),
+        ]
+
+    def clean(self):
+        if self.area_id is None or self.inicio is None or self.fim is None:
+            return  # o form já acusa o campo obrigatório vazio
+        # as mesmas regras de uma reserva: o pedido vira uma quando o horário vagar
+        Reserva(area=self.area, inicio=self.inicio, fim=self.fim).validar_regras()
+
+        # e só horários da grade oferecida na área (slots de `slot_minutos` a partir da abertura)
+        passo = timedelta(minutes=self.area.slot_minutos)
+        abertura, _ = self.area.regras.janela(timezone.localtime(self.inicio).date())
+        if (self.inicio - abertura) % passo or (self.fim - self.inicio) % passo:
+            raise ValidationError(
+                f'Escolha um horário da grade da área (blocos de {self.area.slot_minutos} minutos).'
+            )
+
+    def __str__(self):
+        return f"{self.area.nome} ({timezone.localtime(self.inicio):%d/%m %H:%M}) - {self.morador} [{self.get_status_display()}]"
+
+
+# ---------------- Estatísticas de uso (tabelas-resumo) ----------------
+class ResumoArea(models.Model):
+    """
+    Totais de uso por área, recalculados por `reservas.estatisticas` apenas para as
+    áreas com reservas alteradas desde `atualizado_em` (vazio = precisa recalcular).
+    """
+    area = models.OneToOneField(AreaReservavel, on_delete=models.CASCADE, related_name='resumo')
+    total = models.PositiveIntegerField(default=0)
+    canceladas = models.PositiveIntegerField(default=0)
+    minutos_reservados = models.PositiveBigIntegerField(default=0)
+    # [{"morador_id", "nome", "reservas", "minutos"}, ...] (top 10 por tempo reservado)
+    top_moradores = models.JSONField(default=list, blank=True)
+    atualizado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Uso da área'
+        verbose_name_plural = 'Uso das áreas'
+
+    @property
+    def taxa_cancelamento(self):
+        return (self.canceladas / self.total) if self.total else 0
+
+    def __str__(self):
+        return f"Uso • {self.area}"
+
+
+class OcupacaoHora(models.Model):
+    """Minutos reservados (reservas ativas) por área, dia da semana local e hora local."""
+    area = models.ForeignKey(AreaReservavel, on_delete=models.CASCADE, related_name='ocupacao')
+    dia_semana = models.PositiveSmallIntegerField()  # 0=Seg ... 6=Dom
+    hora = models.PositiveSmallIntegerField()        # 0..23
+    minutos = models.PositiveBigIntegerField(default=0)
+    reservas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['area', 'dia_semana', 'hora'], name='ocupacao_area_dia_hora'),
+        ]
+
+
+class UsoMorador(models.Model):
+    """Reservas ativas e minutos reservados por área e morador (base do ranking)."""
+    area = models.ForeignKey(AreaReservavel, on_delete=models.CASCADE, related_name='uso_moradores')
+    morador = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    minutos = models.PositiveBigIntegerField(default=0)
+    reservas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['area', 'morador'], name='uso_morador_area_morador'),
+        ]
+        indexes = [
+            models.Index(fields=['area', '-minutos'], name='uso_morador_ranking'),
+        ]
+
+
+class ReservaContabilizada(models.Model):
+    """
+    Como cada reserva estava quando entrou nos resumos. A atualização incremental
+    subtrai esta linha e soma a reserva atual, sem reler o histórico da área.
+    """
+    reserva = models.OneToOneField(Reserva, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    area = models.ForeignKey(AreaReservavel, on_delete=models.CASCADE, related_name='+')
+    morador = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    inicio = models.DateTimeField()
+    fim = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Reserva.Status.choices)
@@ -0,0 +1,144 @@
+# reservas/regras.py
+"""
+Regras de uma AreaReservavel "compiladas" para consulta rápida.
+
+`dias_permitidos` e `datas_bloqueadas` são listas JSON; testar `x in lista` e
+reconverter datas ISO a cada checagem cresce com o histórico de feriados. Aqui as
+regras viram uma máscara de bits de dias da semana, um frozenset de `date` e a janela
+de horário — montadas uma vez por versão da área e compartilhadas por validação,
+geração de slots e admin.
+
+A versão é `atualizado_em` (o save e o `update()` do queryset da área o avançam). Cada
+instância guarda ainda as regras que usou junto com uma marca O(1) dos seus campos
+(as próprias listas, por identidade, e os tamanhos): uma área editada em memória
+(form/clean, ainda não salva) deixa de bater com o que veio do banco e é compilada só
+para si, sem tocar no cache do processo.
+"""
+from datetime import date, datetime, time
+
+from django.utils import timezone
+
+TODOS_OS_DIAS = 0b1111111  # 0=Seg ... 6=Dom
+HORA_INICIO_PADRAO = time(0, 0)
+HORA_FIM_PADRAO = time(23, 59)
+
+MAX_COMPILADAS = 1000  # áreas no cache do processo; cheio, recomeça do zero
+
+_compiladas = {}  # area.pk -> (atualizado_em, RegrasArea)
+
+
+def dia_da_semana(valor):
+    """Entrada de `dias_permitidos` como 0..6 (0=Seg), ou None se for inválida."""
+    if isinstance(valor, bool):
+        return None
+    try:
+        dia = int(valor)
+    except (TypeError, ValueError):
+        return None
+    return dia if 0 <= dia <= 6 and str(dia) == str(valor).strip() else None
+
+
+def data_bloqueada(valor):
+    """Entrada de `datas_bloqueadas` como `date`, ou None se for inválida."""
+    try:
+        return date.fromisoformat(str(valor))
+    except ValueError:
+        return None
+
+
+class RegrasArea:
+    __slots__ = ('mascara_dias', 'datas_bloqueadas', 'hora_inicio', 'hora_fim', 'restringe_dias')
+
+    def __init__(self, area):
+        mascara = 0
+        for valor in area.dias_permitidos or []:
+            dia = dia_da_semana(valor)
+            if dia is not None:  # entrada malformada no JSON não libera nem restringe nada
+                mascara |= 1 << dia
+        self.restringe_dias = bool(mascara)
+        self.mascara_dias = mascara or TODOS_OS_DIAS
+
+        bloqueadas = set()
+        for valor in area.datas_bloqueadas or []:
+            dia = data_bloqueada(valor)
+            if dia is not None:  # entrada malformada no JSON não bloqueia nada
+                bloqueadas.add(dia)
+        self.datas_bloqueadas = frozenset(bloqueadas)
+
+        self.hora_inicio = area.hora_inicio
+        self.hora_fim = area.hora_fim
+
+    # ---- dia ----
+    def dia_da_semana_permitido(self, dia):
+        return bool(self.mascara_dias >> dia.weekday() & 1)
+
+    def data_bloqueada(self, dia):
+        return dia in self.datas_bloqueadas
+
+    def permite_dia(self, dia):
+        return self.dia_da_semana_permitido(dia) and not self.data_bloqueada(dia)
+
+    # ---- horário ----
+    def janela(self, dia):
+        """(inicio, fim) timezone-aware da janela de funcionamento em `dia`."""
+        tz = timezone.get_current_timezone()
+        return (
+            timezone.make_aware(datetime.combine(dia, self.hora_inicio or HORA_INICIO_PADRAO), tz),
+            timezone.make_aware(datetime.combine(dia, self.hora_fim or HORA_FIM_PADRAO), tz),
+        )
+
+    # ---- rótulos (admin/templates) ----
+    @property
+    def dias(self):
+        return [d for d in range(7) if self.mascara_dias >> d & 1]
+
+    def rotulo_janela(self):
+        h1 = (self.hora_inicio or HORA_INICIO_PADRAO).strftime("%H:%M")
+        h2 = (self.hora_fim or HORA_FIM_PADRAO).strftime("%H:%M")
+        return f"{h1}–{h2}"
+
+    def rotulo_dias(self):
+        if self.restringe_dias:
+            return ", ".join(str(d) for d in self.dias) + " (0=Seg..6=Dom)"
+        return "Todos"
+
+
+def _marca(campos):
+    dias, datas = campos.get('dias_permitidos'), campos.get('datas_bloqueadas')
+    return (
+        dias, datas, len(dias or ()), len(datas or ()),
+        campos.get('hora_inicio'), campos.get('hora_fim'), campos.get('atualizado_em'),
+    )
+
+
+def _mesma_marca(a, b):
+    # listas por identidade (a marca as mantém vivas, então o id não é reaproveitado)
+    return a is not None and b is not None and a[0] is b[0] and a[1] is b[1] and a[2:] == b[2:]
+
+
+def marcar_como_do_banco(area):
+    """Registra os campos atuais de `area` como iguais aos do banco (post_init/post_save)."""
+    area._regras_do_banco = _marca(area.__dict__)
+
+
+def regras_da_area(area):
+    """
+    Regras compiladas de `area`: O(1) enquanto a instância não mudar; entre instâncias,
+    compartilhadas por versão (`atualizado_em`) se a instância está como veio do banco.
+    """
+    marca = _marca(area.__dict__)
+    guardado = getattr(area, '_regras', None)
+    if guardado is not None and _mesma_marca(guardado[0], marca):
+        return guardado[1]
+
+    if area.pk is not None and area.atualizado_em is not None and _mesma_marca(getattr(area, '_regras_do_banco', None), marca):
+        versao, regras = _compiladas.get(area.pk, (None, None))
+        if regras is None or versao != area.atualizado_em:
+            if len(_compiladas) >= MAX_COMPILADAS:
+                _compiladas.clear()
+            regras = RegrasArea(area)
+            _compiladas[area.pk] = (area.atualizado_em, regras)
+    else:
+        regras = RegrasArea(area)  # nova ou editada em memória
+    area._regras = (marca, regras)
+    return regras
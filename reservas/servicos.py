@@ -0,0 +1,123 @@
+# reservas/servicos.py
+"""
+Criação de reservas segura contra concorrência.
+
+A checagem de conflito (`Reserva.clean`) e o INSERT acontecem na mesma transação,
+com a linha da `AreaReservavel` travada: duas reservas simultâneas para a MESMA área
+passam em fila, enquanto áreas diferentes seguem em paralelo. No PostgreSQL uma
+exclusion constraint (migração 0003) garante ainda, no próprio banco, que reservas
+exclusivas não se sobrepõem.
+"""
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+
+from .cache import invalidar_intervalos
+from .disponibilidade import intervalos_ocupados, mesclar_bloqueios
+from .models import AreaReservavel, Reserva
+
+TENTATIVAS = 3          # tentativas em caso de lock/deadlock/serialização
+ESPERA_BASE = 0.05      # segundos; cresce linearmente a cada tentativa
+
+MSG_CONFLITO = 'Já existe reserva que conflita com este período.'
+MSG_SOBREPOE_SERIE = 'Sobrepõe a ocorrência anterior da própria série.'
+# validados por query no clean_fields; a série já garante que existem
+_CAMPOS_RELACIONADOS = ['area', 'morador', 'serie']
+
+
+def travar_area(area_id):
+    """
+    Trava a área até o fim da transação corrente.
+
+    PostgreSQL: SELECT ... FOR UPDATE na linha da área.
+    SQLite (sem FOR UPDATE): um UPDATE neutro na mesma linha já obtém o lock de
+    escrita do banco logo no início da transação, antes da leitura dos conflitos.
+    """
+    if connection.features.has_select_for_update:
+        list(AreaReservavel.objects.select_for_update().filter(pk=area_id).values_list('pk'))
+    else:
+        AreaReservavel.objects.filter(pk=area_id).update(nome=F('nome'))
+
+
+def reservar(reserva, tentativas=TENTATIVAS):
+    """
+    Valida e grava `reserva` atomicamente. Levanta ValidationError em conflito/regra.
+    """
+    for tentativa in range(1, tentativas + 1):
+        try:
+            with transaction.atomic():
+                travar_area(reserva.area_id)
+                reserva.clean()
+                reserva.save()
+            return reserva
+        except IntegrityError:
+            # exclusion constraint do PostgreSQL: outra reserva venceu a corrida
+            raise ValidationError(MSG_CONFLITO)
+        except OperationalError:
+            # lock ocupado / deadlock / falha de serialização → tenta de novo
+            if tentativa == tentativas:
+                raise
+            time.sleep(ESPERA_BASE * tentativa)
+
+
+def criar_serie(serie):
+    """
+    Gera e grava as ocorrências de uma `SerieReserva` (já salva).
+
+    `bulk_create` não chama `Reserva.clean`, então cada ocorrência passa aqui pelas
+    mesmas checagens: campos, duração e regras da área (`validar_regras`), sem
+    sobrepor a ocorrência anterior da série, e contra as reservas existentes com UMA
+    query de intervalo e uma varredura. As válidas entram com `bulk_create`. Retorna
+    (criadas, conflitos), onde conflitos é uma lista de (inicio, fim, motivo).
+    """
+    serie.clean()
+    candidatas = []
+    conflitos = []
+    for ini, fim in serie.ocorrencias():
+        r = Reserva(
+            area=serie.area, morador=serie.morador, serie=serie,
+            inicio=ini, fim=fim, status=serie.status,
+            permite_compartilhar=serie.permite_compartilhar, observacoes=serie.observacoes,
+        )
+        try:
+            r.clean_fields(exclude=_CAMPOS_RELACIONADOS)
+            r.validar_regras()
+            if candidatas and r.inicio < candidatas[-1].fim:
+                raise ValidationError(MSG_SOBREPOE_SERIE)
+        except ValidationError as e:
+            conflitos.append((ini, fim, ' '.join(e.messages)))
+            continue
+        candidatas.append(r)
+
+    if not candidatas:
+        return [], conflitos
+
+    try:
+        with transaction.atomic():
+            travar_area(serie.area_id)
+            bloqueios = mesclar_bloqueios(
+                intervalos_ocupados(serie.area, candidatas[0].inicio, candidatas[-1].fim),
+                serie.area.capacidade,
+            )
+
+            # ocorrências e bloqueios estão ordenados: um ponteiro só avança
+            validas = []
+            j = 0
+            for r in candidatas:
+                while j < len(bloqueios) and bloqueios[j][1] <= r.inicio:
+                    j += 1
+                if j < len(bloqueios) and bloqueios[j][0] < r.fim:
+                    conflitos.append((r.inicio, r.fim, MSG_CONFLITO))
+                else:
+                    validas.append(r)
+
+            criadas = Reserva.objects.bulk_create(validas, batch_size=500)
+            # bulk_create não dispara post_save
+            invalidar_intervalos((r.area_id, r.inicio, r.fim) for r in criadas)
+    except IntegrityError:
+        raise ValidationError(MSG_CONFLITO)
+
+    conflitos.sort()
+    return criadas, conflitos
@@ -0,0 +1,64 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import invalidar_area, invalidar_intervalos
+from .espera import liberar_horarios
+from .models import AreaReservavel, Reserva, ResumoArea
+from .regras import marcar_como_do_banco
+
+
+@receiver(post_init, sender=Reserva)
+def guardar_intervalo_original(sender, instance: Reserva, **kwargs):
+    # permite invalidar também o dia ANTIGO quando a reserva é remarcada.
+    # Lê do __dict__ para não disparar carga de campos adiados (.only/.defer).
+    campos = instance.__dict__
+    instance._intervalo_original = (campos.get('area_id'), campos.get('inicio'), campos.get('fim'))
+    instance._status_original = campos.get('status')
+
+
+@receiver(post_save, sender=Reserva)
+def invalidar_cache_reserva(sender, instance: Reserva, **kwargs):
+    intervalos = [(instance.area_id, instance.inicio, instance.fim)]
+    original = getattr(instance, '_intervalo_original', None)
+    if original and None not in original and original != intervalos[0]:
+        intervalos.append(original)
+    invalidar_intervalos(intervalos)
+
+    # período liberado (cancelamento ou remarcação): chama a lista de espera
+    cancelada = Reserva.Status.CANCELADA
+    if not kwargs.get('created') and getattr(instance, '_status_original', cancelada) != cancelada:
+        if instance.status == cancelada:
+            liberar_horarios(intervalos[-1:])
+        elif len(intervalos) > 1:
+            liberar_horarios(intervalos[1:])
+
+    # save(update_fields=...) sem atualizado_em não deixa marca para as estatísticas
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'atualizado_em' not in update_fields:
+        ResumoArea.objects.filter(area_id=instance.area_id).update(atualizado_em=None)
+    # a área antiga não vê a reserva alterada: recalcula do zero
+    if len(intervalos) > 1 and intervalos[1][0] != instance.area_id:
+        ResumoArea.objects.filter(area_id=intervalos[1][0]).update(atualizado_em=None)
+
+    instance._intervalo_original = intervalos[0]
+    instance._status_original = instance.status
+
+
+@receiver(post_delete, sender=Reserva)
+def invalidar_cache_reserva_removida(sender, instance: Reserva, **kwargs):
+    invalidar_intervalos([(instance.area_id, instance.inicio, instance.fim)])
+    if instance.status != Reserva.Status.CANCELADA:
+        liberar_horarios([(instance.area_id, instance.inicio, instance.fim)])
+    # remoção não deixa marca em Reserva.atualizado_em: força o recálculo das estatísticas
+    ResumoArea.objects.filter(area_id=instance.area_id).update(atualizado_em=None)
+
+
+@receiver(post_init, sender=AreaReservavel)
+def guardar_regras_carregadas(sender, instance: AreaReservavel, **kwargs):
+    marcar_como_do_banco(instance)
+
+
+@receiver([post_save, post_delete], sender=AreaReservavel)
+def invalidar_cache_area(sender, instance: AreaReservavel, **kwargs):
+    marcar_como_do_banco(instance)
+    invalidar_area(instance.pk)
@@ -1,3 +1,280 @@
-from django.test import TestCase
+import random
+from datetime import datetime, time, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from condominios.models import Condominio
+
+from .cache import _chave_dia, atualizar_e_invalidar
+from .disponibilidade import mesclar_bloqueios, pico_simultaneo, slots_disponiveis, slots_do_dia, varrer_slots
+from .models import AreaReservavel, Reserva
+from .servicos import reservar
+
+
+def _horario(dia, hora, horas=1):
+    inicio = timezone.make_aware(datetime.combine(dia, time(hora)), timezone.get_current_timezone())
+    return inicio, inicio + timedelta(hours=horas)
+
+
+class ReservaTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.condominio = Condominio.objects.create(nome='Condomínio Teste')
+        cls.area = AreaReservavel.objects.create(condominio=cls.condominio, nome='Salão')
+        cls.morador = User.objects.create_user('morador', first_name='Morador')
+        cls.dia = timezone.localdate() + timedelta(days=7)
+
+    def _reserva(self, hora, horas=1, **campos):
+        inicio, fim = _horario(self.dia, hora, horas)
+        campos.setdefault('status', Reserva.Status.APROVADA)
+        return Reserva(area=self.area, morador=self.morador, inicio=inicio, fim=fim, **campos)
+
+
+# o manifest do whitenoise só existe depois do collectstatic
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ConflitoDeReservaTests(ReservaTestCase):
+    """Todo caminho que passa a ocupar um horário checa conflito com a área travada."""
+
+    def test_segunda_reserva_do_mesmo_horario(self):
+        reservar(self._reserva(10))
+        with self.assertRaisesMessage(ValidationError, 'conflita'):
+            reservar(self._reserva(10))
+        self.assertEqual(Reserva.objects.count(), 1)
+
+    def test_reserva_encostada_nao_conflita(self):
+        reservar(self._reserva(10))
+        reservar(self._reserva(11))
+        self.assertEqual(Reserva.objects.count(), 2)
+
+    def test_reaprovar_cancelada_que_conflita(self):
+        cancelada = self._reserva(10, status=Reserva.Status.CANCELADA)
+        cancelada.save()
+        reservar(self._reserva(10, horas=2))
+
+        admin_ = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(admin_)
+        resp = self.client.post(
+            reverse('admin:reservas_reserva_changelist'),
+            {'action': 'aprovar_reservas', '_selected_action': [cancelada.pk]}, follow=True,
+        )
+        self.assertEqual(resp.status_code, 200)
+        cancelada.refresh_from_db()
+        self.assertEqual(cancelada.status, Reserva.Status.CANCELADA)
+        self.assertIn('não aprovada', ' '.join(str(m) for m in resp.context['messages']))
+
+    def test_admin_nao_grava_reserva_sobreposta(self):
+        reservar(self._reserva(10))
+        admin_ = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(admin_)
+        inicio, fim = _horario(self.dia, 10)
+        local_ini, local_fim = timezone.localtime(inicio), timezone.localtime(fim)
+        resp = self.client.post(reverse('admin:reservas_reserva_add'), {
+            'area': self.area.pk, 'morador': self.morador.pk, 'status': Reserva.Status.APROVADA,
+            'inicio_0': f'{local_ini:%d/%m/%Y}', 'inicio_1': f'{local_ini:%H:%M}',
+            'fim_0': f'{local_fim:%d/%m/%Y}', 'fim_1': f'{local_fim:%H:%M}',
+        })
+        self.assertEqual(resp.status_code, 200)  # volta ao form com o erro
+        self.assertContains(resp, 'conflita')
+        self.assertEqual(Reserva.objects.count(), 1)
+
+
+class SlotsDoDiaTests(ReservaTestCase):
+    """A varredura oferece exatamente os slots que a checagem por slot (Reserva.clean) aceitaria."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.area = AreaReservavel.objects.create(
+            condominio=cls.condominio, nome='Academia', hora_inicio=time(8), hora_fim=time(20), slot_minutos=30,
+        )
+        cls.outro = User.objects.create_user('vizinho')
+
+    def _grade(self, dia):
+        inicio, fim = _horario(dia, 8, 12)
+        passo = timedelta(minutes=self.area.slot_minutos)
+        return [(inicio + passo * i, inicio + passo * (i + 1)) for i in range((fim - inicio) // passo)]
+
+    def _por_slot(self, dia):
+        """A regra antiga: uma consulta por slot, agora com compartilhamento e capacidade."""
+        livres = []
+        for inicio, fim in self._grade(dia):
+            try:
+                Reserva(area=self.area, morador=self.morador, inicio=inicio, fim=fim).clean()
+            except ValidationError:
+                continue
+            livres.append((inicio, fim))
+        return livres
+
+    def _reservas_aleatorias(self, n=40):
+        gerador = random.Random(7)
+        inicio_dia, _ = _horario(self.dia, 7, 14)
+        reservas = []
+        for _ in range(n):
+            inicio = inicio_dia + timedelta(minutes=15 * gerador.randrange(56))
+            reservas.append(Reserva(
+                area=self.area, morador=self.outro, inicio=inicio,
+                fim=inicio + timedelta(minutes=15 * gerador.randint(1, 8)),
+                status=gerador.choice([Reserva.Status.APROVADA, Reserva.Status.PENDENTE, Reserva.Status.CANCELADA]),
+                permite_compartilhar=gerador.random() < 0.8,
+            ))
+        Reserva.objects.bulk_create(reservas)  # sem clean: inclui sobreposições que só o banco evitaria
+
+    def _area(self, **campos):
+        AreaReservavel.objects.filter(pk=self.area.pk).update(**campos)
+        self.area = AreaReservavel.objects.get(pk=self.area.pk)
+
+    def test_igual_a_checagem_por_slot(self):
+        self._reservas_aleatorias()
+        for capacidade in (None, 1, 2, 3):
+            with self.subTest(capacidade=capacidade):
+                self._area(capacidade=capacidade)
+                self.assertEqual(slots_do_dia(self.area, self.dia), self._por_slot(self.dia))
+
+    def test_exclusiva_bloqueia_mesmo_sem_capacidade(self):
+        inicio, fim = _horario(self.dia, 10)
+        Reserva.objects.create(area=self.area, morador=self.outro, inicio=inicio, fim=fim, status=Reserva.Status.APROVADA)
+        slots = slots_do_dia(self.area, self.dia)
+        self.assertNotIn((inicio, inicio + timedelta(minutes=30)), slots)
+        self.assertIn((fim, fim + timedelta(minutes=30)), slots)
+        self.assertEqual(slots, self._por_slot(self.dia))
+
+    def test_capacidade_lotada(self):
+        inicio, fim = _horario(self.dia, 10)
+        for _ in range(2):
+            Reserva.objects.create(
+                area=self.area, morador=self.outro, inicio=inicio, fim=fim,
+                status=Reserva.Status.APROVADA, permite_compartilhar=True,
+            )
+        self._area(capacidade=3)
+        self.assertIn((inicio, inicio + timedelta(minutes=30)), slots_do_dia(self.area, self.dia))
+        self._area(capacidade=2)
+        slots = slots_do_dia(self.area, self.dia)
+        self.assertNotIn((inicio, inicio + timedelta(minutes=30)), slots)
+        self.assertEqual(slots, self._por_slot(self.dia))
+
+    def test_data_bloqueada_e_dia_nao_permitido(self):
+        self._area(datas_bloqueadas=[self.dia.isoformat()])
+        self.assertEqual(slots_do_dia(self.area, self.dia), [])
+        self.assertEqual(self._por_slot(self.dia), [])
+
+        self._area(datas_bloqueadas=[], dias_permitidos=[(self.dia.weekday() + 1) % 7])
+        self.assertEqual(slots_do_dia(self.area, self.dia), [])
+        self.assertEqual(self._por_slot(self.dia), [])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class CacheDeSlotsTests(ReservaTestCase):
+    """Toda alteração de reserva (ou das regras da área) troca a versão e derruba a lista em cache."""
+
+    def _slot(self, hora):
+        return _horario(self.dia, hora)
+
+    def _versao_do_dia(self):
+        return cache.get(_chave_dia(self.area.pk, self.dia))
+
+    def _reservada(self, hora):
+        with self.captureOnCommitCallbacks(execute=True):
+            return reservar(self._reserva(hora))
+
+    def test_lista_vem_do_cache(self):
+        self.assertIn(self._slot(10), slots_disponiveis(self.area, self.dia))
+        Reserva.objects.bulk_create([self._reserva(10)])  # sem sinais: nada invalida
+        self.assertIn(self._slot(10), slots_disponiveis(self.area, self.dia))
+
+    def test_nova_reserva_e_cancelamento(self):
+        slots_disponiveis(self.area, self.dia)
+        versao = self._versao_do_dia()
+        reserva = self._reservada(10)
+        self.assertNotEqual(self._versao_do_dia(), versao)
+        self.assertNotIn(self._slot(10), slots_disponiveis(self.area, self.dia))
+
+        versao = self._versao_do_dia()
+        reserva.status = Reserva.Status.CANCELADA
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.save()
+        self.assertNotEqual(self._versao_do_dia(), versao)
+        self.assertIn(self._slot(10), slots_disponiveis(self.area, self.dia))
+
+    def test_atualizar_e_invalidar(self):
+        self._reservada(10)
+        self.assertNotIn(self._slot(10), slots_disponiveis(self.area, self.dia))
+        versao = self._versao_do_dia()
+        with self.captureOnCommitCallbacks(execute=True):
+            atualizar_e_invalidar(Reserva.objects.all(), status=Reserva.Status.CANCELADA)
+        self.assertNotEqual(self._versao_do_dia(), versao)
+        self.assertIn(self._slot(10), slots_disponiveis(self.area, self.dia))
+
+    def test_edicao_no_admin_invalida_dia_antigo_e_novo(self):
+        reserva = self._reservada(10)
+        amanha = self.dia + timedelta(days=1)
+        slots_disponiveis(self.area, self.dia)
+        self.assertIn(_horario(amanha, 15), slots_disponiveis(self.area, amanha))
+
+        admin_ = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(admin_)
+        inicio, fim = (timezone.localtime(h) for h in _horario(amanha, 15))
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('admin:reservas_reserva_change', args=[reserva.pk]), {
+                'area': self.area.pk, 'morador': self.morador.pk, 'status': Reserva.Status.APROVADA,
+                'inicio_0': f'{inicio:%d/%m/%Y}', 'inicio_1': f'{inicio:%H:%M}',
+                'fim_0': f'{fim:%d/%m/%Y}', 'fim_1': f'{fim:%H:%M}',
+            })
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn(self._slot(10), slots_disponiveis(self.area, self.dia))
+        self.assertNotIn(_horario(amanha, 15), slots_disponiveis(self.area, amanha))
+
+    def test_regras_da_area(self):
+        self.assertIn(self._slot(10), slots_disponiveis(self.area, self.dia))
+        self.area.datas_bloqueadas = [self.dia.isoformat()]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.area.save()
+        self.assertEqual(slots_disponiveis(self.area, self.dia), [])
+
+
+class VarreduraTests(SimpleTestCase):
+    """Bordas de pico_simultaneo/mesclar_bloqueios: intervalos são [inicio, fim)."""
+
+    def h(self, hora):
+        return datetime(2030, 1, 7, hora)
+
+    def intervalo(self, ini, fim, compartilhavel=True):
+        return (self.h(ini), self.h(fim), compartilhavel)
+
+    def test_vazio(self):
+        self.assertEqual(pico_simultaneo([]), 0)
+        self.assertEqual(mesclar_bloqueios([], capacidade=1), [])
+
+    def test_intervalos_encostados_nao_sao_simultaneos(self):
+        ocupados = [self.intervalo(10, 11), self.intervalo(11, 12), self.intervalo(12, 13)]
+        self.assertEqual(pico_simultaneo(ocupados), 1)
+        self.assertEqual(mesclar_bloqueios(ocupados, capacidade=2), [])
+        # lotados um após o outro: um bloqueio contínuo
+        self.assertEqual(mesclar_bloqueios(ocupados, capacidade=1), [[self.h(10), self.h(13)]])
+
+    def test_total_igual_a_capacidade_bloqueia(self):
+        ocupados = [self.intervalo(10, 12), self.intervalo(11, 13)]
+        self.assertEqual(pico_simultaneo(ocupados), 2)
+        self.assertEqual(mesclar_bloqueios(ocupados, capacidade=2), [[self.h(11), self.h(12)]])
+        self.assertEqual(mesclar_bloqueios(ocupados, capacidade=3), [])
+        self.assertEqual(mesclar_bloqueios(ocupados), [])
+
+    def test_exclusiva_com_compartilhada(self):
+        ocupados = [self.intervalo(10, 12, compartilhavel=False), self.intervalo(11, 13)]
+        self.assertEqual(pico_simultaneo(ocupados), 2)
+        self.assertEqual(mesclar_bloqueios(ocupados), [[self.h(10), self.h(12)]])
+        self.assertEqual(mesclar_bloqueios(ocupados, capacidade=2), [[self.h(10), self.h(12)]])
+        self.assertEqual(mesclar_bloqueios(ocupados, capacidade=1), [[self.h(10), self.h(13)]])
+
+    def test_exclusivas_encostadas(self):
+        ocupados = [self.intervalo(10, 11, compartilhavel=False), self.intervalo(11, 12, compartilhavel=False)]
+        self.assertEqual(mesclar_bloqueios(ocupados), [[self.h(10), self.h(12)]])
+
+    def test_slot_que_comeca_no_fim_do_bloqueio(self):
+        ocupados = [self.intervalo(10, 11, compartilhavel=False)]
+        slots = varrer_slots(self.h(9), self.h(13), ocupados)
+        self.assertEqual(slots, [(self.h(9), self.h(10)), (self.h(11), self.h(12)), (self.h(12), self.h(13))])
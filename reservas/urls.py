@@ -6,8 +6,13 @@ app_name = 'reservas'
 
 urlpatterns = [
     path('areas/', views.areas_list, name='areas_list'),
+    path('areas/buscar/', views.buscar_janelas, name='buscar_janelas'),
     path('areas/<int:area_id>/', views.area_detail, name='area_detail'),
+    path('areas/<int:area_id>/calendario/', views.area_calendario, name='area_calendario'),
     path('agendar/', views.agendar, name='agendar'),
     path('cancelar/<int:reserva_id>/', views.cancelar_reserva, name='cancelar_reserva'),
+    path('espera/', views.entrar_lista_espera, name='entrar_lista_espera'),
+    path('espera/<int:pedido_id>/sair/', views.sair_lista_espera, name='sair_lista_espera'),
     path('historico/', views.historico, name='historico'),
+    path('historico/exportar/', views.historico_exportar, name='historico_exportar'),
 ]
\ No newline at end of file
@@ -1,16 +1,32 @@
 # reservas/views.py
-from datetime import datetime, timedelta, time
+import csv
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseBadRequest, HttpResponseForbidden
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.db.models import Q
 from django.utils import timezone
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 
-from .models import AreaReservavel, Reserva
+from condominios.models import Unidade
+
+from .models import AreaReservavel, ListaEspera, Reserva, intervalo_do_dia
 from .forms import ReservaForm  # mantido
+from .servicos import reservar
+from .disponibilidade import slots_disponiveis, slots_lotados, calendario, proximas_janelas
+
+CALENDARIO_DIAS = (30, 60)  # janelas aceitas pela API do calendário
+BUSCA_MAX_DIAS = 31         # período máximo da busca de janelas livres
+BUSCA_LIMITE = (10, 50)     # resultados: padrão, máximo
+HISTORICO_POR_PAGINA = 50
+EXPORT_CHUNK = 2000  # linhas por ida ao banco na exportação
+CHAVES_EXPORT = ("id", "area", "morador", "inicio", "fim", "status", "permite_compartilhar", "observacoes")
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_INICIO_DE_FORMULA = ("=", "+", "-", "@", "\t", "\r")  # como em financeiro.exportacao
 
-SLOT_MINUTES = 60  # duração do slot
 
 def _parse_date(query_param, default_date):
     try:
@@ -20,52 +36,9 @@ def _parse_date(query_param, default_date):
 
 def _slots_disponiveis(area: AreaReservavel, dia):
     """
-    Gera slots livres (inicio, fim) para a data `dia`, respeitando:
-    - dias_permitidos
-    - hora_inicio / hora_fim
-    - datas_bloqueadas
-    - conflitos com reservas existentes (pendente ou aprovada)
-    - oculta slots totalmente no passado quando a data é hoje
+    Slots livres (inicio, fim) da área em `dia` — ver `disponibilidade.slots_disponiveis`.
     """
-    # regras do dia
-    if area.dias_permitidos and dia.weekday() not in area.dias_permitidos:
-        return []
-
-    if area.datas_bloqueadas and dia.isoformat() in (area.datas_bloqueadas or []):
-        return []
-
-    # janelas
-    h_ini = area.hora_inicio or time(0, 0)
-    h_fim = area.hora_fim or time(23, 59)
-
-    # timezone-aware
-    tz = timezone.get_current_timezone()
-    dt_ini = timezone.make_aware(datetime.combine(dia, h_ini), tz)
-    dt_fim = timezone.make_aware(datetime.combine(dia, h_fim), tz)
-
-    # reservas existentes no dia (exceto canceladas)
-    existentes = Reserva.objects.filter(
-        area=area, inicio__lt=dt_fim, fim__gt=dt_ini
-    ).exclude(status=Reserva.Status.CANCELADA).order_by('inicio')
-
-    slots = []
-    cursor = dt_ini
-    now = timezone.localtime()
-    while cursor + timedelta(minutes=SLOT_MINUTES) <= dt_fim:
-        slot_inicio = cursor
-        slot_fim = cursor + timedelta(minutes=SLOT_MINUTES)
-
-        # pular slots do passado (se é hoje)
-        if dia == now.date() and slot_fim <= now:
-            cursor = slot_fim
-            continue
-
-        conflito = existentes.filter(inicio__lt=slot_fim, fim__gt=slot_inicio).exists()
-        if not conflito:
-            slots.append((slot_inicio, slot_fim))
-        cursor = slot_fim
-
-    return slots
+    return slots_disponiveis(area, dia)
 
 @login_required
 def areas_list(request):
@@ -82,15 +55,109 @@ def area_detail(request, area_id):
     role = getattr(request.user, 'role', 'MORADOR')
     pode_reservar = role != 'PORTEIRO'  # porteiro: apenas visualiza
 
+    lotados = []
+    if pode_reservar:
+        dia_ini, dia_fim = intervalo_do_dia(dia)
+        na_fila = dict(
+            ListaEspera.objects.aguardando()
+            .filter(area=area, morador=request.user, inicio__gte=dia_ini, inicio__lt=dia_fim)
+            .values_list('inicio', 'id')
+        )
+        lotados = [(ini, fim, na_fila.get(ini)) for ini, fim in slots_lotados(area, dia)]
+
     return render(request, 'reservas/area_detail.html', {
         'area': area,
         'dia': dia,
         'slots': slots,
+        'lotados': lotados,
         'is_hoje': dia == hoje,
         'now_str': timezone.localtime().strftime('%Y-%m-%d %H:%M'),
         'pode_reservar': pode_reservar,
     })
 
+@login_required
+def area_calendario(request, area_id):
+    """
+    API JSON com a disponibilidade da área para `?dias=` 30 ou 60 dias a partir de
+    `?data=` AAAA-MM-DD (padrão e mínimo: hoje; volta no campo `de` da resposta).
+    Alimenta o calendário de `area_detail.html`.
+    """
+    area = get_object_or_404(AreaReservavel, pk=area_id)
+    hoje = timezone.localdate()
+    de = max(_parse_date(request.GET.get('data') or hoje.isoformat(), hoje), hoje)
+    try:
+        dias = int(request.GET.get('dias') or CALENDARIO_DIAS[0])
+    except ValueError:
+        dias = CALENDARIO_DIAS[0]
+    if dias not in CALENDARIO_DIAS:
+        dias = CALENDARIO_DIAS[0]
+
+    return JsonResponse({
+        'area': area.id,
+        'de': de.isoformat(),
+        'dias': [
+            {
+                'data': d['data'].isoformat(),
+                'status': d['status'],
+                'livres': d['livres'],
+                'total': d['total'],
+                'slots': [
+                    [timezone.localtime(ini).strftime('%H:%M'), timezone.localtime(fim).strftime('%H:%M')]
+                    for ini, fim in d['slots']
+                ],
+            }
+            for d in calendario(area, de, dias)
+        ],
+    })
+
+def _inteiro(valor, padrao, minimo, maximo):
+    try:
+        return min(max(int(valor), minimo), maximo)
+    except (TypeError, ValueError):
+        return padrao
+
+@login_required
+def buscar_janelas(request):
+    """
+    API JSON: primeiras janelas livres de `duracao` minutos entre `de` e `ate`
+    em todas as áreas do(s) condomínio(s) do usuário (ou nas `area` informadas;
+    `nome` filtra pelo nome da área, ex.: ?nome=churrasqueira&duracao=120).
+    """
+    hoje = timezone.localdate()
+    de = max(_parse_date(request.GET.get('de') or hoje.isoformat(), hoje), hoje)
+    ate = _parse_date(request.GET.get('ate') or '', de + timedelta(days=6))
+    ate = min(ate, de + timedelta(days=BUSCA_MAX_DIAS - 1))
+    duracao = _inteiro(request.GET.get('duracao'), 60, 5, 24 * 60)
+    limite = _inteiro(request.GET.get('limite'), BUSCA_LIMITE[0], 1, BUSCA_LIMITE[1])
+
+    areas = AreaReservavel.objects.select_related('condominio').order_by('nome', 'pk')
+    condominios = Unidade.objects.filter(morador=request.user).values('condominio_id')
+    if condominios.exists():
+        areas = areas.filter(condominio_id__in=condominios)
+    ids = [i for i in request.GET.getlist('area') if i.isdigit()]
+    if ids:
+        areas = areas.filter(pk__in=ids)
+    if request.GET.get('nome'):
+        areas = areas.filter(nome__icontains=request.GET['nome'].strip())
+
+    janelas = proximas_janelas(areas, timedelta(minutes=duracao), de, ate, limite)
+    return JsonResponse({
+        'de': de.isoformat(),
+        'ate': ate.isoformat(),
+        'duracao': duracao,
+        'janelas': [
+            {
+                'area': area.id,
+                'area_nome': area.nome,
+                'condominio': area.condominio.nome,
+                'data': timezone.localtime(ini).date().isoformat(),
+                'inicio': timezone.localtime(ini).isoformat(),
+                'fim': timezone.localtime(fim).isoformat(),
+            }
+            for ini, fim, area in janelas
+        ],
+    })
+
 @login_required
 def agendar(request):
     # 🔒 Porteiro não pode reservar
@@ -126,8 +193,7 @@ def agendar(request):
         status=Reserva.Status.APROVADA
     )
     try:
-        r.clean()
-        r.save()
+        reservar(r)
     except ValidationError as e:
         for msg in e.messages:
             messages.error(request, msg)
@@ -154,13 +220,67 @@ def cancelar_reserva(request, reserva_id):
         return redirect('portal:home')
 
     reserva.status = Reserva.Status.CANCELADA
-    reserva.save(update_fields=['status'])
+    # auto_now só vale para campos listados: atualizado_em marca a área para as estatísticas
+    reserva.save(update_fields=['status', 'atualizado_em'])
 
     messages.success(request, 'Reserva cancelada. O horário voltou a ficar disponível.')
     return redirect(request.META.get('HTTP_REFERER') or 'portal:home')
 
 @login_required
-def historico(request):
+def entrar_lista_espera(request):
+    if getattr(request.user, 'role', 'MORADOR') == 'PORTEIRO':
+        return HttpResponseForbidden('Porteiro não pode entrar na lista de espera.')
+    if request.method != 'POST':
+        return HttpResponseBadRequest('Método inválido.')
+
+    area = get_object_or_404(AreaReservavel, pk=request.POST.get('area_id'))
+    try:
+        tz = timezone.get_current_timezone()
+        inicio = datetime.fromisoformat(request.POST.get('inicio'))
+        fim = datetime.fromisoformat(request.POST.get('fim'))
+        inicio = inicio if timezone.is_aware(inicio) else timezone.make_aware(inicio, tz)
+        fim = fim if timezone.is_aware(fim) else timezone.make_aware(fim, tz)
+    except (TypeError, ValueError):
+        messages.error(request, 'Datas inválidas.')
+        return redirect('reservas:area_detail', area_id=area.id)
+
+    dia = timezone.localtime(inicio).date()
+    pedido = ListaEspera(area=area, morador=request.user, inicio=inicio, fim=fim)
+    try:
+        if inicio <= timezone.now():
+            raise ValidationError('Período inválido para a lista de espera.')
+        pedido.clean()
+    except ValidationError as e:
+        for msg in e.messages:
+            messages.error(request, msg)
+    else:
+        _, criado = ListaEspera.objects.get_or_create(
+            area=area, morador=request.user, inicio=inicio, fim=fim,
+            status=ListaEspera.Status.AGUARDANDO,
+        )
+        if criado:
+            messages.success(request, 'Você entrou na lista de espera. Se o horário vagar, a reserva é feita automaticamente e você será avisado.')
+        else:
+            messages.info(request, 'Você já está na lista de espera deste horário.')
+    return redirect(f"{reverse('reservas:area_detail', args=[area.id])}?data={dia.isoformat()}")
+
+@login_required
+def sair_lista_espera(request, pedido_id):
+    if request.method != 'POST':
+        return HttpResponseBadRequest('Método inválido.')
+    pedido = get_object_or_404(ListaEspera.objects.aguardando(), pk=pedido_id, morador=request.user)
+    pedido.status = ListaEspera.Status.DESISTIU
+    pedido.save(update_fields=['status'])
+    messages.success(request, 'Você saiu da lista de espera.')
+    dia = timezone.localtime(pedido.inicio).date()
+    return redirect(f"{reverse('reservas:area_detail', args=[pedido.area_id])}?data={dia.isoformat()}")
+
+def _historico_filtrado(request):
+    """
+    Queryset do histórico conforme os filtros da querystring.
+    Morador vê as próprias reservas; gestor pode auditar uma área inteira (?area=<id>).
+    Retorna (qs, de_param, ate_param, area_id).
+    """
     hoje = timezone.localdate()
     default_de = hoje - timedelta(days=30)
     de_param = request.GET.get("de") or default_de.isoformat()
@@ -177,12 +297,108 @@ def historico(request):
         ate = hoje
         ate_param = hoje.isoformat()
 
-    qs = Reserva.objects.filter(morador=request.user).order_by("-inicio")
-    qs = qs.filter(inicio__date__gte=de, fim__date__lte=ate)
-    reservas = qs[:100]
+    area_id = request.GET.get("area") or ""
+    is_gestor = getattr(request.user, 'role', 'MORADOR') == 'GESTOR'
+    if is_gestor and area_id.isdigit():
+        qs = Reserva.objects.filter(area_id=int(area_id))
+    else:
+        area_id = ""
+        qs = Reserva.objects.filter(morador=request.user)
+
+    # equivalente a inicio__date__gte=de / fim__date__lte=ate, mas indexável
+    qs = qs.filter(inicio__gte=intervalo_do_dia(de)[0], fim__lt=intervalo_do_dia(ate)[1])
+    return qs, de_param, ate_param, area_id
+
+
+def _codificar_cursor(reserva):
+    micros = (reserva.inicio - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{reserva.pk}"
+
+
+def _decodificar_cursor(valor):
+    try:
+        micros, pk = valor.split(".")
+        return _EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+@login_required
+def historico(request):
+    """
+    Histórico paginado por cursor (keyset) em (inicio, id), do mais recente para o mais
+    antigo: cada página é um range scan no índice, sem OFFSET e sem teto de registros.
+    """
+    qs, de_param, ate_param, area_id = _historico_filtrado(request)
+    qs = qs.select_related("area").order_by("-inicio", "-id")
+
+    cursor = _decodificar_cursor(request.GET.get("cursor"))
+    if cursor:
+        c_inicio, c_id = cursor
+        qs = qs.filter(Q(inicio__lt=c_inicio) | Q(inicio=c_inicio, id__lt=c_id))
+
+    pagina = list(qs[:HISTORICO_POR_PAGINA + 1])
+    reservas = pagina[:HISTORICO_POR_PAGINA]
+    proximo = _codificar_cursor(reservas[-1]) if len(pagina) > HISTORICO_POR_PAGINA else None
 
     return render(request, "reservas/historico.html", {
         "reservas": reservas,
         "de": de_param,
         "ate": ate_param,
-    })
\ No newline at end of file
+        "area": area_id,
+        "proximo_cursor": proximo,
+        "paginado": bool(cursor),
+    })
+
+
+class _Eco:
+    """Pseudo-buffer: csv.writer escreve e recebemos a linha de volta."""
+    def write(self, valor):
+        return valor
+
+
+def _texto(valor):
+    """Texto livre como célula inerte: sem o prefixo, "=HYPERLINK(...)" vira fórmula."""
+    valor = valor or ""
+    return f"'{valor}" if valor.startswith(_INICIO_DE_FORMULA) else valor
+
+
+@login_required
+def historico_exportar(request):
+    """
+    Exporta o histórico filtrado em CSV (padrão) ou JSONL, em streaming: as linhas
+    saem do banco em blocos (`.iterator`) e vão direto para a resposta, com memória
+    constante mesmo para anos de dados. No CSV, textos livres que começam como
+    fórmula ganham o prefixo `'` (ver `_texto`).
+    """
+    formato = request.GET.get("formato", "csv").lower()
+    qs, de_param, ate_param, _area_id = _historico_filtrado(request)
+    campos = ("id", "area__nome", "morador__username", "inicio", "fim", "status", "permite_compartilhar", "observacoes")
+    linhas = qs.order_by("inicio", "id").values_list(*campos).iterator(chunk_size=EXPORT_CHUNK)
+
+    nome = f"historico_reservas_{de_param}_{ate_param}"
+    if formato == "jsonl":
+        def gerar():
+            for linha in linhas:
+                registro = dict(zip(CHAVES_EXPORT, linha))
+                registro["inicio"] = timezone.localtime(registro["inicio"]).isoformat()
+                registro["fim"] = timezone.localtime(registro["fim"]).isoformat()
+                yield json.dumps(registro, ensure_ascii=False) + "\n"
+        resposta = StreamingHttpResponse(gerar(), content_type="application/x-ndjson; charset=utf-8")
+        resposta["Content-Disposition"] = f'attachment; filename="{nome}.jsonl"'
+        return resposta
+
+    escritor = csv.writer(_Eco())
+
+    def gerar():
+        yield escritor.writerow(CHAVES_EXPORT)
+        for pk, area, morador, inicio, fim, status, compart, obs in linhas:
+            yield escritor.writerow([
+                pk, _texto(area), _texto(morador),
+                timezone.localtime(inicio).strftime("%Y-%m-%d %H:%M"),
+                timezone.localtime(fim).strftime("%Y-%m-%d %H:%M"),
+                status, compart, _texto(obs),
+            ])
+    resposta = StreamingHttpResponse(gerar(), content_type="text/csv; charset=utf-8")
+    resposta["Content-Disposition"] = f'attachment; filename="{nome}.csv"'
+    return resposta